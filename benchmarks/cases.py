@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Benchmark cases for BitSatRelay's CPU-bound paths
+Each case is built lazily (setup returns the zero-argument callable to time),
+so a missing optional backend only skips the cases that need it
+"""
+
+import io
+import os
+import sys
+from collections import namedtuple
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'terminal-hq'))
+
+# setup() -> fn to time; nbytes: bytes processed per call (for MB/s), or None
+Case = namedtuple('Case', 'name setup nbytes')
+
+# Outbound message sizes: a short note up to the modem's ~2 MB file limit
+PAYLOAD_SIZES = (100, 1000, 10000, 100000, 2000000)
+
+PUBKEY_HEX = '3bf0c63fcb93463407af97a5e5ee64fa883d107ef9e558472c4eb9aaaefa459d'
+EVENT_ID_HEX = '5c83da77af1dec6d7289834998ad7aafbd9e2191396d75ec3cc27f5a77226f36'
+DM_REPLY = "💰 BitSatRelay Balance\n\nBalance: 1000 sats\nSpent: 42 sats\nMessages: 7"
+
+
+def _size_label(size):
+    if size >= 1000000:
+        return f"{size // 1000000}MB"
+    if size >= 1000:
+        return f"{size // 1000}KB"
+    return f"{size}B"
+
+
+def _hsmodem():
+    from BitSatRelay import HSModemFileTransfer
+    return HSModemFileTransfer()
+
+
+def _inbound_events():
+    """Signed satellite messages of each kind the quote note renders differently"""
+    from nostr.key import PrivateKey
+    from event_signer import EventSigner
+
+    author = EventSigner(PrivateKey())
+    content = "Greetings from off-grid! Relayed over the satellite link. " * 4
+    return {
+        'note': author.build_event(1, content, created_at=1700000000),
+        'reply': author.build_event(1, content, [['e', EVENT_ID_HEX, '', 'reply'], ['p', PUBKEY_HEX]],
+                                    created_at=1700000000),
+        'quote': author.build_event(1, content, [['q', EVENT_ID_HEX], ['p', PUBKEY_HEX]],
+                                    created_at=1700000000),
+        'repost': author.build_event(6, '{"pubkey":"%s","content":"%s"}' % (PUBKEY_HEX, content),
+                                     [['e', EVENT_ID_HEX], ['p', PUBKEY_HEX]], created_at=1700000000)
+    }
+
+
+def _quote_bot(signer=None):
+    """A NostrBot with only what build_quote_note uses - no relay pool, no sockets"""
+    from nostr.key import PrivateKey
+    from event_signer import EventSigner
+    from nostr_bot import NostrBot
+
+    bot = NostrBot.__new__(NostrBot)
+    bot.signer = signer or EventSigner(PrivateKey())
+    return bot
+
+
+class _UnsignedBuilder:
+    """Stands in for EventSigner so quote.render times message rendering alone"""
+
+    def build_event(self, kind, content, tags=None, created_at=None):
+        return {'id': EVENT_ID_HEX, 'kind': kind, 'content': content, 'tags': tags or []}
+
+
+def _quiet(fn):
+    """build_quote_note logs every note; keep that out of the timing and the report"""
+    def run():
+        with redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+# Framing
+
+def _crc16(size):
+    def setup():
+        modem = _hsmodem()
+        data = os.urandom(size)
+        return lambda: modem.calculate_crc16(data)
+    return setup
+
+
+def _create_packet(size):
+    def setup():
+        modem = _hsmodem()
+        payload = os.urandom(size)
+        return lambda: modem.create_packet(modem.TYPE_IMAGE, modem.FRAME_MIDDLE, payload)
+    return setup
+
+
+def _build_frames(size):
+    def setup():
+        modem = _hsmodem()
+        data = os.urandom(size)
+        return lambda: modem.build_frames('a3f9c2e1d4b5.txt', data)
+    return setup
+
+
+# NIP-19
+
+def _hex_to_npub():
+    from BitSatRelay import hex_to_npub
+    return lambda: hex_to_npub(PUBKEY_HEX)
+
+
+def _hex_to_note():
+    from nostr_bot import hex_to_note
+    return lambda: hex_to_note(EVENT_ID_HEX)
+
+
+# NIP-01
+
+def _quote_event():
+    """The signed quote note create_quote_note would publish for a reply"""
+    bot = _quote_bot()
+    with redirect_stdout(io.StringIO()):
+        return bot.signer, bot.build_quote_note(_inbound_events()['reply'])
+
+
+def _serialize():
+    from event_signer import serialize_event
+    _, event = _quote_event()
+    return lambda: serialize_event(event)
+
+
+def _hash():
+    from event_signer import compute_event_id
+    _, event = _quote_event()
+    return lambda: compute_event_id(event)
+
+
+def _sign():
+    signer, event = _quote_event()
+    return lambda: signer.sign(event)
+
+
+# Quote notes
+
+def _quote_build(kind):
+    def setup():
+        bot = _quote_bot()
+        event = _inbound_events()[kind]
+        return _quiet(lambda: bot.build_quote_note(event))
+    return setup
+
+
+def _quote_render(kind):
+    def setup():
+        bot = _quote_bot(_UnsignedBuilder())
+        event = _inbound_events()[kind]
+        return _quiet(lambda: bot.build_quote_note(event))
+    return setup
+
+
+# NIP-04
+
+def _nip04(direction, cache_size):
+    def setup():
+        from nostr.key import PrivateKey
+        from nip04 import Nip04Cipher
+
+        bot_key, peer_key = PrivateKey(), PrivateKey()
+        peer_hex = peer_key.public_key.hex()
+        cipher = Nip04Cipher(bot_key, cache_size=cache_size)
+        if direction == 'encrypt':
+            # send_encrypted_dm: a reply to a DM command
+            return lambda: cipher.encrypt(DM_REPLY, peer_hex)
+        # decrypt_dm: an inbound DM command
+        inbound = Nip04Cipher(peer_key).encrypt("/balance", bot_key.public_key.hex())
+        return lambda: cipher.decrypt(inbound, peer_hex)
+    return setup
+
+
+def cases():
+    """Every micro-benchmark, in report order"""
+    result = []
+    for size in PAYLOAD_SIZES:
+        result.append(Case(f"framing.crc16[{_size_label(size)}]", _crc16(size), size))
+    # The CRC only ever covers the 50-byte filename field on the wire
+    result.append(Case("framing.crc16[filename]", _crc16(50), 50))
+    for size in (100, 219):
+        result.append(Case(f"framing.create_packet[{_size_label(size)}]", _create_packet(size), size))
+    for size in PAYLOAD_SIZES:
+        result.append(Case(f"framing.build_frames[{_size_label(size)}]", _build_frames(size), size))
+
+    result.append(Case("nip19.hex_to_npub", _hex_to_npub, None))
+    result.append(Case("nip19.hex_to_note", _hex_to_note, None))
+
+    result.append(Case("nip01.serialize", _serialize, None))
+    result.append(Case("nip01.hash", _hash, None))
+    result.append(Case("nip01.sign", _sign, None))
+
+    for kind in ('note', 'reply', 'quote', 'repost'):
+        result.append(Case(f"quote.render[{kind}]", _quote_render(kind), None))
+    for kind in ('note', 'reply', 'quote', 'repost'):
+        result.append(Case(f"quote.build[{kind}]", _quote_build(kind), None))
+
+    for direction in ('encrypt', 'decrypt'):
+        result.append(Case(f"nip04.{direction}[cached]", _nip04(direction, 256), None))
+        result.append(Case(f"nip04.{direction}[cold]", _nip04(direction, 0), None))
+    return result
+
+
+def module_benchmarks(quick=False):
+    """
+    The throughput benchmarks the modules already ship, as (name, ops/sec) pairs
+
+    event_signer.benchmark compares signing backends; nip04.benchmark times
+    DM round trips (decrypt + reply) with and without the shared-secret cache
+    """
+    import event_signer
+    import nip04
+
+    count = 200 if quick else 2000
+    with redirect_stdout(io.StringIO()):
+        signing = event_signer.benchmark(count)
+        dms = nip04.benchmark(count)
+    pairs = [(f"event_signer.benchmark[{backend}]", rate) for backend, rate in signing.items()]
+    pairs += [(f"nip04.benchmark[{label}]", result['dms_per_sec']) for label, result in dms.items()]
+    return pairs
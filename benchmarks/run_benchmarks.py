@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+BitSatRelay Micro-Benchmarks
+Times framing, NIP-19 encoding, NIP-01 signing, NIP-04 and quote rendering,
+writes the results as JSON, and compares against a saved baseline
+
+    python benchmarks/run_benchmarks.py -o benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json -o benchmarks/current.json
+
+With --baseline the exit status is 1 when any case's best round is slower
+than the baseline's by more than --threshold, even after re-timing it
+(--retries), so it can gate a release. Compare runs made with the same
+options: cases timed with a different number of rounds are not compared
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+from cases import cases, module_benchmarks
+
+
+def time_case(fn, min_time=0.05, rounds=20):
+    """
+    Seconds per call of fn
+
+    Calibrates the loop count so each round runs at least min_time, then
+    keeps the per-call time of every round (best and median are reported).
+    Many short rounds make the best round a steadier figure than a few long
+    ones on a busy machine.
+    """
+    timer = timeit.Timer(fn)
+    loops = 1
+    # Calibration runs double as warm-up (caches, lazy imports)
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / elapsed * 1.2)) if elapsed else loops * 10
+    samples = [t / loops for t in timer.repeat(repeat=rounds, number=loops)]
+    return samples, loops
+
+
+def selected(name, select):
+    """
+    Whether a case is picked by the command-line selection
+
+    A selector matches a case by exact name or as a dotted prefix: "framing"
+    and "framing.crc16" both pick "framing.crc16[1KB]", "frame" picks nothing.
+    """
+    if not select:
+        return True
+    return any(name == s or name.startswith(s + '.') or name.startswith(s + '[') for s in select)
+
+
+def run(select=None, quick=False, include_modules=True):
+    """
+    Run the suite
+
+    Args:
+        select: Only these cases (exact names or dotted prefixes, see selected())
+        quick: Shorter rounds (smoke test, noisier numbers)
+        include_modules: Also run the event_signer and nip04 module benchmarks
+
+    Returns:
+        {name: result dict} - best_seconds (else seconds_per_op) is the figure baselines compare
+    """
+    min_time, rounds = (0.02, 5) if quick else (0.05, 20)
+    results = {}
+    for case in cases():
+        if not selected(case.name, select):
+            continue
+        try:
+            fn = case.setup()
+        except ImportError as e:
+            results[case.name] = {'skipped': f"ImportError: {e}"}
+            print(f"⏭️ {case.name}: skipped ({e})", file=sys.stderr)
+            continue
+
+        samples, loops = time_case(fn, min_time, rounds)
+        median = statistics.median(samples)
+        result = {
+            'seconds_per_op': median,
+            'best_seconds': min(samples),
+            'stdev_seconds': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            'ops_per_sec': 1 / median,
+            'loops': loops,
+            'rounds': rounds
+        }
+        if case.nbytes:
+            result['bytes'] = case.nbytes
+            result['mb_per_sec'] = case.nbytes / median / 1e6
+        results[case.name] = result
+        print(f"⏱️ {case.name:32s} {median * 1e6:14.2f} µs/op", file=sys.stderr)
+
+    module_prefixes = ('event_signer.benchmark', 'nip04.benchmark')
+    if include_modules and (not select or any(selected(prefix, select) or s.startswith(prefix)
+                                              for prefix in module_prefixes for s in select)):
+        try:
+            for name, rate in module_benchmarks(quick):
+                if not selected(name, select):
+                    continue
+                results[name] = {'seconds_per_op': 1 / rate, 'ops_per_sec': rate}
+                print(f"⏱️ {name:32s} {1e6 / rate:14.2f} µs/op", file=sys.stderr)
+        except ImportError as e:
+            print(f"⏭️ module benchmarks: skipped ({e})", file=sys.stderr)
+    return results
+
+
+def _seconds(result):
+    """Figure compared against a baseline: the best round (least disturbed by other load)"""
+    return result.get('best_seconds', result.get('seconds_per_op'))
+
+
+def compare(results, baseline, threshold=0.5):
+    """
+    Per-case change against a baseline run
+
+    Compares best round against best round. Cases timed with a different
+    number of rounds (e.g. --quick against a full run) are reported as
+    incomparable and never count as regressions.
+
+    Returns:
+        ({name: {baseline_seconds, seconds, ratio, status}}, [regressed names])
+        ratio > 1 is slower; status is regression, improvement, unchanged or incomparable
+    """
+    comparison = {}
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name, {})
+        if 'seconds_per_op' not in result or not _seconds(before):
+            continue
+        ratio = _seconds(result) / _seconds(before)
+        if result.get('rounds') != before.get('rounds'):
+            status = 'incomparable'
+        elif ratio > 1 + threshold:
+            status = 'regression'
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        comparison[name] = {
+            'baseline_seconds': _seconds(before),
+            'seconds': _seconds(result),
+            'ratio': round(ratio, 3),
+            'status': status
+        }
+    return comparison, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run BitSatRelay micro-benchmarks and write JSON results")
+    parser.add_argument('select', nargs='*',
+                        help="Only these cases: exact names or dotted prefixes (e.g. framing nip04.decrypt)")
+    parser.add_argument('-o', '--output', help="Write the JSON report here (default: stdout)")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="Slowdown of the best round over baseline that fails the run (default 0.5 = 50%%; "
+                             "shared or virtual machines vary that much between runs - tighten it on a quiet one)")
+    parser.add_argument('--retries', type=int, default=2,
+                        help="Times a case slower than baseline is re-timed before it counts (default 2)")
+    parser.add_argument('--quick', action='store_true', help="Short rounds for a smoke test")
+    parser.add_argument('--no-modules', action='store_true',
+                        help="Skip the event_signer/nip04 module benchmarks")
+    args = parser.parse_args()
+
+    results = run(args.select, args.quick, not args.no_modules)
+    report = {
+        'created_at': int(time.time()),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'quick': args.quick,
+        'results': results
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['baseline'] = {'path': args.baseline, 'created_at': baseline.get('created_at'),
+                              'threshold': args.threshold}
+        report['comparison'], regressions = compare(results, baseline.get('results', {}), args.threshold)
+        for _ in range(args.retries):
+            if not regressions:
+                break
+            # A one-off slow run is usually other load on the machine; a real
+            # regression stays slow. Time the slow cases again, keep the faster run
+            print(f"🔁 Re-timing {len(regressions)} slow case(s)", file=sys.stderr)
+            for name, result in run(regressions, args.quick, not args.no_modules).items():
+                if 'seconds_per_op' in result and _seconds(result) < _seconds(results[name]):
+                    results[name] = result
+            report['comparison'], regressions = compare(results, baseline.get('results', {}), args.threshold)
+        for name, change in report['comparison'].items():
+            marker = {'regression': '🔴', 'improvement': '🟢', 'incomparable': '⚪'}.get(change['status'], '  ')
+            print(f"{marker} {name:32s} {change['ratio']:6.2f}x baseline", file=sys.stderr)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}",
+                  file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"📄 Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,20 +13,55 @@ import asyncio
 import websockets
 import json
 import tempfile
+import shutil
 from pathlib import Path
 from datetime import datetime
 
+# Cold start reference for the startup timing report
+PROCESS_START = time.monotonic()
+
 # Import our modules
+from startup_timing import StartupTimer
+import metrics
 from bitsatcredit_client import BitSatCreditClient
+from state_store import ExpiringStore, state_file
+from balance_notifier import BalanceNotifier
 from nostr_bot import NostrBot
-from satellite_monitor import SatelliteMonitor
 from dm_bot import DMBot
+from udp_receiver import start_udp_receiver
+from dir_scanner import DirectoryScanner
+from inbound_pipeline import InboundPipeline
+from inbound_dedup import InboundDedup
+from event_archive import EventArchive
+from latency_trace import tracer
+from profiling import RuntimeProfiler
 
 # Rate limiting for satellite messages
 last_message_time = 0
 processed_events = set()  # Track processed event IDs to prevent duplicates
 MIN_MESSAGE_INTERVAL = 5.0
 
+# Low/critical balance warnings already sent, keyed "<level>:<npub>" (opened in bridge_mode)
+sent_notifications = None
+# Background low-balance DM sender fed by spend results (started in bridge_mode)
+balance_notifier = None
+
+# Readiness milestones from cold start to first relayed event
+startup = StartupTimer(PROCESS_START)
+
+# Metrics (served on /metrics when enabled in config)
+EVENTS = metrics.counter('bitsat_events_total', 'Nostr events reaching the bridge, by outcome', ('outcome',))
+ADMISSION_SECONDS = metrics.histogram('bitsat_credit_admission_seconds',
+                                      'LNbits user lookup, balance check and spend for one event')
+FRAMES_SENT = metrics.counter('bitsat_frames_sent_total', 'Frames written to HSModem', ('frame',))
+FRAME_BYTES_SENT = metrics.counter('bitsat_frame_bytes_sent_total', 'Bytes written to HSModem')
+FRAME_ERRORS = metrics.counter('bitsat_frame_errors_total', 'Frames HSModem could not be sent')
+AIRTIME_SECONDS = metrics.histogram('bitsat_airtime_seconds', 'Modem send time per message, both passes',
+                                    ('mode',), buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200))
+MESSAGE_BYTES = metrics.histogram('bitsat_message_bytes', 'Size of messages sent to the satellite',
+                                  buckets=(163, 500, 1000, 2000, 5000, 10000, 50000, 200000))
+FRAME_NAMES = {0: 'first', 1: 'middle', 2: 'last', 3: 'single'}
+
 
 class HSModemFileTransfer:
     def __init__(self, host=None, port=None):
@@ -71,15 +106,43 @@ class HSModemFileTransfer:
         packet[2:2+payload_len] = payload_data[:payload_len]
         return bytes(packet)
 
+    def check_ready(self):
+        """
+        Open a UDP socket to the modem without sending anything
+
+        Resolves the host and checks there is a route to it, so a bad address
+        shows up at startup instead of on the first paid message.
+
+        Returns:
+            (ready, message)
+        """
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.connect((self.host, self.port))
+                return True, f"Modem socket ready: {self.host}:{self.port}"
+        except Exception as e:
+            return False, f"Modem socket not ready: {e}"
+
     def send_packet(self, packet):
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
                 bytes_sent = sock.sendto(packet, (self.host, self.port))
-                return True, f"Sent {bytes_sent} bytes"
+            FRAMES_SENT.inc(1, FRAME_NAMES.get(packet[1], 'other'))
+            FRAME_BYTES_SENT.inc(bytes_sent)
+            return True, f"Sent {bytes_sent} bytes"
         except Exception as e:
+            FRAME_ERRORS.inc()
             return False, f"Error: {e}"
 
-    def send_file(self, filepath, quiet=False):
+    def send_file(self, filepath, quiet=False, trace_id=None):
+        """
+        Send a file to HSModem (multi-frame files go out twice)
+
+        Args:
+            filepath: File to send
+            quiet: Don't print per-frame progress
+            trace_id: Event id to stamp first/last frame times against in the latency trace
+        """
         try:
             with open(filepath, 'rb') as f:
                 file_data = f.read()
@@ -93,29 +156,55 @@ class HSModemFileTransfer:
             if not quiet:
                 print(f"Sending: {filename} ({file_size} bytes)")
 
+            started = time.monotonic()
             if file_size <= self.FIRST_FRAME_DATA_SIZE:
-                return self._send_single_frame(filename, file_data, quiet)
+                mode = 'single'
+                success, message = self._send_single_frame(filename, file_data, quiet, trace_id)
             else:
-                return self._send_multi_frame(filename, file_data, quiet)
+                mode = 'multi'
+                success, message = self._send_multi_frame(filename, file_data, quiet, trace_id)
+            if success:
+                AIRTIME_SECONDS.observe(time.monotonic() - started, mode)
+                MESSAGE_BYTES.observe(file_size)
+            return success, message
 
         except Exception as e:
             return False, f"Error: {e}"
 
-    def _send_single_frame(self, filename, file_data, quiet=False):
-        payload = bytearray()
+    def build_frames(self, filename, file_data):
+        """
+        Every HSModem packet for one file, in send order
 
-        filename_bytes = filename.encode('ascii', errors='replace')[:self.FILENAME_SIZE]
-        filename_field = filename_bytes.ljust(self.FILENAME_SIZE, b'\x00')
-        payload.extend(filename_field)
+        _send_single_frame / _send_multi_frame put these on the wire (the
+        multi-frame path sends the list twice). The first (or single) frame carries filename, filename CRC and the
+        3-byte size ahead of the data; the rest carry data only.
 
-        crc = self.calculate_crc16(filename_bytes)
-        payload.extend(struct.pack('<H', crc))
-        payload.extend(struct.pack('>I', len(file_data))[-3:])
-        payload.extend(file_data)
+        Returns:
+            List of TOTAL_PACKET_SIZE-byte packets
+        """
+        filename_bytes = filename.encode('ascii', errors='replace')[:self.FILENAME_SIZE]
+        header = bytearray(filename_bytes.ljust(self.FILENAME_SIZE, b'\x00'))
+        header.extend(struct.pack('<H', self.calculate_crc16(filename_bytes)))
+        header.extend(struct.pack('>I', len(file_data))[-3:])
 
         # USE TYPE_IMAGE (uncompressed - critical for proper frame reassembly)
-        packet = self.create_packet(self.TYPE_IMAGE, self.FRAME_SINGLE, payload)
+        if len(file_data) <= self.FIRST_FRAME_DATA_SIZE:
+            return [self.create_packet(self.TYPE_IMAGE, self.FRAME_SINGLE, header + file_data)]
+
+        packets = [self.create_packet(self.TYPE_IMAGE, self.FRAME_FIRST,
+                                      header + file_data[:self.FIRST_FRAME_DATA_SIZE])]
+        for offset in range(self.FIRST_FRAME_DATA_SIZE, len(file_data), self.PAYLOAD_SIZE):
+            end = offset + self.PAYLOAD_SIZE
+            frame_type = self.FRAME_LAST if end >= len(file_data) else self.FRAME_MIDDLE
+            packets.append(self.create_packet(self.TYPE_IMAGE, frame_type, file_data[offset:end]))
+        return packets
+
+    def _send_single_frame(self, filename, file_data, quiet=False, trace_id=None):
+        packet, = self.build_frames(filename, file_data)
         success, msg = self.send_packet(packet)
+        if success:
+            tracer.mark(trace_id, 'first_frame_sent')
+            tracer.mark(trace_id, 'last_frame_sent')
 
         if not quiet:
             print(f"Single frame sent: {len(packet)} bytes (IMAGE MODE - uncompressed)")
@@ -125,30 +214,37 @@ class HSModemFileTransfer:
 
         return success, "Single frame transmission complete"
 
-    def _send_multi_frame(self, filename, file_data, quiet=False):
-        file_size = len(file_data)
-        frames_needed = self._calc_frames(file_size)
+    def _send_pass(self, packets, label='', quiet=False):
+        """
+        Send every frame after the first (first frame is sent by the caller)
 
-        if not quiet:
-            print(f"Multi-frame transmission: {frames_needed} frames (IMAGE MODE - uncompressed)")
+        Returns:
+            (success, message) - message names the failed frame
+        """
+        frames_needed = len(packets)
+        for frame_num, packet in enumerate(packets[1:], start=2):
+            # Small delay to prevent modem buffer overflow
+            time.sleep(0.1)  # 100ms between frames
 
-        filename_bytes = filename.encode('ascii', errors='replace')[:self.FILENAME_SIZE]
-        filename_field = filename_bytes.ljust(self.FILENAME_SIZE, b'\x00')
-        crc = self.calculate_crc16(filename_bytes)
+            success, msg = self.send_packet(packet)
+            if not success:
+                return False, f"{label}Frame {frame_num} failed: {msg}"
 
-        first_payload = bytearray()
-        first_payload.extend(filename_field)
-        first_payload.extend(struct.pack('<H', crc))
-        first_payload.extend(struct.pack('>I', file_size)[-3:])
+            if not quiet:
+                print(f"{label}Frame {frame_num}/{frames_needed} sent")
+        return True, ""
 
-        first_data_chunk = file_data[:self.FIRST_FRAME_DATA_SIZE]
-        first_payload.extend(first_data_chunk)
+    def _send_multi_frame(self, filename, file_data, quiet=False, trace_id=None):
+        packets = self.build_frames(filename, file_data)
+        frames_needed = len(packets)
 
-        # USE TYPE_IMAGE (uncompressed - critical for proper frame reassembly)
-        packet = self.create_packet(self.TYPE_IMAGE, self.FRAME_FIRST, first_payload)
-        success, msg = self.send_packet(packet)
+        if not quiet:
+            print(f"Multi-frame transmission: {frames_needed} frames (IMAGE MODE - uncompressed)")
+
+        success, msg = self.send_packet(packets[0])
         if not success:
             return False, f"First frame failed: {msg}"
+        tracer.mark(trace_id, 'first_frame_sent')
 
         if not quiet:
             print(f"Frame 1/{frames_needed} sent")
@@ -156,30 +252,11 @@ class HSModemFileTransfer:
         # Delay AFTER first frame to give modem time to send announcement
         time.sleep(1.0)
 
-        remaining_data = file_data[self.FIRST_FRAME_DATA_SIZE:]
-        frame_num = 2
-
-        while remaining_data:
-            # Small delay to prevent modem buffer overflow
-            time.sleep(0.1)  # 100ms between frames
-
-            chunk_size = min(len(remaining_data), self.PAYLOAD_SIZE)
-            chunk = remaining_data[:chunk_size]
-            remaining_data = remaining_data[chunk_size:]
-
-            is_last = len(remaining_data) == 0
-            frame_type = self.FRAME_LAST if is_last else self.FRAME_MIDDLE
-
-            # USE TYPE_IMAGE (uncompressed - critical for proper frame reassembly)
-            packet = self.create_packet(self.TYPE_IMAGE, frame_type, chunk)
-            success, msg = self.send_packet(packet)
-            if not success:
-                return False, f"Frame {frame_num} failed: {msg}"
-
-            if not quiet:
-                print(f"Frame {frame_num}/{frames_needed} sent")
-
-            frame_num += 1
+        success, msg = self._send_pass(packets, quiet=quiet)
+        if not success:
+            return False, msg
+        # The receiver can assemble the file from here; pass 2 only fills gaps
+        tracer.mark(trace_id, 'last_frame_sent')
 
         # Delay AFTER last frame to ensure modem completes processing
         time.sleep(1.0)
@@ -192,36 +269,17 @@ class HSModemFileTransfer:
         time.sleep(2.0)  # Gap between first and second transmission
 
         # Retransmit first frame
-        packet = self.create_packet(self.TYPE_IMAGE, self.FRAME_FIRST, first_payload)
-        success, msg = self.send_packet(packet)
+        success, msg = self.send_packet(packets[0])
         if not quiet:
             print(f"[Pass 2] Frame 1/{frames_needed} sent")
 
         time.sleep(1.0)  # Delay after first frame for announcement
 
         # Retransmit all subsequent frames
-        remaining_data = file_data[self.FIRST_FRAME_DATA_SIZE:]
-        frame_num = 2
-
-        while remaining_data:
-            time.sleep(0.1)  # 100ms between frames
-
-            chunk_size = min(len(remaining_data), self.PAYLOAD_SIZE)
-            chunk = remaining_data[:chunk_size]
-            remaining_data = remaining_data[chunk_size:]
-
-            is_last = len(remaining_data) == 0
-            frame_type = self.FRAME_LAST if is_last else self.FRAME_MIDDLE
-
-            packet = self.create_packet(self.TYPE_IMAGE, frame_type, chunk)
-            success, msg = self.send_packet(packet)
-            if not success:
-                return False, f"[Pass 2] Frame {frame_num} failed: {msg}"
-
-            if not quiet:
-                print(f"[Pass 2] Frame {frame_num}/{frames_needed} sent")
-
-            frame_num += 1
+        success, msg = self._send_pass(packets, label='[Pass 2] ', quiet=quiet)
+        if not success:
+            return False, msg
+        tracer.mark(trace_id, 'retransmit_done')
 
         time.sleep(1.0)
 
@@ -265,10 +323,13 @@ async def handle_nostr_event(event, hsmodem_client, credit_client, nostr_bot, co
     # Duplicate check
     event_id = event.get('id', '')
     if event_id in processed_events:
+        EVENTS.inc(1, 'duplicate')
         return
     processed_events.add(event_id)
     if len(processed_events) > 50:
         processed_events.clear()
+    # Only admitted events open a latency trace span, stamped with this arrival time
+    received_at = time.time()
 
     # Extract event data
     event_kind = event.get('kind', 1)
@@ -290,12 +351,14 @@ async def handle_nostr_event(event, hsmodem_client, credit_client, nostr_bot, co
                 content += "..."
         except (json.JSONDecodeError, KeyError):
             # If we can't parse the repost, skip it
+            EVENTS.inc(1, 'invalid')
             return
     else:
         # Kind 1 (text notes) - use content directly
         content = event.get('content', '').strip()
 
     if not content or not pubkey_hex:
+        EVENTS.inc(1, 'invalid')
         return
 
     # Convert hex pubkey to npub (bech32)
@@ -304,28 +367,37 @@ async def handle_nostr_event(event, hsmodem_client, credit_client, nostr_bot, co
     # Check if user account exists (don't auto-create accounts)
     price_per_msg = config['pricing']['price_per_message_sats']
 
+    admission_started = time.monotonic()
     user = credit_client.get_user(npub)
     if user is None:
         # User hasn't topped up yet - silently ignore (no spam, no account creation)
+        EVENTS.inc(1, 'unknown_user')
         return
 
     # User exists - check if they can afford the message
     if not credit_client.can_spend(npub, price_per_msg):
         print(f"⚠️ Insufficient credits: {npub[:16]}...")
         print(f"💡 User needs to top up at: {config['bitsatcredit_extension']['url']}")
+        EVENTS.inc(1, 'insufficient_credits')
         return
 
     # Rate limiting
     current_time = time.time()
     if current_time - last_message_time < MIN_MESSAGE_INTERVAL:
         print(f"⏱️ Rate limited: {npub[:16]}...")
+        EVENTS.inc(1, 'rate_limited')
         return
 
     # Deduct credits via extension API
-    result = credit_client.spend_credits(npub, price_per_msg, memo="Satellite message")
+    # Event ID in the memo lets the ledger spot double-charges for the same event
+    result = credit_client.spend_credits(npub, price_per_msg, memo=f"Satellite message {event_id[:16]}")
     if not result:
         print(f"❌ Failed to deduct credits for {npub[:16]}...")
+        EVENTS.inc(1, 'spend_failed')
         return
+    ADMISSION_SECONDS.observe(time.monotonic() - admission_started)
+    tracer.mark(event_id, 'relay_receive', received_at)
+    tracer.mark(event_id, 'credit_admitted')
 
     new_balance = result.get('balance_sats', 0)
     print(f"💰 Credits deducted: {npub[:16]}... (remaining: {new_balance} sats)")
@@ -342,87 +414,99 @@ async def handle_nostr_event(event, hsmodem_client, credit_client, nostr_bot, co
             temp_file.write(event_bytes)
             temp_filename = temp_file.name
 
-        success, result_msg = hsmodem_client.send_file(temp_filename, quiet=True)
+        success, result_msg = hsmodem_client.send_file(temp_filename, quiet=True, trace_id=event_id)
         os.unlink(temp_filename)
 
         if success:
             print(f"✅ Sent plain text via TYPE_IMAGE (uncompressed)")
             last_message_time = current_time
+            EVENTS.inc(1, 'sent')
+
+            if startup.elapsed('first_relayed_event') is None:
+                startup.mark('first_relayed_event')
+                startup.print_report("Cold start to first relayed event")
 
-            # Send DM warning if balance is low (AFTER successful send)
-            dm_config = config.get('dm_notifications', {})
-            if dm_config.get('enabled', False):
-                critical_threshold = dm_config.get('critical_balance_threshold_sats', 10)
-                low_threshold = dm_config.get('low_balance_threshold_sats', 100)
-                sent_notifications = dm_config.get('sent_notifications', {})
-
-                # Critical balance warning
-                if new_balance <= critical_threshold and npub not in sent_notifications.get('critical', []):
-                    msg = dm_config['critical_balance_message'].format(
-                        balance=new_balance,
-                        messages=new_balance // price_per_msg if price_per_msg > 0 else 0
-                    )
-                    if nostr_bot.send_encrypted_dm(npub, msg):
-                        if 'critical' not in sent_notifications:
-                            sent_notifications['critical'] = []
-                        sent_notifications['critical'].append(npub)
-                        print(f"📨 Critical balance DM sent to {npub[:16]}...")
-
-                # Low balance warning
-                elif new_balance <= low_threshold and npub not in sent_notifications.get('low', []):
-                    msg = dm_config['low_balance_message'].format(
-                        balance=new_balance,
-                        messages=new_balance // price_per_msg if price_per_msg > 0 else 0
-                    )
-                    if nostr_bot.send_encrypted_dm(npub, msg):
-                        if 'low' not in sent_notifications:
-                            sent_notifications['low'] = []
-                        sent_notifications['low'].append(npub)
-                        print(f"📨 Low balance DM sent to {npub[:16]}...")
+            # Low/critical balance DM (AFTER successful send) - queued for the
+            # background notifier, never sent on the transmit path
+            if balance_notifier is not None:
+                balance_notifier.submit(npub, new_balance)
 
         else:
             print(f"❌ Satellite failed: {result_msg}")
+            EVENTS.inc(1, 'send_failed')
 
     except Exception as e:
         print(f"❌ Error: {e}")
+        EVENTS.inc(1, 'send_failed')
 
 
-async def bridge_mode(config):
+async def bridge_mode(config, nostr_bot=None):
     """Nostr to HSModem bridge with payment verification"""
+    global sent_notifications, balance_notifier
     print("BitSatRelay - Bitcoin Satellite Relay")
     print("=" * 50)
 
+    # Warnings survive restarts so users aren't warned again after a crash or upgrade
+    state_config = config.get('state', {})
+    sent_notifications = ExpiringStore(
+        'sent_notifications',
+        ttl=state_config.get('notification_ttl_hours', 168) * 3600,
+        max_entries=state_config.get('max_entries', 10000),
+        path=state_file(config, 'sent_notifications.json')
+    )
+
     # Initialize BitSatCredit extension client
     extension_url = config['bitsatcredit_extension']['url']
     credit_client = BitSatCreditClient(extension_url)
 
-    # Health check
-    if not credit_client.health_check():
+    # Initialize HSModem
+    hsmodem_config = config['hsmodem']
+    hsmodem_client = HSModemFileTransfer(
+        host=hsmodem_config['host'],
+        port=hsmodem_config['port']
+    )
+
+    # Credit API health and modem socket are checked in parallel
+    loop = asyncio.get_running_loop()
+    credit_healthy, (modem_ready, modem_msg) = await asyncio.gather(
+        loop.run_in_executor(None, credit_client.health_check),
+        loop.run_in_executor(None, hsmodem_client.check_ready)
+    )
+
+    if not credit_healthy:
         print(f"❌ BitSatCredit extension not accessible at {extension_url}")
         print("Please ensure LNbits and BitSatCredit extension are running")
         sys.exit(1)
 
     print(f"✅ BitSatCredit extension connected: {extension_url}")
+    startup.mark('credit_api', quiet=True)
 
-    # Initialize Nostr bot
-    nostr_config = config['nostr']
-    nostr_bot = NostrBot(
-        nostr_config['bot_nsec'],
-        nostr_config['relay_urls']
-    )
+    if modem_ready:
+        print(f"✅ {modem_msg}")
+        startup.mark('hsmodem_socket', quiet=True)
+    else:
+        # UDP to the modem is fire-and-forget; keep going and let sends report errors
+        print(f"⚠️ {modem_msg}")
 
-    # Initialize HSModem
-    hsmodem_config = config['hsmodem']
-    hsmodem_client = HSModemFileTransfer(
-        host=hsmodem_config['host'],
-        port=hsmodem_config['port']
-    )
+    # Use the shared Nostr client if one was handed in
+    nostr_config = config['nostr']
+    if nostr_bot is None:
+        nostr_bot = NostrBot.from_config(nostr_config)
+
+    dm_config = config.get('dm_notifications', {})
+    if dm_config.get('enabled', False):
+        balance_notifier = BalanceNotifier(
+            nostr_bot,
+            dm_config,
+            sent_notifications,
+            config['pricing']['price_per_message_sats'],
+            batch_window=dm_config.get('notification_batch_seconds', 2.0)
+        )
 
     print(f"\nMonitoring relay: {nostr_config['monitor_relay']}")
     print(f"Payment required: {config['pricing']['price_per_message_sats']} sats per message")
     print(f"Top-up page: {extension_url}")
     print("\nStarting bridge...")
-    await asyncio.sleep(2)
 
     relay_url = nostr_config['monitor_relay']
 
@@ -436,6 +520,7 @@ async def bridge_mode(config):
                 ])
                 await websocket.send(subscribe_msg)
                 print("✅ Connected to relay - waiting for messages (kind 1: notes, kind 6: reposts)...")
+                startup.mark('bridge', quiet=True)
 
                 async for message in websocket:
                     try:
@@ -460,81 +545,305 @@ async def bridge_mode(config):
             await asyncio.sleep(5)
 
 
-async def satellite_monitor_mode(config):
+def inbound_pipeline_enabled(config):
+    """Whether inbound files go through InboundPipeline (UDP receiver or scanner) rather than SatelliteMonitor"""
+    monitor_config = config.get('satellite_monitor', {})
+    return (monitor_config.get('udp_receiver', {}).get('enabled', False)
+            or monitor_config.get('scanner', {}).get('enabled', False))
+
+
+async def satellite_monitor_mode(config, nostr_bot=None):
     """Start satellite inbound monitoring"""
     print("\nSatellite Monitor - Inbound Message Processing")
     print("=" * 50)
 
-    # Startup delay to allow outbound bridge to establish connections first
-    startup_delay = config['satellite_monitor'].get('startup_delay_seconds', 5)
-    if startup_delay > 0:
-        print(f"⏳ Waiting {startup_delay}s for outbound system to initialize...")
-        await asyncio.sleep(startup_delay)
-        print("✅ Starting satellite monitor")
+    # Use the shared Nostr client if one was handed in; the monitor only
+    # needs a connected relay to publish to, not the outbound bridge
+    if nostr_bot is None:
+        nostr_bot = NostrBot.from_config(config['nostr'], connect_wait=0)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, nostr_bot.wait_ready, 1, 10.0)
+    print("✅ Starting satellite monitor")
 
-    # Initialize Nostr bot
-    nostr_config = config['nostr']
-    nostr_bot = NostrBot(
-        nostr_config['bot_nsec'],
-        nostr_config['relay_urls']
-    )
+    monitor_config = config['satellite_monitor']
+    udp_config = monitor_config.get('udp_receiver', {})
+    scanner_config = monitor_config.get('scanner', {})
+    pipeline_config = monitor_config.get('pipeline', {})
+    sources = []
+    udp_receiver = None
+    scanner = None
+
+    state_config = config.get('state', {})
+
+    if inbound_pipeline_enabled(config):
+        # Published events go to compressed segments instead of one moved file each
+        archive_config = monitor_config.get('archive', {})
+        event_archive = None
+        if archive_config.get('enabled', False):
+            archive_directory = Path(archive_config.get('directory', 'archive'))
+            if not archive_directory.is_absolute():
+                archive_directory = Path(__file__).parent / archive_directory
+            event_archive = EventArchive(
+                archive_directory,
+                segment_max_bytes=archive_config.get('segment_max_mb', 8) * 1024 * 1024,
+                segment_max_seconds=archive_config.get('segment_max_hours', 24) * 3600,
+                retention_days=archive_config.get('retention_days', 30)
+            )
+
+        # Both sources feed one staged read → decode → verify → dedup → publish pipeline
+        pipeline = InboundPipeline(
+            nostr_bot,
+            read_workers=pipeline_config.get('read_workers', 2),
+            verify_workers=pipeline_config.get('verify_workers'),
+            publish_workers=pipeline_config.get('publish_workers', 4),
+            queue_size=pipeline_config.get('queue_size', 64),
+            dedup=InboundDedup(
+                ExpiringStore(
+                    'inbound_ids',
+                    ttl=state_config.get('inbound_id_ttl_hours', 24) * 3600,
+                    max_entries=state_config.get('max_entries', 10000),
+                    path=state_file(config, 'inbound_ids.json')
+                ),
+                nostr_bot=nostr_bot if pipeline_config.get('dedup_across_hqs', True) else None
+            ),
+            verify_signatures=pipeline_config.get('verify_signatures', True),
+            archive=event_archive,
+            publish_batch_size=pipeline_config.get('publish_batch_size', 25),
+            verify_batch_size=pipeline_config.get('verify_batch_size', 32)
+        )
+        await pipeline.start()
+
+        async def report_pipeline(interval):
+            reported = 0
+            while True:
+                await asyncio.sleep(interval)
+                if pipeline.submitted != reported:
+                    reported = pipeline.submitted
+                    pipeline.print_stats()
+                    if udp_receiver is not None:
+                        udp = udp_receiver.stats()
+                        print(f"   udp      {udp['delivered']:6d} files {udp['dropped']:5d} dropped "
+                              f"({udp['complete_merged']} merged from both passes, {udp['failed']} incomplete, "
+                              f"{udp['pending']} waiting)")
+                    if scanner is not None:
+                        scan = scanner.stats()
+                        print(f"   scanner  {scan['ready']:6d} ready {scan['pending']:5d} settling "
+                              f"({scan['mode']}, {scan['scans']} scans of {scan['indexed']} files, "
+                              f"avg {scan['avg_scan_ms']}ms, max {scan['max_scan_ms']}ms)")
+                    if tracer.enabled:
+                        tracer.print_summary()
+
+        sources.append(report_pipeline(pipeline_config.get('stats_interval_seconds', 300)))
+
+    if udp_config.get('enabled', False):
+        # Frames straight from HSModem - no Oscar, no SMB share
+        async def on_file(filename, data, received_at):
+            print(f"🛰️ Reassembled {filename} ({len(data)} bytes) from UDP frames")
+            # Waits while the pipeline is full; the receiver queues (then drops) meanwhile
+            await pipeline.submit_data(filename, data, received_at=received_at)
+
+        _, udp_receiver = await start_udp_receiver(
+            udp_config.get('host', '0.0.0.0'),
+            udp_config.get('port', 40134),
+            on_file,
+            assembly_timeout=udp_config.get('assembly_timeout_seconds', 120),
+            max_pending=udp_config.get('max_pending_files', 64)
+        )
+        sources.append(udp_receiver.serve())
+
+    if scanner_config.get('enabled', False):
+        # Oscar's RX directory, scanned incrementally instead of listed in full
+        scanner = DirectoryScanner(
+            monitor_config['oscar_data_path'],
+            pattern=monitor_config.get('file_pattern', '*.txt'),
+            min_interval=scanner_config.get('min_interval_seconds', monitor_config.get('check_interval_seconds', 3)),
+            max_interval=scanner_config.get('max_interval_seconds', 30),
+            use_inotify=scanner_config.get('use_inotify', True)
+        )
+        processed_path = Path(monitor_config['processed_archive_path'])
+        max_retries = monitor_config.get('max_retries', 3)
+        failures = {}
+
+        def archive(path, status):
+            if event_archive is not None and status in ('published', 'duplicate'):
+                # The event itself is already in the archive
+                path.unlink()
+                return
+            processed_path.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(path), str(processed_path / path.name))
+
+        async def on_ready(path):
+            async def on_done(status):
+                if status in ('published', 'published_unarchived', 'duplicate', 'invalid'):
+                    failures.pop(path.name, None)
+                    try:
+                        await loop.run_in_executor(None, archive, path, status)
+                    except OSError as e:
+                        print(f"⚠️ Could not archive {path.name}: {e}")
+                elif failures.get(path.name, 0) < max_retries:
+                    # Picked up again once it has been seen unchanged for two more scans
+                    failures[path.name] = failures.get(path.name, 0) + 1
+                    scanner.forget(path.name)
+
+            # Waits while the pipeline is full, which slows scanning to match
+            await pipeline.submit_file(path, on_done)
+
+        sources.append(scanner.watch(on_ready))
+
+    if sources:
+        startup.mark('satellite_monitor', quiet=True)
+        try:
+            await asyncio.gather(*sources)
+        finally:
+            # Stops the workers, then persists the dedup window (so a restart doesn't
+            # re-relay recent messages) and seals the open archive segment
+            await pipeline.close()
+        return
+
+    # Legacy file monitor - only imported on this path
+    from satellite_monitor import SatelliteMonitor
 
     # Initialize satellite monitor
-    monitor_config = config['satellite_monitor']
     satellite_monitor = SatelliteMonitor(
         oscar_path=monitor_config['oscar_data_path'],
         processed_path=monitor_config['processed_archive_path'],
         nostr_bot=nostr_bot,
         config=monitor_config
     )
+    startup.mark('satellite_monitor', quiet=True)
 
     # Start monitoring
     await satellite_monitor.start_monitoring()
 
 
-async def dm_bot_mode(config):
+async def dm_bot_mode(config, nostr_bot=None):
     """Run DM bot for interactive commands"""
-    dm_bot = DMBot(config)
+    dm_bot = DMBot(config, nostr_bot=nostr_bot)
+    # The DM subscription is replayed by the pool as each relay connects
+    startup.mark('dm_bot', quiet=True)
     await dm_bot.monitor_dms()
 
 
+async def report_startup(nostr_bot, expected, timeout=30.0):
+    """Print the startup timing report once every subsystem is ready"""
+    loop = asyncio.get_running_loop()
+    connected = await loop.run_in_executor(None, nostr_bot.wait_ready, 1, timeout)
+    if connected:
+        startup.mark('nostr_relay', quiet=True)
+
+    deadline = time.monotonic() + timeout
+    while any(startup.elapsed(name) is None for name in expected) and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+    missing = [name for name in expected if startup.elapsed(name) is None]
+    startup.print_report("Startup timing")
+    print(f"   {len(nostr_bot.pool.connected_relays())}/{len(nostr_bot.relay_list)} relays connected")
+    if missing:
+        print(f"⚠️ Not ready after {timeout:.0f}s: {', '.join(missing)}")
+
+
+async def report_status(nostr_bot, interval):
+    """Periodic relay health summary (connect/OK latency, rejections, uptime per relay) and DM key cache"""
+    while True:
+        await asyncio.sleep(interval)
+        print(f"📡 Relay health ({len(nostr_bot.pool.connected_relays())}/{len(nostr_bot.relay_list)} connected):")
+        nostr_bot.print_relay_status()
+        cache = nostr_bot.nip04.stats()
+        print(f"🔐 NIP-04 shared-secret cache: {cache['hit_rate']:.0%} hit rate ({cache['hits']} hits, "
+              f"{cache['misses']} misses), {cache['cached_peers']}/{cache['capacity']} peers, "
+              f"{cache['evictions']} evicted")
+
+
 async def run_both_systems(config):
     """Run outbound bridge, inbound monitor, and DM bot in parallel"""
     print("BitSatRelay - Two-Way Satellite Communication + DM Bot")
     print("=" * 60)
-    print("🚀 Starting outbound bridge (Nostr → Satellite)")
-    print("=" * 60)
 
-    # Start outbound bridge first
-    bridge_task = asyncio.create_task(bridge_mode(config))
-
-    # Wait 2 seconds for outbound connections to establish
-    await asyncio.sleep(2)
-
-    print("\n📡 Starting inbound monitor (Satellite → Nostr)")
-    print("=" * 60)
+    # One process-wide Nostr client: one socket per relay, shared subscriptions
+    # and publish queues for the bridge, the inbound monitor and the DM bot.
+    # Connections open in the background; each subsystem waits only for what it needs.
+    nostr_bot = NostrBot.from_config(config['nostr'], connect_wait=0)
 
-    # Then start inbound monitor
-    monitor_task = asyncio.create_task(satellite_monitor_mode(config))
+    metrics_config = config.get('metrics', {})
+    metrics_server = None
+    if metrics_config.get('enabled', False):
+        try:
+            metrics_server = metrics.start_http_server(metrics_config.get('port', 9464),
+                                                       metrics_config.get('host', '127.0.0.1'))
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint not started: {e}")
+
+    tracing_config = config.get('tracing', {})
+    if tracing_config.get('enabled', False) and not inbound_pipeline_enabled(config):
+        # The legacy SatelliteMonitor doesn't report RX or publish times, so every
+        # uplinked event would be written off as lost
+        print("⚠️ Latency tracing needs the inbound pipeline (satellite_monitor.udp_receiver or "
+              "scanner enabled) - tracing disabled")
+    elif tracing_config.get('enabled', False):
+        # Outbound and inbound halves run in this process, so one tracer sees a whole round trip
+        trace_path = Path(tracing_config.get('path', 'traces/latency.jsonl'))
+        if not trace_path.is_absolute():
+            trace_path = Path(__file__).parent / trace_path
+        trace_path.parent.mkdir(parents=True, exist_ok=True)
+        tracer.configure(str(trace_path), loss_timeout=tracing_config.get('loss_timeout_seconds', 3600))
+
+    profiling_config = config.get('profiling', {})
+    profiler = None
+    if profiling_config.get('enabled', False):
+        # SIGUSR1 toggles a profiler, SIGUSR2 dumps task/thread stacks - no restart needed
+        profile_directory = Path(profiling_config.get('directory', 'profiles'))
+        if not profile_directory.is_absolute():
+            profile_directory = Path(__file__).parent / profile_directory
+        profiler = RuntimeProfiler(
+            profile_directory,
+            sample_interval=profiling_config.get('sample_interval_ms', 5) / 1000,
+            lag_interval=profiling_config.get('lag_interval_ms', 500) / 1000,
+            lag_warn_threshold=profiling_config.get('lag_warn_ms', 250) / 1000
+        )
+        try:
+            await profiler.start(profiling_config.get('control_port'),
+                                 profiling_config.get('control_host', '127.0.0.1'))
+        except OSError as e:
+            print(f"⚠️ Profiling control socket not started: {e}")
 
-    # Wait 1 second
-    await asyncio.sleep(1)
+    print("🚀 Starting outbound bridge (Nostr → Satellite)")
+    print("📡 Starting inbound monitor (Satellite → Nostr)")
+    tasks = [
+        asyncio.create_task(bridge_mode(config, nostr_bot=nostr_bot)),
+        asyncio.create_task(satellite_monitor_mode(config, nostr_bot=nostr_bot))
+    ]
 
     # Start DM bot if enabled
-    dm_task = None
+    expected = ['nostr_relay', 'credit_api', 'bridge', 'satellite_monitor']
     if config.get('dm_notifications', {}).get('enabled', False):
-        print("\n💬 Starting DM Bot (Interactive Commands)")
-        print("=" * 60)
-        dm_task = asyncio.create_task(dm_bot_mode(config))
+        print("💬 Starting DM Bot (Interactive Commands)")
+        tasks.append(asyncio.create_task(dm_bot_mode(config, nostr_bot=nostr_bot)))
+        expected.append('dm_bot')
+    print("=" * 60)
+
+    tasks.append(asyncio.create_task(report_startup(nostr_bot, expected)))
+    status_interval = config['nostr'].get('status_interval_seconds', 300)
+    if status_interval:
+        tasks.append(asyncio.create_task(report_status(nostr_bot, status_interval)))
 
     # Run all systems in parallel
     try:
-        if dm_task:
-            await asyncio.gather(bridge_task, monitor_task, dm_task)
-        else:
-            await asyncio.gather(bridge_task, monitor_task)
+        await asyncio.gather(*tasks)
     except asyncio.CancelledError:
         print("\n⏹️ Shutting down all systems...")
+    finally:
+        if balance_notifier is not None:
+            balance_notifier.close()
+        nostr_bot.close()
+        if sent_notifications is not None:
+            sent_notifications.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if tracer.enabled:
+            tracer.print_summary()
+            tracer.close()
+        if profiler is not None:
+            await profiler.close()
 
 
 def main():
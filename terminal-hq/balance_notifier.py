@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Background Balance Notifier for BitSatRelay
+Low/critical balance DMs fed by spend results, coalesced per user and sent
+in batches off the relay → satellite path
+"""
+
+import threading
+
+
+class BalanceNotifier:
+    def __init__(self, nostr_bot, dm_config, sent_notifications, price_per_msg, batch_window=2.0):
+        """
+        Args:
+            nostr_bot: NostrBot used to send the DMs
+            dm_config: 'dm_notifications' config section (thresholds and message templates)
+            sent_notifications: ExpiringStore of warnings already sent, keyed "<level>:<npub>"
+            price_per_msg: Sats per satellite message (for the "messages left" estimate)
+            batch_window: Seconds to collect spend results before sending a batch
+        """
+        self.nostr_bot = nostr_bot
+        self.dm_config = dm_config
+        self.sent = sent_notifications
+        self.price_per_msg = price_per_msg
+        self.batch_window = batch_window
+        self.critical_threshold = dm_config.get('critical_balance_threshold_sats', 10)
+        self.low_threshold = dm_config.get('low_balance_threshold_sats', 100)
+
+        self.pending = {}           # {npub: latest balance} - repeat spends coalesce
+        self.condition = threading.Condition()
+        self.stopping = False
+
+        # Counters
+        self.submitted = 0
+        self.coalesced = 0
+        self.sent_count = 0
+        self.failed = 0
+        self.batches = 0
+
+        self.thread = threading.Thread(target=self._run, name="balance-notifier", daemon=True)
+        self.thread.start()
+
+    def submit(self, npub, balance):
+        """Record a spend result; returns immediately"""
+        # Cheap pre-check so users above the low threshold never queue anything
+        if balance > self.low_threshold:
+            return
+        with self.condition:
+            self.submitted += 1
+            if npub in self.pending:
+                self.coalesced += 1
+            self.pending[npub] = balance
+            self.condition.notify()
+
+    def _level(self, npub, balance):
+        """Which warning (if any) this balance still needs"""
+        if balance <= self.critical_threshold:
+            return 'critical' if f"critical:{npub}" not in self.sent else None
+        if balance <= self.low_threshold and f"low:{npub}" not in self.sent:
+            return 'low'
+        return None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if self.stopping and not self.pending:
+                    return
+
+            with self.condition:
+                # Let a burst of spends land so each user gets at most one DM per batch
+                self.condition.wait_for(lambda: self.stopping, self.batch_window)
+                batch, self.pending = self.pending, {}
+            self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        messages = []
+        levels = {}
+        for npub, balance in batch.items():
+            level = self._level(npub, balance)
+            if level is None:
+                continue
+            template = self.dm_config[f'{level}_balance_message']
+            messages.append((npub, template.format(
+                balance=balance,
+                messages=balance // self.price_per_msg if self.price_per_msg > 0 else 0
+            )))
+            levels[npub] = level
+
+        if not messages:
+            return
+
+        self.batches += 1
+        try:
+            results = self.nostr_bot.send_encrypted_dms(messages)
+        except Exception as e:
+            print(f"❌ Balance notifier batch failed: {e}")
+            self.failed += len(messages)
+            return
+
+        for npub, delivered in results.items():
+            if delivered:
+                self.sent.add(f"{levels[npub]}:{npub}")
+                self.sent_count += 1
+                print(f"📨 {levels[npub].capitalize()} balance DM sent to {npub[:16]}...")
+            else:
+                self.failed += 1
+
+    def close(self, timeout=10.0):
+        """Send anything still pending, then stop"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'pending': len(self.pending),
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'sent': self.sent_count,
+                'failed': self.failed,
+                'batches': self.batches
+            }
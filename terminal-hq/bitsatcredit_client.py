@@ -6,6 +6,13 @@ Handles all credit operations via the LNbits BitSatCredit extension
 
 import requests
 from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+
+import metrics
+
+REQUEST_SECONDS = metrics.histogram('bitsat_credit_request_seconds',
+                                    'BitSatCredit API round trip (to response headers)', ('operation',))
+RESPONSES = metrics.counter('bitsat_credit_responses_total', 'BitSatCredit API responses', ('operation', 'status'))
 
 
 class BitSatCreditClient:
@@ -21,6 +28,14 @@ class BitSatCreditClient:
         self.session.headers.update({
             'Content-Type': 'application/json'
         })
+        self.session.hooks['response'].append(self._record_response)
+
+    @staticmethod
+    def _record_response(response, *args, **kwargs):
+        # Last path segment names the call: balance, can-spend, spend, invoice, ...
+        operation = urlsplit(response.url).path.rstrip('/').rsplit('/', 1)[-1]
+        REQUEST_SECONDS.observe(response.elapsed.total_seconds(), operation)
+        RESPONSES.inc(1, operation, str(response.status_code))
 
     def get_user(self, npub: str) -> Optional[Dict[str, Any]]:
         """
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Reply/Quote Context Resolver for BitSatRelay
+Batches event-id lookups into one REQ per relay over the pooled connections,
+finishes on EOSE, and keeps an LRU of resolved event snippets
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Lookup:
+    def __init__(self, sub_id):
+        self.sub_id = sub_id
+        self.ids = set()
+        self.found = {}            # {event_id: snippet}
+        self.relays = []
+        self.eose_relays = set()
+        self.unreachable = set()   # Relays the REQ never reached - no answer is coming
+        self.done = threading.Event()
+
+
+class EventContextResolver:
+    def __init__(self, pool, cache_size=1024, batch_window=0.05, timeout=2.0, relay_count=3,
+                 snippet_length=150, negative_ttl=60.0):
+        """
+        Event snippet lookups for reply/quote rendering
+
+        Args:
+            pool: RelayPool to query over
+            cache_size: Resolved snippets kept in the LRU
+            batch_window: Seconds to collect concurrent lookups into one REQ
+            timeout: Maximum seconds a lookup waits for relays
+            relay_count: Best-scoring relays queried in parallel per batch
+            snippet_length: Characters of content kept per event
+            negative_ttl: Seconds to remember that an id was not found anywhere
+        """
+        self.pool = pool
+        self.cache_size = cache_size
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.relay_count = relay_count
+        self.snippet_length = snippet_length
+        self.negative_ttl = negative_ttl
+
+        self.cache = OrderedDict()      # {event_id: snippet dict}
+        self.not_found = {}             # {event_id: expiry}
+        self.lock = threading.Lock()
+        self.collecting = None          # Batch still accepting ids
+        self.active = {}                # {sub_id: _Lookup} awaiting relay replies
+        self.sub_counter = itertools.count(1)
+
+        self.hits = 0
+        self.misses = 0
+        self.requests_sent = 0
+
+        pool.add_listener(self._on_message)
+
+    def _cache_get(self, event_id):
+        with self.lock:
+            snippet = self.cache.get(event_id)
+            if snippet is not None:
+                self.cache.move_to_end(event_id)
+                self.hits += 1
+                return True, snippet
+            expiry = self.not_found.get(event_id)
+            if expiry is not None:
+                if expiry > time.monotonic():
+                    self.hits += 1
+                    return True, None
+                del self.not_found[event_id]
+            self.misses += 1
+            return False, None
+
+    def _cache_put(self, event_id, snippet):
+        with self.lock:
+            if snippet is None:
+                now = time.monotonic()
+                if len(self.not_found) >= self.cache_size:
+                    self.not_found = {k: v for k, v in self.not_found.items() if v > now}
+                self.not_found[event_id] = now + self.negative_ttl
+                return
+            self.cache[event_id] = snippet
+            self.cache.move_to_end(event_id)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _snippet(self, event):
+        return {
+            'id': event.get('id'),
+            'pubkey': event.get('pubkey', ''),
+            'kind': event.get('kind'),
+            'created_at': event.get('created_at'),
+            'content': event.get('content', '')[:self.snippet_length]
+        }
+
+    def _submit(self, event_ids):
+        """Add ids to the batch being collected, starting one if needed"""
+        with self.lock:
+            lookup = self.collecting
+            if lookup is None:
+                lookup = _Lookup(f"ctx_{next(self.sub_counter)}")
+                self.collecting = lookup
+                timer = threading.Timer(self.batch_window, self._dispatch, args=(lookup,))
+                timer.daemon = True
+                timer.start()
+            lookup.ids.update(event_ids)
+            return lookup
+
+    def _dispatch(self, lookup):
+        """Send one REQ with every collected id to the best relays in parallel"""
+        with self.lock:
+            if self.collecting is lookup:
+                self.collecting = None
+            lookup.relays = self.pool.best_relays(self.relay_count)
+            self.active[lookup.sub_id] = lookup
+
+        request = json.dumps(["REQ", lookup.sub_id, {"ids": sorted(lookup.ids), "limit": len(lookup.ids)}])
+        for relay_url in lookup.relays:
+            if self.pool.send_to(relay_url, request):
+                self.requests_sent += 1
+            else:
+                # Nothing will come back from a relay we couldn't reach; it ends
+                # the wait for that relay but confirms nothing
+                lookup.unreachable.add(relay_url)
+
+        self._check_done(lookup)
+        if not lookup.done.is_set():
+            timer = threading.Timer(self.timeout, self._finish, args=(lookup,))
+            timer.daemon = True
+            timer.start()
+
+    def _on_message(self, relay_url, data):
+        if data[0] not in ("EVENT", "EOSE") or len(data) < 2:
+            return
+        lookup = self.active.get(data[1])
+        if lookup is None:
+            return
+
+        if data[0] == "EVENT" and len(data) > 2 and isinstance(data[2], dict):
+            event = data[2]
+            if event.get('id') in lookup.ids and event['id'] not in lookup.found:
+                lookup.found[event['id']] = self._snippet(event)
+        elif data[0] == "EOSE":
+            lookup.eose_relays.add(relay_url)
+        self._check_done(lookup)
+
+    def _check_done(self, lookup):
+        all_found = lookup.ids.issubset(lookup.found)
+        all_answered = set(lookup.relays).issubset(lookup.eose_relays | lookup.unreachable)
+        if all_found or all_answered:
+            self._finish(lookup)
+
+    def _finish(self, lookup):
+        with self.lock:
+            if self.active.pop(lookup.sub_id, None) is None:
+                return
+        # Free the subscription on every relay we asked
+        close = json.dumps(["CLOSE", lookup.sub_id])
+        for relay_url in lookup.relays:
+            if relay_url not in lookup.unreachable:
+                self.pool.send_to(relay_url, close)
+
+        # Only remember misses that relays confirmed (EOSE from at least one, and
+        # no reachable relay left unanswered) - not timeouts or an unreachable pool
+        confirmed = bool(lookup.eose_relays) and set(lookup.relays).issubset(
+            lookup.eose_relays | lookup.unreachable)
+        for event_id in lookup.ids:
+            snippet = lookup.found.get(event_id)
+            if snippet is not None or confirmed:
+                self._cache_put(event_id, snippet)
+        lookup.done.set()
+
+    def resolve_many(self, event_ids, timeout=None):
+        """
+        Snippets for many event ids at once
+
+        Returns:
+            {event_id: snippet dict or None if not found}
+        """
+        results = {}
+        missing = []
+        for event_id in dict.fromkeys(event_ids):
+            cached, snippet = self._cache_get(event_id)
+            if cached:
+                results[event_id] = snippet
+            else:
+                missing.append(event_id)
+
+        if missing:
+            lookup = self._submit(missing)
+            lookup.done.wait(self.batch_window + (self.timeout if timeout is None else timeout))
+            for event_id in missing:
+                results[event_id] = lookup.found.get(event_id)
+        return results
+
+    def resolve(self, event_id, timeout=None):
+        """Snippet for one event id (or None)"""
+        return self.resolve_many([event_id], timeout).get(event_id)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'cached': len(self.cache),
+                'not_found_cached': len(self.not_found),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'requests_sent': self.requests_sent,
+                'active_lookups': len(self.active)
+            }
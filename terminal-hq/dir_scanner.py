@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Incremental Directory Scanner for BitSatRelay
+Watches the inbound RX directory with an index of (name, size, mtime) so
+only new or changed files are handed on, once they have stopped growing.
+Uses inotify on local paths and adaptive polling on network mounts (SMB/gvfs)
+"""
+
+import asyncio
+import fnmatch
+import os
+import time
+from collections import deque
+from pathlib import Path
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+NETWORK_FILESYSTEMS = ('cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'fuse.gvfsd-fuse', 'fuse.sshfs', '9p')
+
+
+def filesystem_type(path):
+    """Filesystem type of the mount holding path (from /proc/mounts), or None"""
+    path = os.path.realpath(path)
+    best, best_type = '', None
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) \
+                        and len(mount_point) > len(best):
+                    best, best_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return best_type
+
+
+def is_local_path(path):
+    """True unless path sits on a network filesystem (gvfs mounts are always remote)"""
+    if '/gvfs/' in str(path):
+        return False
+    return filesystem_type(path) not in NETWORK_FILESYSTEMS
+
+
+class DirectoryScanner:
+    def __init__(self, path, pattern='*', min_interval=1.0, max_interval=30.0, use_inotify=True,
+                 history=100):
+        """
+        Args:
+            path: Directory to watch
+            pattern: fnmatch pattern for files of interest (e.g. "*.txt")
+            min_interval: Poll interval while files are arriving (seconds)
+            max_interval: Poll interval ceiling when idle; also the inotify safety rescan
+            use_inotify: Use inotify when the path is local and inotify_simple is installed
+            history: Scan cycles kept for the cost report
+        """
+        self.path = Path(path)
+        self.pattern = pattern
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.inotify = use_inotify and INotify is not None and is_local_path(self.path)
+
+        self.index = {}         # {name: (size, mtime_ns)} already handed on
+        self.pending = {}       # {name: (size, mtime_ns)} seen once, waiting to stop growing
+
+        # Counters
+        self.cycles = deque(maxlen=history)   # (duration_ms, entries, stats, ready)
+        self.scans = 0
+        self.scan_seconds = 0.0
+        self.ready_count = 0
+        self.inotify_events = 0
+
+    def scan(self):
+        """
+        One pass over the directory
+
+        Returns:
+            List of Paths that are new or changed and unchanged since the previous pass
+        """
+        started = time.perf_counter()
+        entries = stats = 0
+        ready = []
+        present = set()
+
+        try:
+            with os.scandir(self.path) as listing:
+                for entry in listing:
+                    entries += 1
+                    if not fnmatch.fnmatch(entry.name, self.pattern):
+                        continue
+                    try:
+                        stats += 1
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if not entry.is_file():
+                        continue
+
+                    name = entry.name
+                    present.add(name)
+                    signature = (st.st_size, st.st_mtime_ns)
+                    if self.index.get(name) == signature:
+                        continue
+                    if self.pending.get(name) == signature:
+                        # Same size and mtime as last pass - the writer is done
+                        del self.pending[name]
+                        self.index[name] = signature
+                        ready.append(self.path / name)
+                    else:
+                        self.pending[name] = signature
+        except OSError as e:
+            print(f"⚠️ Could not scan {self.path}: {e}")
+
+        # Files moved away (processed or cleaned up) leave the index
+        for table in (self.index, self.pending):
+            for name in [name for name in table if name not in present]:
+                del table[name]
+
+        duration = time.perf_counter() - started
+        self.scans += 1
+        self.scan_seconds += duration
+        self.ready_count += len(ready)
+        self.cycles.append((duration * 1000, entries, stats, len(ready)))
+        if ready:
+            print(f"🔍 Scan found {len(ready)} new file(s): {entries} entries, "
+                  f"{stats} stats, {duration * 1000:.1f}ms")
+        return ready
+
+    def forget(self, name):
+        """Drop a file from the index so it is picked up again (e.g. to retry)"""
+        self.index.pop(name, None)
+        self.pending.pop(name, None)
+
+    def _next_interval(self, ready):
+        # Poll fast while anything is arriving or settling, back off when idle
+        if ready or self.pending:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        return self.interval
+
+    async def watch(self, on_ready):
+        """
+        Hand every completed file to on_ready (awaited, one Path at a time), forever
+        """
+        loop = asyncio.get_running_loop()
+        print(f"👀 Watching {self.path} ({'inotify' if self.inotify else 'adaptive polling'})")
+        if self.inotify:
+            await self._watch_inotify(loop, on_ready)
+            return
+
+        while True:
+            ready = await loop.run_in_executor(None, self.scan)
+            for path in ready:
+                await on_ready(path)
+            await asyncio.sleep(self._next_interval(ready))
+
+    async def _watch_inotify(self, loop, on_ready):
+        notifier = INotify()
+        notifier.add_watch(str(self.path), inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+        woken = asyncio.Event()
+        loop.add_reader(notifier.fileno(), woken.set)
+        try:
+            # Files already sitting there before we started
+            for path in await loop.run_in_executor(None, self._scan_twice):
+                await on_ready(path)
+
+            while True:
+                try:
+                    await asyncio.wait_for(woken.wait(), self.max_interval)
+                except asyncio.TimeoutError:
+                    # Safety rescan in case an event was missed
+                    for path in await loop.run_in_executor(None, self.scan):
+                        await on_ready(path)
+                    continue
+                woken.clear()
+
+                for event in notifier.read(timeout=0):
+                    self.inotify_events += 1
+                    if not fnmatch.fnmatch(event.name, self.pattern):
+                        continue
+                    # close-after-write and rename-into both mean the file is complete
+                    path = self.path / event.name
+                    try:
+                        st = path.stat()
+                    except OSError:
+                        continue
+                    signature = (st.st_size, st.st_mtime_ns)
+                    if self.index.get(event.name) == signature:
+                        continue
+                    self.pending.pop(event.name, None)
+                    self.index[event.name] = signature
+                    self.ready_count += 1
+                    await on_ready(path)
+        finally:
+            loop.remove_reader(notifier.fileno())
+            notifier.close()
+
+    def _scan_twice(self):
+        ready = self.scan()
+        if self.pending:
+            time.sleep(self.min_interval)
+            ready += self.scan()
+        return ready
+
+    def stats(self):
+        recent = list(self.cycles)
+        return {
+            'mode': 'inotify' if self.inotify else 'polling',
+            'indexed': len(self.index),
+            'pending': len(self.pending),
+            'scans': self.scans,
+            'ready': self.ready_count,
+            'inotify_events': self.inotify_events,
+            'poll_interval': self.interval,
+            'last_scan_ms': round(recent[-1][0], 2) if recent else 0.0,
+            'last_scan_entries': recent[-1][1] if recent else 0,
+            'avg_scan_ms': round(self.scan_seconds * 1000 / self.scans, 2) if self.scans else 0.0,
+            'max_scan_ms': round(max(cycle[0] for cycle in recent), 2) if recent else 0.0
+        }
@@ -8,23 +8,29 @@ import asyncio
 import json
 import time
 import sys
-import websockets
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from nostr_bot import NostrBot
 from bitsatcredit_client import BitSatCreditClient
+from relay_health import _percentile
+from state_store import ExpiringStore, state_file
+import metrics
+
+DM_STAGE_SECONDS = metrics.histogram('bitsat_dm_stage_seconds', 'DM handling latency by stage', ('stage',))
+
+# Per-DM stages timed by the worker pool
+DM_STAGES = ('queue_wait', 'decrypt', 'process', 'reply', 'total')
 
 
 class DMBot:
-    def __init__(self, config):
-        """Initialize DM bot with config"""
+    def __init__(self, config, nostr_bot=None):
+        """Initialize DM bot with config (reuses the shared NostrBot if given)"""
         self.config = config
 
-        # Initialize Nostr bot for sending DMs
+        # Nostr client for receiving and sending DMs
         nostr_config = config['nostr']
-        self.nostr_bot = NostrBot(
-            nostr_config['bot_nsec'],
-            nostr_config['relay_urls']
-        )
+        self.nostr_bot = nostr_bot or NostrBot.from_config(nostr_config)
 
         # Initialize credit client
         self.credit_client = BitSatCreditClient(
@@ -32,84 +38,52 @@ class DMBot:
         )
 
         # Bot's pubkey (for filtering DMs)
-        from nostr.key import PrivateKey
-        private_key = PrivateKey.from_nsec(nostr_config['bot_nsec'])
-        self.private_key = private_key
-        self.bot_pubkey = private_key.public_key.hex()
+        self.private_key = self.nostr_bot.private_key
+        self.bot_pubkey = self.private_key.public_key.hex()
+        self.nip04 = self.nostr_bot.nip04
 
-        # Rate limiting: Track last DM time per user
-        self.last_dm_time = {}  # {npub: timestamp}
+        # Rate limiting: Track last DM time per user (entries expire with the limit)
         self.dm_rate_limit = 5.0  # Minimum seconds between DMs from same user
+        self.last_dm_time = ExpiringStore('dm_rate_limit', ttl=self.dm_rate_limit)  # {sender pubkey hex: timestamp}
+
+        # Event ids claimed by the reader - the same DM arrives once per relay, and
+        # relays replay recent DMs on reconnect, so the ids survive a restart
+        state_config = config.get('state', {})
+        self.processed_dm_ids = ExpiringStore(
+            'dm_ids',
+            ttl=state_config.get('dm_id_ttl_seconds', 3600),
+            max_entries=state_config.get('max_entries', 10000),
+            path=state_file(config, 'dm_ids.json')
+        )
 
-        # Track processed DM event IDs to prevent duplicate responses
-        self.processed_dm_ids = set()
+        # Handlers (decrypt, LNbits calls, reply) run on a bounded worker pool
+        dm_config = config.get('dm_notifications', {})
+        self.worker_count = dm_config.get('dm_workers', 4)
+        self.queue_size = dm_config.get('dm_queue_size', 100)
+        self.stats_interval = dm_config.get('stats_interval_seconds', 300)
+        self.executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="dm-worker")
+
+        # Per-stage latency samples (seconds) and counters
+        self.stage_latency = {stage: deque(maxlen=500) for stage in DM_STAGES}
+        self.counters = {'received': 0, 'duplicates': 0, 'rate_limited': 0, 'dropped': 0,
+                         'handled': 0, 'rejected': 0, 'failed': 0}
+        metrics.counter('bitsat_dms_total', 'DMs seen by the DM bot, by outcome', ('outcome',),
+                        callback=lambda: {(name,): value for name, value in self.counters.items()})
 
         print(f"✅ DM Bot initialized")
         print(f"   Bot pubkey: {self.bot_pubkey[:16]}...")
         print(f"   Rate limit: {self.dm_rate_limit}s per user")
+        print(f"   Workers: {self.worker_count} (queue {self.queue_size})")
 
     def decrypt_dm(self, encrypted_content, sender_pubkey_hex):
         """Decrypt NIP-04 encrypted DM content"""
         try:
-            import base64
-            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-            from cryptography.hazmat.backends import default_backend
-
-            # Skip empty or malformed content
-            if not encrypted_content or len(encrypted_content) < 20:
-                print(f"⚠️ DM content too short: {len(encrypted_content) if encrypted_content else 0} chars")
-                return None
-
-            # Check for ?iv= separator format (some clients use this)
-            if "?iv=" in encrypted_content:
-                parts = encrypted_content.split("?iv=")
-                if len(parts) == 2:
-                    ciphertext = base64.b64decode(parts[0])
-                    iv = base64.b64decode(parts[1])
-                else:
-                    print(f"⚠️ Invalid ?iv= format")
-                    return None
-            else:
-                # Standard format: IV+ciphertext concatenated
-                try:
-                    decoded = base64.b64decode(encrypted_content)
-                except Exception as e:
-                    print(f"⚠️ Base64 decode failed: {e}")
-                    return None
-
-                # Validate minimum length (16 byte IV + at least 16 byte ciphertext)
-                if len(decoded) < 32:
-                    print(f"⚠️ Decoded content too short: {len(decoded)} bytes")
-                    return None
-
-                # Extract IV (first 16 bytes) and ciphertext
-                iv = decoded[:16]
-                ciphertext = decoded[16:]
-
-            # Get shared secret using ECDH with nostr library
-            shared_secret = self.private_key.compute_shared_secret(sender_pubkey_hex)
-
-            # Decrypt using AES-256-CBC
-            cipher = Cipher(
-                algorithms.AES(shared_secret),
-                modes.CBC(iv),
-                backend=default_backend()
-            )
-            decryptor = cipher.decryptor()
-            plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-
-            # Remove PKCS7 padding
-            if len(plaintext) == 0:
-                print(f"⚠️ Plaintext is empty after decryption")
-                return None
-            padding_length = plaintext[-1]
-            if padding_length > len(plaintext) or padding_length > 16:
-                print(f"⚠️ Invalid padding: {padding_length}")
-                return None
-            plaintext = plaintext[:-padding_length]
-
-            return plaintext.decode('utf-8')
+            # Shared-secret cache is shared with the NostrBot that sends our replies
+            return self.nip04.decrypt(encrypted_content, sender_pubkey_hex)
 
+        except ValueError as e:
+            print(f"⚠️ {e}")
+            return None
         except Exception as e:
             print(f"❌ Decryption error: {e}")
             import traceback
@@ -333,94 +307,141 @@ class DMBot:
 
         return response, sender_npub
 
-    async def monitor_single_relay(self, relay_url):
-        """Monitor a single relay for DMs"""
+    def claim_dm_event(self, event):
+        """
+        Fast path run by the reader for every incoming kind 4 event
+
+        Claims the event id before any work so copies from other relays are
+        dropped, then applies the per-user rate limit.
+
+        Returns:
+            True if the event should be handed to a worker
+        """
+        self.counters['received'] += 1
+        event_id = event.get('id', '')
+        sender_pubkey = event.get('pubkey', '')
+
+        # Skip if already claimed (the same DM arrives from every relay)
+        if not event_id or event_id in self.processed_dm_ids:
+            self.counters['duplicates'] += 1
+            return False
+        self.processed_dm_ids.add(event_id)
+
+        # Skip if from bot itself
+        if sender_pubkey == self.bot_pubkey:
+            return False
+
+        # Rate limiting: Check if user is sending too fast (keyed by hex pubkey, no bech32 needed)
+        current_time = time.time()
+        last_time = self.last_dm_time.get(sender_pubkey)
+        if last_time is not None:
+            time_since_last = current_time - last_time
+            if time_since_last < self.dm_rate_limit:
+                self.counters['rate_limited'] += 1
+                print(f"⏱️ Rate limited: {sender_pubkey[:16]}... ({time_since_last:.1f}s since last DM)")
+                return False  # Skip this DM, don't respond
+
+        # Update last DM time for this user
+        self.last_dm_time.set(sender_pubkey, current_time)
+        return True
+
+    def handle_dm_event(self, event, received_at=None):
+        """
+        Decrypt, process and answer one claimed kind 4 event (runs on a worker thread)
+
+        Returns:
+            'handled', 'rejected' (could not be decrypted) or 'failed' (reply not sent)
+        """
+        started = time.monotonic()
+        if received_at is not None:
+            self._record_stage('queue_wait', started - received_at)
+
+        sender_pubkey = event.get('pubkey', '')
+
+        # Decrypt DM content (NIP-04)
+        decrypted_content = self.decrypt_dm(event.get('content', ''), sender_pubkey)
+        decrypted = time.monotonic()
+        self._record_stage('decrypt', decrypted - started)
+        if not decrypted_content:
+            print(f"⚠️ Could not decrypt DM from {sender_pubkey[:16]}...")
+            return 'rejected'
+
+        # Process DM and generate response (LNbits calls happen here)
+        response, sender_npub = self.process_dm(decrypted_content, sender_pubkey)
+        processed = time.monotonic()
+        self._record_stage('process', processed - decrypted)
+
+        # Send response
+        if response:
+            if not self.nostr_bot.send_encrypted_dm(sender_npub, response):
+                print(f"❌ Response to {sender_npub[:16]}... not sent")
+                return 'failed'
+            replied = time.monotonic()
+            self._record_stage('reply', replied - processed)
+            print(f"✅ Response sent to {sender_npub[:16]}... "
+                  f"(decrypt {(decrypted - started) * 1000:.0f}ms, process {(processed - decrypted) * 1000:.0f}ms, "
+                  f"reply {(replied - processed) * 1000:.0f}ms)")
+
+        self._record_stage('total', time.monotonic() - (received_at if received_at is not None else started))
+        return 'handled'
+
+    def _record_stage(self, stage, seconds):
+        self.stage_latency[stage].append(seconds)
+        DM_STAGE_SECONDS.observe(seconds, stage)
+
+    def stats(self):
+        """Counters plus p50/p90/max latency per stage in ms"""
+        latency = {}
+        for stage, samples in self.stage_latency.items():
+            values = list(samples)
+            if values:
+                latency[stage] = {
+                    'p50_ms': round(_percentile(values, 50) * 1000, 1),
+                    'p90_ms': round(_percentile(values, 90) * 1000, 1),
+                    'max_ms': round(max(values) * 1000, 1),
+                    'samples': len(values)
+                }
+        return {
+            **self.counters,
+            'latency': latency,
+            'state': {
+                'dm_ids': self.processed_dm_ids.stats(),
+                'dm_rate_limit': self.last_dm_time.stats()
+            }
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"📊 DM bot: {stats['received']} received, {stats['handled']} handled, {stats['rejected']} rejected, "
+              f"{stats['failed']} failed, {stats['duplicates']} duplicates, {stats['rate_limited']} rate limited, "
+              f"{stats['dropped']} dropped")
+        for stage, latency in stats['latency'].items():
+            print(f"   {stage:10s} p50 {latency['p50_ms']:8.1f}ms  p90 {latency['p90_ms']:8.1f}ms  "
+                  f"max {latency['max_ms']:8.1f}ms  ({latency['samples']} samples)")
+
+    async def _report_stats(self):
+        reported = 0
         while True:
-            try:
-                async with websockets.connect(relay_url) as websocket:
-                    # Subscribe to kind 4 DMs sent to bot
-                    # Use limit: 0 to only get NEW DMs (no historical messages)
-                    subscribe_msg = json.dumps([
-                        "REQ",
-                        "dm_monitor",
-                        {
-                            "kinds": [4],  # Encrypted DMs
-                            "#p": [self.bot_pubkey],  # Tagged to bot
-                            "limit": 0  # Only new DMs, not historical
-                        }
-                    ])
-                    await websocket.send(subscribe_msg)
-                    print(f"✅ [{relay_url}] Subscribed to DMs (new only)")
-
-                    # Process incoming DMs
-                    async for message in websocket:
-                        try:
-                            data = json.loads(message)
-
-                            # Check if it's an EVENT message
-                            if data[0] == "EVENT" and len(data) > 2:
-                                event = data[2]
-
-                                # Extract event details
-                                event_id = event.get('id', '')
-                                sender_pubkey = event.get('pubkey', '')
-                                dm_content = event.get('content', '')
-
-                                # Skip if already processed
-                                if event_id in self.processed_dm_ids:
-                                    continue
-
-                                # Skip if from bot itself
-                                if sender_pubkey == self.bot_pubkey:
-                                    continue
-
-                                # Convert sender pubkey to npub for rate limiting check
-                                try:
-                                    from nostr.key import PublicKey
-                                    sender_npub_check = PublicKey(bytes.fromhex(sender_pubkey)).bech32()
-                                except:
-                                    sender_npub_check = f"npub:{sender_pubkey[:16]}..."
-
-                                # Rate limiting: Check if user is sending too fast
-                                current_time = time.time()
-                                if sender_npub_check in self.last_dm_time:
-                                    time_since_last = current_time - self.last_dm_time[sender_npub_check]
-                                    if time_since_last < self.dm_rate_limit:
-                                        print(f"⏱️ Rate limited: {sender_npub_check[:16]}... ({time_since_last:.1f}s since last DM)")
-                                        continue  # Skip this DM, don't respond
-
-                                # Update last DM time for this user
-                                self.last_dm_time[sender_npub_check] = current_time
-
-                                # Decrypt DM content (NIP-04)
-                                decrypted_content = self.decrypt_dm(dm_content, sender_pubkey)
-                                if not decrypted_content:
-                                    print(f"⚠️ Could not decrypt DM from {sender_npub_check[:16]}...")
-                                    continue
-
-                                # Process DM and generate response
-                                response, sender_npub = self.process_dm(decrypted_content, sender_pubkey)
-
-                                # Send response
-                                if response:
-                                    self.nostr_bot.send_encrypted_dm(sender_npub, response)
-                                    print(f"✅ Response sent to {sender_npub[:16]}...")
-
-                                # Mark as processed
-                                self.processed_dm_ids.add(event_id)
-
-                        except (json.JSONDecodeError, KeyError, IndexError):
-                            continue
-                        except Exception as e:
-                            print(f"Error processing DM: {e}")
+            await asyncio.sleep(self.stats_interval)
+            if self.counters['received'] != reported:
+                reported = self.counters['received']
+                self.print_stats()
 
+    async def _worker(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            event, received_at = await queue.get()
+            try:
+                outcome = await loop.run_in_executor(self.executor, self.handle_dm_event, event, received_at)
+                self.counters[outcome] += 1
             except Exception as e:
-                print(f"❌ [{relay_url}] Connection error: {e}")
-                print(f"   Reconnecting in 5 seconds...")
-                await asyncio.sleep(5)
+                self.counters['failed'] += 1
+                print(f"Error processing DM: {e}")
+            finally:
+                queue.task_done()
 
     async def monitor_dms(self):
-        """Monitor all relays for DMs sent to bot"""
+        """Monitor all relays for DMs sent to bot over the shared relay pool"""
         relay_urls = self.config['nostr']['relay_urls']
 
         print(f"\n📬 DM Bot - Monitoring for incoming messages")
@@ -430,11 +451,45 @@ class DMBot:
             print(f"   • {relay}")
         print()
 
-        # Create tasks for all relays
-        tasks = [self.monitor_single_relay(relay) for relay in relay_urls]
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
 
-        # Run all relay monitors in parallel
-        await asyncio.gather(*tasks)
+        def ingest(event):
+            # Reader: claim + rate limit on the event loop, never blocks on I/O
+            if not self.claim_dm_event(event):
+                return
+            try:
+                queue.put_nowait((event, time.monotonic()))
+            except asyncio.QueueFull:
+                self.counters['dropped'] += 1
+                print(f"⚠️ DM queue full ({self.queue_size}) - dropping {event.get('id', '')[:16]}...")
+
+        def on_relay_message(relay_url, data):
+            # Called on relay reader threads - hand off to the event loop
+            if data[0] == "EVENT" and len(data) > 2 and data[1] == "dm_monitor" and isinstance(data[2], dict):
+                loop.call_soon_threadsafe(ingest, data[2])
+
+        self.nostr_bot.pool.add_listener(on_relay_message)
+
+        # Subscribe to kind 4 DMs sent to bot on every relay (replayed on reconnect)
+        # Use limit: 0 to only get NEW DMs (no historical messages)
+        self.nostr_bot.pool.subscribe("dm_monitor", [{
+            "kinds": [4],  # Encrypted DMs
+            "#p": [self.bot_pubkey],  # Tagged to bot
+            "limit": 0  # Only new DMs, not historical
+        }])
+        print(f"✅ Subscribed to DMs on {len(relay_urls)} relays (new only)")
+
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.worker_count)]
+        if self.stats_interval:
+            workers.append(asyncio.create_task(self._report_stats()))
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(wait=False)
+            self.processed_dm_ids.close()
 
 
 async def main():
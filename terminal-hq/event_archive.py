@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Inbound Event Archive for BitSatRelay
+Append-only, gzip-compressed segment files of relayed satellite events with
+a compact index by event id, pubkey and time. Retention drops whole segments;
+any time range can be replayed for re-publishing or analysis
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+
+
+class EventArchive:
+    def __init__(self, directory, segment_max_bytes=8 * 1024 * 1024, segment_max_seconds=86400,
+                 retention_days=30, quiet=False):
+        """
+        Args:
+            directory: Local directory for segment (.jsonl.gz) and index (.idx) files
+            segment_max_bytes: Uncompressed bytes before rolling to a new segment
+            segment_max_seconds: Age before rolling to a new segment
+            retention_days: Segments whose newest event is older than this are deleted (0 = keep)
+            quiet: Don't log loading and retention (for the replay CLI)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.retention_seconds = retention_days * 86400
+        self.quiet = quiet
+
+        self.lock = threading.Lock()
+        self.segments = {}      # {name: {'first': at, 'last': at, 'count': n}} oldest first
+        self.ids = {}           # {event_id: segment name}
+        self.pubkeys = {}       # {pubkey: set of segment names}
+
+        # Active segment
+        self.active = None
+        self.gzip_file = None
+        self.index_file = None
+        self.active_bytes = 0
+        self.active_opened = 0.0
+
+        # Counters
+        self.appended = 0
+        self.duplicates = 0
+        self.raw_bytes = 0
+        self.dropped_segments = 0
+
+        self._load()
+        self.enforce_retention()
+
+    def _paths(self, name):
+        return self.directory / f"{name}.jsonl.gz", self.directory / f"{name}.idx"
+
+    def _load(self):
+        """Rebuild the in-memory index from the .idx files"""
+        for index_path in sorted(self.directory.glob('*.idx')):
+            name = index_path.stem
+            try:
+                with open(index_path) as f:
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) == 4:
+                            self._index(name, fields[0], fields[1], float(fields[3]))
+            except OSError as e:
+                print(f"⚠️ Could not read archive index {index_path}: {e}")
+        if self.ids and not self.quiet:
+            print(f"📂 Archive: {len(self.ids)} events in {len(self.segments)} segments at {self.directory}")
+
+    def _index(self, name, event_id, pubkey, at):
+        segment = self.segments.setdefault(name, {'first': at, 'last': at, 'count': 0})
+        segment['first'] = min(segment['first'], at)
+        segment['last'] = max(segment['last'], at)
+        segment['count'] += 1
+        self.ids[event_id] = name
+        self.pubkeys.setdefault(pubkey, set()).add(name)
+
+    def _roll(self, now):
+        """Close the active segment (writing its gzip trailer) and start a new one"""
+        self._close_active()
+        name = f"segment-{int(now * 1000):013d}"
+        while name in self.segments:
+            name += "a"
+        segment_path, index_path = self._paths(name)
+        self.gzip_file = gzip.open(segment_path, 'ab')
+        self.index_file = open(index_path, 'a')
+        self.active = name
+        self.active_bytes = 0
+        self.active_opened = now
+        self.segments[name] = {'first': now, 'last': now, 'count': 0}
+
+    def _close_active(self):
+        if self.gzip_file is not None:
+            self.gzip_file.close()
+            self.index_file.close()
+        self.gzip_file = self.index_file = self.active = None
+
+    def append(self, event, source=None, at=None):
+        """
+        Archive one relayed event
+
+        Args:
+            event: Nostr event dict (must have id and pubkey)
+            source: Where it came from (file name, "udp", ...)
+            at: Archive time (default: now)
+
+        Returns:
+            True if written, False if that event id is already archived
+        """
+        at = time.time() if at is None else at
+        record = json.dumps({'at': round(at, 3), 'source': source, 'event': event},
+                            separators=(',', ':')).encode('utf-8') + b'\n'
+
+        rolled = False
+        with self.lock:
+            if event['id'] in self.ids:
+                self.duplicates += 1
+                return False
+            if self.active is None or self.active_bytes + len(record) > self.segment_max_bytes \
+                    or at - self.active_opened > self.segment_max_seconds:
+                self._roll(at)
+                rolled = True
+
+            self.gzip_file.write(record)
+            # Sync flush keeps the compression window but makes every record readable now
+            self.gzip_file.flush(zlib.Z_SYNC_FLUSH)
+            self.index_file.write(f"{event['id']} {event['pubkey']} {event.get('created_at', 0)} {at:.3f}\n")
+            self.index_file.flush()
+
+            self._index(self.active, event['id'], event['pubkey'], at)
+            self.active_bytes += len(record)
+            self.raw_bytes += len(record)
+            self.appended += 1
+
+        if rolled:
+            self.enforce_retention(at)
+        return True
+
+    def __contains__(self, event_id):
+        return event_id in self.ids
+
+    def _read_segment(self, name):
+        """Records of one segment in write order (tolerates an unfinished active segment)"""
+        segment_path, _ = self._paths(name)
+        try:
+            with gzip.open(segment_path, 'rb') as f:
+                for line in f:
+                    if line.endswith(b'\n'):
+                        yield json.loads(line)
+        except EOFError:
+            # Active segment: no gzip trailer yet, everything flushed has been read
+            return
+        except OSError as e:
+            print(f"⚠️ Could not read archive segment {segment_path.name}: {e}")
+
+    def get(self, event_id):
+        """Archived event by id, or None"""
+        name = self.ids.get(event_id)
+        if name is None:
+            return None
+        for record in self._read_segment(name):
+            if record['event']['id'] == event_id:
+                return record['event']
+        return None
+
+    def replay(self, since=None, until=None, pubkey=None):
+        """
+        Archived records in time order, reading only the segments that overlap the range
+
+        Args:
+            since: Earliest archive time (unix seconds, inclusive)
+            until: Latest archive time (unix seconds, inclusive)
+            pubkey: Only events by this author
+
+        Yields:
+            Dicts with at, source and event
+        """
+        with self.lock:
+            names = [name for name, segment in self.segments.items()
+                     if (since is None or segment['last'] >= since)
+                     and (until is None or segment['first'] <= until)
+                     and (pubkey is None or name in self.pubkeys.get(pubkey, ()))]
+
+        for name in names:
+            for record in self._read_segment(name):
+                if since is not None and record['at'] < since:
+                    continue
+                if until is not None and record['at'] > until:
+                    break
+                if pubkey is not None and record['event'].get('pubkey') != pubkey:
+                    continue
+                yield record
+
+    def enforce_retention(self, now=None):
+        """Delete whole segments older than the retention window"""
+        if not self.retention_seconds:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention_seconds
+        with self.lock:
+            expired = [name for name, segment in self.segments.items()
+                       if segment['last'] < cutoff and name != self.active]
+            for name in expired:
+                del self.segments[name]
+                for path in self._paths(name):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+            if expired:
+                gone = set(expired)
+                self.ids = {event_id: name for event_id, name in self.ids.items() if name not in gone}
+                for pubkey in list(self.pubkeys):
+                    self.pubkeys[pubkey] -= gone
+                    if not self.pubkeys[pubkey]:
+                        del self.pubkeys[pubkey]
+                self.dropped_segments += len(expired)
+        if expired and not self.quiet:
+            print(f"🗑️ Archive retention dropped {len(expired)} segment(s)")
+        return len(expired)
+
+    def close(self):
+        with self.lock:
+            self._close_active()
+
+    def stats(self):
+        with self.lock:
+            disk = sum(os.path.getsize(path) for name in self.segments for path in self._paths(name)
+                       if path.exists())
+            return {
+                'events': len(self.ids),
+                'segments': len(self.segments),
+                'active_segment': self.active,
+                'appended': self.appended,
+                'duplicates': self.duplicates,
+                'dropped_segments': self.dropped_segments,
+                'disk_bytes': disk,
+                'compression_ratio': round(self.raw_bytes / disk, 2) if self.raw_bytes and disk else 0.0
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay archived satellite events as JSON lines")
+    parser.add_argument('directory', help="Archive directory")
+    parser.add_argument('--since', type=float, help="Unix time to start from")
+    parser.add_argument('--until', type=float, help="Unix time to stop at")
+    parser.add_argument('--hours', type=float, help="Replay the last N hours")
+    parser.add_argument('--pubkey', help="Only events by this author (hex)")
+    parser.add_argument('--records', action='store_true', help="Print archive records, not bare events")
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else args.since
+    archive = EventArchive(args.directory, retention_days=0, quiet=True)
+    for record in archive.replay(since, args.until, args.pubkey):
+        print(json.dumps(record if args.records else record['event'], separators=(',', ':')))
+
+
+if __name__ == "__main__":
+    main()
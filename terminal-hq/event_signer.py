@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Event Signer for BitSatRelay
+NIP-01 event id computation and BIP-340 schnorr signing with a cached keypair,
+using the fastest secp256k1 backend available
+"""
+
+import hashlib
+import json
+import time
+
+
+def serialize_event(event):
+    """NIP-01 canonical serialization: [0, pubkey, created_at, kind, tags, content]"""
+    return json.dumps([
+        0,
+        event["pubkey"],
+        event["created_at"],
+        event["kind"],
+        event["tags"],
+        event["content"]
+    ], separators=(',', ':'), ensure_ascii=False)
+
+
+def compute_event_id(event):
+    """SHA256 of the serialized event, hex encoded"""
+    return hashlib.sha256(serialize_event(event).encode('utf-8')).hexdigest()
+
+
+_verify_schnorr = None
+
+
+def _load_verifier():
+    """Schnorr verify(pubkey, digest, sig) from the first installed backend"""
+    try:
+        from coincurve import PublicKeyXOnly
+        return lambda pubkey, digest, sig: PublicKeyXOnly(pubkey).verify(sig, digest)
+    except ImportError:
+        pass
+    try:
+        import secp256k1
+        return lambda pubkey, digest, sig: secp256k1.PublicKey(b'\x02' + pubkey, True).schnorr_verify(
+            digest, sig, None, True)
+    except ImportError:
+        raise ImportError("No schnorr verification backend available (tried: coincurve, secp256k1)")
+
+
+def verify_event(event):
+    """
+    Check a received event's NIP-01 id and BIP-340 signature
+
+    Module-level (and picklable) so it can run in a process pool.
+
+    Returns:
+        True if the id matches the event content and sig is valid for pubkey
+    """
+    global _verify_schnorr
+    try:
+        digest = hashlib.sha256(serialize_event(event).encode('utf-8')).digest()
+        if digest.hex() != event.get('id'):
+            return False
+        if _verify_schnorr is None:
+            _verify_schnorr = _load_verifier()
+        return bool(_verify_schnorr(bytes.fromhex(event['pubkey']), digest, bytes.fromhex(event['sig'])))
+    except ImportError:
+        raise
+    except Exception:
+        return False
+
+
+def verify_events(events):
+    """
+    verify_event for a batch - one process-pool round trip for many events
+
+    Returns:
+        List of bools, in the order of events
+    """
+    return [verify_event(event) for event in events]
+
+
+class EventSigner:
+    def __init__(self, private_key, backend=None):
+        """
+        Reusable signer for one bot identity
+
+        Args:
+            private_key: nostr.key.PrivateKey of the bot
+            backend: Force 'secp256k1', 'coincurve' or 'nostr' (default: fastest installed)
+        """
+        self.private_key = private_key
+        self.pubkey_hex = private_key.public_key.hex()
+        self.backend, self._sign_hash = self._load_backend(backend)
+
+    def _load_backend(self, preferred):
+        raw_secret = self.private_key.raw_secret
+        # A cached secp256k1 key is fastest; coincurve re-verifies every signature
+        candidates = [preferred] if preferred else ['secp256k1', 'coincurve', 'nostr']
+
+        for name in candidates:
+            try:
+                if name == 'coincurve':
+                    import coincurve
+                    key = coincurve.PrivateKey(raw_secret)
+                    return name, lambda digest: key.sign_schnorr(digest).hex()
+
+                if name == 'secp256k1':
+                    import secp256k1
+                    # Build the key (and its libsecp256k1 context) once, not per signature
+                    key = secp256k1.PrivateKey(raw_secret)
+                    return name, lambda digest: key.schnorr_sign(digest, None, raw=True).hex()
+
+                if name == 'nostr':
+                    return name, self.private_key.sign_message_hash
+
+            except ImportError:
+                continue
+
+        raise ImportError(f"No schnorr signing backend available (tried: {', '.join(candidates)})")
+
+    def sign(self, event):
+        """
+        Fill in pubkey, id and sig on an event dict (in place)
+
+        Args:
+            event: Dict with created_at, kind, tags, content (pubkey optional)
+
+        Returns:
+            The same dict, now signed
+        """
+        event.setdefault("pubkey", self.pubkey_hex)
+        serialized = serialize_event(event).encode('utf-8')
+        digest = hashlib.sha256(serialized).digest()
+        event["id"] = digest.hex()
+        event["sig"] = self._sign_hash(digest)
+        return event
+
+    def build_event(self, kind, content, tags=None, created_at=None):
+        """Create and sign a new event from the bot's key"""
+        return self.sign({
+            "pubkey": self.pubkey_hex,
+            "created_at": int(time.time()) if created_at is None else created_at,
+            "kind": kind,
+            "tags": tags or [],
+            "content": content
+        })
+
+    def sign_many(self, events):
+        """Sign a burst of events; returns them in the same order"""
+        return [self.sign(event) for event in events]
+
+
+def benchmark(count=2000, content_size=280):
+    """Signatures per second for every installed backend"""
+    from nostr.key import PrivateKey
+
+    private_key = PrivateKey()
+    results = {}
+
+    for backend in ('secp256k1', 'coincurve', 'nostr'):
+        try:
+            signer = EventSigner(private_key, backend=backend)
+        except ImportError:
+            continue
+
+        events = [
+            {"created_at": 1700000000 + i, "kind": 1, "tags": [['p', 'ab' * 32]], "content": "x" * content_size}
+            for i in range(count)
+        ]
+        start = time.perf_counter()
+        signer.sign_many(events)
+        elapsed = time.perf_counter() - start
+        results[backend] = count / elapsed
+
+    # Old path for reference: throwaway wrapper object + sign_event per call
+    class EventForSigning:
+        def __init__(self, event_id):
+            self.id = event_id
+            self.signature = None
+
+    start = time.perf_counter()
+    for i in range(count):
+        event = {"pubkey": private_key.public_key.hex(), "created_at": 1700000000 + i, "kind": 1,
+                 "tags": [['p', 'ab' * 32]], "content": "x" * content_size}
+        temp_event = EventForSigning(compute_event_id(event))
+        private_key.sign_event(temp_event)
+    results['legacy'] = count / (time.perf_counter() - start)
+
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Signing benchmark ({count} events, 280 char content)")
+    print("=" * 50)
+    for name, rate in benchmark(count).items():
+        print(f"{name:>10}: {rate:,.0f} signatures/sec")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Inbound Duplicate Suppression for BitSatRelay
+Drops satellite messages already relayed - the second redundancy pass, a
+file seen twice, or a downlink another HQ already quoted - keyed on the
+embedded event id, before anything is signed or published
+"""
+
+import time
+
+
+class InboundDedup:
+    def __init__(self, seen_ids, nostr_bot=None, lookback=3600):
+        """
+        Args:
+            seen_ids: ExpiringStore of relayed event ids (persisted, bounded window)
+            nostr_bot: NostrBot whose pool to watch for quote notes from other HQs
+                       sharing the bot key (None = local dedup only)
+            lookback: Seconds of past quote notes to fetch when subscribing
+        """
+        self.seen_ids = seen_ids
+
+        # Counters
+        self.accepted = 0
+        self.suppressed = {'local': 0, 'relay': 0}
+        self.learned = 0
+
+        if nostr_bot is not None:
+            # Every quote or digest note carries a q tag per relayed event;
+            # seeing one from any HQ marks that event as already handled
+            self.bot_pubkey = nostr_bot.signer.pubkey_hex
+            nostr_bot.pool.add_listener(self._on_message)
+            nostr_bot.pool.subscribe("inbound_dedup", [{
+                "kinds": [1],
+                "authors": [self.bot_pubkey],
+                "since": int(time.time()) - int(lookback)
+            }])
+
+    def claim(self, event_id):
+        """
+        Reserve an event id for relaying
+
+        Returns:
+            True if the caller should publish it, False if it is a duplicate
+        """
+        origin = self.seen_ids.get(event_id)
+        if origin is not None:
+            self.suppressed[origin if origin in self.suppressed else 'local'] += 1
+            return False
+        self.seen_ids.set(event_id, 'local')
+        self.accepted += 1
+        return True
+
+    def release(self, event_id):
+        """Forget a claimed id whose publish failed, so a later copy can retry"""
+        self.seen_ids.discard(event_id)
+
+    def _on_message(self, relay_url, data):
+        if data[0] != "EVENT" or len(data) < 3 or data[1] != "inbound_dedup":
+            return
+        event = data[2]
+        if not isinstance(event, dict) or event.get('pubkey') != self.bot_pubkey:
+            return
+        for tag in event.get('tags', []):
+            if len(tag) > 1 and tag[0] == 'q' and tag[1] not in self.seen_ids:
+                self.seen_ids.set(tag[1], 'relay')
+                self.learned += 1
+
+    def close(self):
+        self.seen_ids.close()
+
+    def stats(self):
+        return {
+            'accepted': self.accepted,
+            'suppressed': sum(self.suppressed.values()),
+            'suppressed_local': self.suppressed['local'],
+            'suppressed_other_hq': self.suppressed['relay'],
+            'learned_from_relays': self.learned,
+            'window': len(self.seen_ids)
+        }
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Inbound Satellite Pipeline for BitSatRelay
+Staged read → decode → verify → dedup → publish path for received files,
+connected by bounded queues so a slow publish never stalls reading, with
+signature checks in a process pool and per-stage throughput stats
+"""
+
+import asyncio
+import gzip
+import json
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from event_signer import verify_events
+from inbound_dedup import InboundDedup
+from latency_trace import tracer
+from state_store import ExpiringStore
+import metrics
+
+
+def decode_payload(data):
+    """
+    Nostr event dict from a received file: plain JSON, or zlib/gzip-compressed JSON
+
+    Returns:
+        Event dict, or None if the payload isn't an event
+    """
+    try:
+        if data[:2] == b'\x1f\x8b':
+            data = gzip.decompress(data)
+        elif data[:1] == b'\x78':
+            data = zlib.decompress(data)
+        event = json.loads(data.decode('utf-8').strip('\x00 \r\n'))
+    except Exception:
+        return None
+    if isinstance(event, dict) and all(key in event for key in ('id', 'pubkey', 'sig')):
+        return event
+    return None
+
+
+def _read_file(path):
+    """File contents and its mtime - when the modem software finished writing it"""
+    data = path.read_bytes()
+    return data, path.stat().st_mtime
+
+
+class _Stage:
+    def __init__(self, name, handler, workers, queue_size, batch_size=1):
+        """
+        batch_size > 1: each worker takes whatever is queued (up to batch_size)
+        and the handler gets a list of items and returns a list of results
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(queue_size)
+
+        # Counters
+        self.processed = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+
+    async def put(self, item):
+        await self.queue.put(item)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+
+class InboundPipeline:
+    def __init__(self, nostr_bot, read_workers=2, verify_workers=None, publish_workers=4,
+                 queue_size=64, dedup=None, verify_signatures=True, archive=None, publish_batch_size=25,
+                 verify_batch_size=32):
+        """
+        Args:
+            nostr_bot: NostrBot that rebroadcasts and quotes each verified event
+            read_workers: Concurrent file reads (threads - network mounts block)
+            verify_workers: Signature-check processes (default: CPU count)
+            publish_workers: Concurrent rebroadcast_and_quote calls
+            queue_size: Capacity of each inter-stage queue
+            dedup: InboundDedup deciding which events were already relayed (default: in-memory)
+            verify_signatures: Check NIP-01 id and schnorr sig before publishing
+            archive: EventArchive that published events are appended to (None = no archive)
+            publish_batch_size: Most events one publisher sends as a pipelined burst
+                                (rebroadcast_and_quote_many) when several are queued
+            verify_batch_size: Most queued events one verifier sends to the process pool at once
+        """
+        self.nostr_bot = nostr_bot
+        self.read_workers = read_workers
+        self.verify_workers = verify_workers or os.cpu_count() or 2
+        self.publish_workers = publish_workers
+        self.publish_batch_size = max(1, publish_batch_size)
+        self.verify_batch_size = max(1, verify_batch_size)
+        self.queue_size = queue_size
+        self.dedup = dedup if dedup is not None else InboundDedup(
+            ExpiringStore('inbound_ids', ttl=86400, max_entries=10000))
+        self.verify_signatures = verify_signatures
+        self.archive = archive
+
+        self.stages = []
+        self.tasks = []
+        self.threads = None
+        self.processes = None
+        self.started = None
+
+        # Counters
+        self.submitted = 0
+        self.completed = {}         # {status: count}
+        self.latency_total = 0.0
+
+    async def start(self):
+        """Create the executors and stage workers"""
+        self.threads = ThreadPoolExecutor(max_workers=self.read_workers + self.publish_workers,
+                                          thread_name_prefix="inbound")
+        if self.verify_signatures:
+            # Relay readers, executors and state flushers are already running; a
+            # forked child could inherit a lock one of them held. Start verifiers
+            # from a clean server process instead
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self.processes = ProcessPoolExecutor(max_workers=self.verify_workers,
+                                                 mp_context=multiprocessing.get_context(method))
+
+        self.stages = [
+            _Stage('read', self._read, self.read_workers, self.queue_size),
+            _Stage('decode', self._decode, 1, self.queue_size),
+            _Stage('verify', self._verify, self.verify_workers, self.queue_size, self.verify_batch_size),
+            _Stage('dedup', self._dedup, 1, self.queue_size),
+            _Stage('publish', self._publish, self.publish_workers, self.queue_size, self.publish_batch_size)
+        ]
+        for index, stage in enumerate(self.stages):
+            following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for _ in range(stage.workers):
+                self.tasks.append(asyncio.ensure_future(self._worker(stage, following)))
+        self.started = time.monotonic()
+
+        metrics.gauge('bitsat_inbound_queue_depth', 'Items waiting before each inbound stage', ('stage',),
+                      callback=lambda: {(stage.name,): stage.queue.qsize() for stage in self.stages})
+        metrics.counter('bitsat_inbound_stage_total', 'Items leaving each inbound stage', ('stage', 'result'),
+                        callback=lambda: {key: value for stage in self.stages for key, value in
+                                          (((stage.name, 'passed'), stage.processed),
+                                           ((stage.name, 'dropped'), stage.dropped))})
+        metrics.counter('bitsat_inbound_duplicates_total', 'Inbound duplicates suppressed before publishing',
+                        callback=lambda: sum(self.dedup.suppressed.values()))
+        print(f"🧵 Inbound pipeline: {self.read_workers} readers, {self.verify_workers} verifiers, "
+              f"{self.publish_workers} publishers, queues of {self.queue_size}")
+
+    async def submit_file(self, path, on_done=None):
+        """
+        Queue a received file (waits while the read queue is full)
+
+        Args:
+            path: Path of the file
+            on_done: Optional coroutine function called with the final status:
+                     'published', 'published_unarchived' (published, but the archive
+                     write failed), 'failed', 'duplicate', 'invalid' or 'unreadable'
+        """
+        await self._submit({'source': path.name, 'path': path, 'on_done': on_done}, self.stages[0])
+
+    async def submit_data(self, source, data, on_done=None, received_at=None):
+        """
+        Queue a file already in memory (e.g. reassembled from UDP frames); skips the read stage
+
+        received_at: Unix time the file arrived (default: now), for the latency trace
+        """
+        await self._submit({'source': source, 'data': data, 'on_done': on_done,
+                            'seen_at': time.time() if received_at is None else received_at}, self.stages[1])
+
+    async def _submit(self, item, stage):
+        self.submitted += 1
+        item['received'] = time.monotonic()
+        await stage.put(item)
+
+    async def _worker(self, stage, following):
+        while True:
+            items = [await stage.queue.get()]
+            while len(items) < stage.batch_size and not stage.queue.empty():
+                items.append(stage.queue.get_nowait())
+            started = time.perf_counter()
+            try:
+                if stage.batch_size > 1:
+                    results = await stage.handler(items)
+                else:
+                    results = [await stage.handler(items[0])]
+            except Exception as e:
+                print(f"❌ Inbound {stage.name} failed for {', '.join(item['source'] for item in items)}: {e}")
+                for item in items:
+                    item['status'] = 'failed'
+                results = [False] * len(items)
+            stage.busy_seconds += time.perf_counter() - started
+
+            for item, passed in zip(items, results):
+                stage.queue.task_done()
+                if passed and following is not None:
+                    stage.processed += 1
+                    await following.put(item)
+                    continue
+
+                if passed:
+                    stage.processed += 1
+                else:
+                    stage.dropped += 1
+                await self._finish(item)
+
+    async def _finish(self, item):
+        status = item.get('status', 'failed')
+        self.completed[status] = self.completed.get(status, 0) + 1
+        self.latency_total += time.monotonic() - item['received']
+        if item['on_done'] is not None:
+            try:
+                await item['on_done'](status)
+            except Exception as e:
+                print(f"⚠️ Inbound completion handler failed for {item['source']}: {e}")
+
+    # Stage handlers: return True to pass the item on, False to stop here (status set)
+
+    async def _read(self, item):
+        loop = asyncio.get_running_loop()
+        try:
+            item['data'], item['seen_at'] = await loop.run_in_executor(self.threads, _read_file, item['path'])
+            return True
+        except OSError as e:
+            print(f"❌ Could not read {item['source']}: {e}")
+            item['status'] = 'unreadable'
+            return False
+
+    async def _decode(self, item):
+        item['event'] = decode_payload(item.pop('data'))
+        if item['event'] is None:
+            print(f"⚠️ {item['source']} is not a Nostr event - skipped")
+            item['status'] = 'invalid'
+            return False
+        return True
+
+    async def _verify(self, items):
+        if self.processes is None:
+            return [True] * len(items)
+        loop = asyncio.get_running_loop()
+        # One IPC round trip per batch - a single schnorr check costs less than the round trip
+        valid = await loop.run_in_executor(self.processes, verify_events, [item['event'] for item in items])
+        for item, ok in zip(items, valid):
+            if not ok:
+                print(f"⚠️ {item['source']}: event id or signature invalid - skipped")
+                item['status'] = 'invalid'
+        return valid
+
+    async def _dedup(self, item):
+        if not self.dedup.claim(item['event']['id']):
+            item['status'] = 'duplicate'
+            return False
+        # First valid copy of this event: when its file was written (or its frames
+        # reassembled) is the downlink time - not when a scan happened to find it
+        tracer.mark(item['event']['id'], 'rx_file_seen', item['seen_at'])
+        return True
+
+    async def _publish(self, items):
+        loop = asyncio.get_running_loop()
+        events = [item['event'] for item in items]
+        try:
+            if len(events) == 1:
+                relayed = {events[0]['id']: await loop.run_in_executor(
+                    self.threads, self.nostr_bot.rebroadcast_and_quote, events[0])}
+            else:
+                # A burst goes out as one pipelined batch: originals first, then quotes
+                relayed = await loop.run_in_executor(self.threads, self.nostr_bot.rebroadcast_and_quote_many,
+                                                     events)
+        except Exception as e:
+            print(f"❌ Inbound publish failed for {', '.join(item['source'] for item in items)}: {e}")
+            relayed = {}
+
+        results = []
+        for item in items:
+            event_id = item['event']['id']
+            if not relayed.get(event_id):
+                # Let a retry of the same file through dedup
+                self.dedup.release(event_id)
+                item['status'] = 'failed'
+                results.append(False)
+                continue
+            item['status'] = 'published'
+            tracer.mark(event_id, 'published')
+            if self.archive is not None:
+                try:
+                    await loop.run_in_executor(self.threads, self.archive.append, item['event'], item['source'])
+                except Exception as e:
+                    # The event is on the relays either way - don't report it as failed
+                    print(f"⚠️ Could not archive {item['source']}: {e}")
+                    item['status'] = 'published_unarchived'
+            results.append(True)
+        return results
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.threads:
+            self.threads.shutdown(wait=False)
+        if self.processes:
+            self.processes.shutdown(wait=False)
+        self.dedup.close()
+        if self.archive is not None:
+            self.archive.close()
+
+    def stats(self):
+        uptime = time.monotonic() - self.started if self.started else 0.0
+        finished = sum(self.completed.values())
+        return {
+            'submitted': self.submitted,
+            'in_flight': self.submitted - finished,
+            'completed': dict(self.completed),
+            'avg_latency_ms': round(self.latency_total * 1000 / finished, 1) if finished else 0.0,
+            'dedup': self.dedup.stats(),
+            'stages': {
+                stage.name: {
+                    'workers': stage.workers,
+                    'processed': stage.processed,
+                    'dropped': stage.dropped,
+                    'per_second': round(stage.processed / uptime, 2) if uptime else 0.0,
+                    'utilization': round(stage.busy_seconds / (uptime * stage.workers), 3) if uptime else 0.0,
+                    'queue': stage.queue.qsize(),
+                    'queue_capacity': stage.queue.maxsize,
+                    'max_queue': stage.max_depth
+                }
+                for stage in self.stages
+            }
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"📊 Inbound pipeline: {stats['submitted']} submitted, {stats['in_flight']} in flight, "
+              f"{stats['completed']}, avg {stats['avg_latency_ms']}ms")
+        dedup = stats['dedup']
+        print(f"   dedup: {dedup['suppressed']} duplicates suppressed "
+              f"({dedup['suppressed_other_hq']} already relayed by another HQ), window {dedup['window']}")
+        for name, stage in stats['stages'].items():
+            print(f"   {name:8s} {stage['processed']:6d} ok {stage['dropped']:5d} dropped "
+                  f"{stage['per_second']:7.2f}/s  busy {stage['utilization'] * 100:5.1f}%  "
+                  f"queue {stage['queue']}/{stage['queue_capacity']} (max {stage['max_queue']})")
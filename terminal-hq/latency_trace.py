@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Satellite Round-Trip Tracing for BitSatRelay
+Follows one event id from relay intake, through credit admission and the
+modem, back down the inbound path to the published quote. Finished spans
+go to a JSON-lines trace file; percentiles and loss come from the same data
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from relay_health import _percentile
+
+# In the order an uplinked event passes them
+STAGES = ('relay_receive', 'credit_admitted', 'first_frame_sent', 'last_frame_sent', 'retransmit_done',
+          'rx_file_seen', 'published')
+
+# Reported intervals: name -> (from stage, to stage)
+INTERVALS = {
+    'admission': ('relay_receive', 'credit_admitted'),
+    'modem_queue': ('credit_admitted', 'first_frame_sent'),
+    'transmit': ('first_frame_sent', 'last_frame_sent'),
+    'over_the_air': ('first_frame_sent', 'rx_file_seen'),
+    'inbound_publish': ('rx_file_seen', 'published'),
+    'round_trip': ('relay_receive', 'published')
+}
+
+
+def span_intervals(stages):
+    """Seconds for each interval both of whose stages were reached"""
+    return {name: round(stages[end] - stages[start], 3)
+            for name, (start, end) in INTERVALS.items()
+            if start in stages and end in stages}
+
+
+def summarize(spans):
+    """
+    Percentiles per interval plus over-the-air loss, from finished spans
+
+    Returns:
+        {'spans', 'uplinked', 'received', 'lost', 'loss_rate', 'intervals': {name: {count, p50, p90, p99, max}}}
+    """
+    samples = {name: [] for name in INTERVALS}
+    uplinked = received = lost = 0
+    for span in spans:
+        for name, seconds in span.get('intervals', {}).items():
+            samples.setdefault(name, []).append(seconds)
+        if 'last_frame_sent' in span['stages']:
+            uplinked += 1
+            if 'rx_file_seen' in span['stages']:
+                received += 1
+            elif span['status'] == 'lost':
+                lost += 1
+
+    intervals = {}
+    for name, values in samples.items():
+        if values:
+            intervals[name] = {
+                'count': len(values),
+                'p50': round(_percentile(values, 50), 3),
+                'p90': round(_percentile(values, 90), 3),
+                'p99': round(_percentile(values, 99), 3),
+                'max': round(max(values), 3)
+            }
+    return {
+        'spans': len(spans),
+        'uplinked': uplinked,
+        'received': received,
+        'lost': lost,
+        'loss_rate': round(lost / (received + lost), 3) if received + lost else 0.0,
+        'intervals': intervals
+    }
+
+
+class LatencyTracer:
+    def __init__(self):
+        """
+        Process-wide tracer; disabled (every call a no-op) until configure()
+        """
+        self.enabled = False
+        self.path = None
+        self.loss_timeout = 3600.0
+        self.max_open = 5000
+
+        self.open = OrderedDict()   # {event_id: {stage: unix time}} oldest first
+        self.finished = []          # recent finished spans, for summary()
+        self.max_finished = 5000
+        self.lock = threading.Lock()
+        self.file = None
+        self.last_sweep = 0.0
+
+    def configure(self, path, loss_timeout=3600.0, max_open=5000, max_finished=5000):
+        """
+        Start tracing
+
+        Args:
+            path: JSON-lines file finished spans are appended to
+            loss_timeout: Seconds after the last frame before an uplinked event counts as lost
+            max_open: Unfinished spans kept at most (oldest are closed as abandoned)
+            max_finished: Finished spans kept in memory for summary()
+        """
+        with self.lock:
+            self.path = path
+            self.loss_timeout = loss_timeout
+            self.max_open = max_open
+            self.max_finished = max_finished
+            self.file = open(path, 'a') if path else None
+            self.enabled = True
+        print(f"⏱️ Latency tracing to {path}")
+
+    def mark(self, event_id, stage, at=None):
+        """Record that event_id reached stage (first time counts); cheap no-op when disabled"""
+        if not self.enabled or not event_id:
+            return
+        at = time.time() if at is None else at
+        with self.lock:
+            stages = self.open.get(event_id)
+            if stages is None:
+                stages = self.open[event_id] = {}
+                while len(self.open) > self.max_open:
+                    old_id, old_stages = self.open.popitem(last=False)
+                    self._finish(old_id, old_stages, 'abandoned')
+            stages.setdefault(stage, at)
+
+            if stage == 'published':
+                self._finish(event_id, self.open.pop(event_id), 'complete')
+            if at - self.last_sweep > 60:
+                self._sweep(at)
+
+    def _sweep(self, now):
+        """Close spans that will never finish: uplinked but not heard back, or stalled"""
+        self.last_sweep = now
+        for event_id, stages in list(self.open.items()):
+            if now - max(stages.values()) < self.loss_timeout:
+                continue
+            status = 'lost' if 'last_frame_sent' in stages and 'rx_file_seen' not in stages else 'abandoned'
+            self._finish(event_id, self.open.pop(event_id), status)
+
+    def _finish(self, event_id, stages, status):
+        span = {
+            'event_id': event_id,
+            'status': status,
+            'stages': {stage: round(stages[stage], 3) for stage in STAGES if stage in stages},
+            'intervals': span_intervals(stages)
+        }
+        self.finished.append(span)
+        if len(self.finished) > self.max_finished:
+            del self.finished[:len(self.finished) - self.max_finished]
+        if self.file is not None:
+            self.file.write(json.dumps(span, separators=(',', ':')) + '\n')
+            self.file.flush()
+
+    def summary(self):
+        with self.lock:
+            self._sweep(time.time())
+            spans = list(self.finished)
+        result = summarize(spans)
+        result['open'] = len(self.open)
+        return result
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"⏱️ Round-trip trace: {summary['spans']} spans, {summary['received']}/{summary['uplinked']} "
+              f"uplinked events heard back, loss {summary['loss_rate'] * 100:.1f}%")
+        for name, stats in summary['intervals'].items():
+            print(f"   {name:16s} p50 {stats['p50']:8.2f}s  p90 {stats['p90']:8.2f}s  "
+                  f"p99 {stats['p99']:8.2f}s  (n={stats['count']})")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            self.enabled = False
+
+
+# Shared by every module in the process
+tracer = LatencyTracer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a BitSatRelay round-trip trace file")
+    parser.add_argument('trace_file', help="JSON-lines trace written by LatencyTracer")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    with open(args.trace_file) as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    summary = summarize(spans)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['spans']} spans, {summary['received']}/{summary['uplinked']} uplinked events heard back, "
+          f"{summary['lost']} lost ({summary['loss_rate'] * 100:.1f}%)")
+    for name, stats in summary['intervals'].items():
+        print(f"{name:16s} p50 {stats['p50']:8.2f}s  p90 {stats['p90']:8.2f}s  "
+              f"p99 {stats['p99']:8.2f}s  max {stats['max']:8.2f}s  (n={stats['count']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Mock BitSatCredit Extension API Server
+Local stand-in for the LNbits BitSatCredit endpoints used by BitSatCreditClient,
+so the bridge and DM bot can run credit-heavy workloads offline
+"""
+
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse, parse_qs
+
+
+class MockLedger:
+    def __init__(self, auto_create_users: bool = False):
+        """
+        In-memory credit ledger mirroring the extension's user model
+
+        Args:
+            auto_create_users: Create unknown users on /spend and /invoice instead of returning 404
+        """
+        self.auto_create_users = auto_create_users
+        self.users = {}            # {npub: user dict}
+        self.transactions = {}     # {npub: [transaction dicts]}
+        self.invoices = {}         # {payment_hash: {npub, amount, paid}}
+        self.spend_memos = {}      # {(npub, memo): spend count}
+        self.duplicate_spends = 0
+        self.lock = threading.Lock()
+
+    def _new_user(self, npub: str) -> Dict[str, Any]:
+        user = {
+            'npub': npub,
+            'balance_sats': 0,
+            'total_spent': 0,
+            'total_deposited': 0,
+            'message_count': 0
+        }
+        self.users[npub] = user
+        self.transactions[npub] = []
+        return user
+
+    def _record(self, npub: str, tx_type: str, amount: int, memo: Optional[str]):
+        self.transactions[npub].append({
+            'type': tx_type,
+            'amount': amount,
+            'memo': memo,
+            'created_at': int(time.time())
+        })
+
+    def deposit(self, npub: str, amount: int, memo: str = "Mock deposit") -> Dict[str, Any]:
+        """Credit a user, creating the account if needed"""
+        with self.lock:
+            user = self.users.get(npub) or self._new_user(npub)
+            user['balance_sats'] += amount
+            user['total_deposited'] += amount
+            self._record(npub, 'deposit', amount, memo)
+            return dict(user)
+
+    def get_user(self, npub: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            user = self.users.get(npub)
+            return dict(user) if user else None
+
+    def spend(self, npub: str, amount: int, memo: Optional[str]):
+        """Returns (status_code, body) following the extension's 402/404 semantics"""
+        with self.lock:
+            user = self.users.get(npub)
+            if user is None:
+                if not self.auto_create_users:
+                    return 404, {'detail': 'User not found'}
+                user = self._new_user(npub)
+
+            if user['balance_sats'] < amount:
+                return 402, {'detail': 'Insufficient balance'}
+
+            # Same memo charged twice for one user means the caller double-charged
+            if memo:
+                key = (npub, memo)
+                self.spend_memos[key] = self.spend_memos.get(key, 0) + 1
+                if self.spend_memos[key] > 1:
+                    self.duplicate_spends += 1
+
+            user['balance_sats'] -= amount
+            user['total_spent'] += amount
+            user['message_count'] += 1
+            self._record(npub, 'spend', amount, memo)
+            return 200, dict(user)
+
+    def create_invoice(self, npub: str, amount: int):
+        with self.lock:
+            if npub not in self.users:
+                if not self.auto_create_users:
+                    return 404, {'detail': 'User not found'}
+                self._new_user(npub)
+
+            payment_hash = secrets.token_hex(32)
+            self.invoices[payment_hash] = {'npub': npub, 'amount': amount, 'paid': False}
+            return 200, {
+                'payment_hash': payment_hash,
+                'payment_request': f"lnbcrt{amount}mock1{payment_hash[:32]}",
+                'bolt11': f"lnbcrt{amount}mock1{payment_hash[:32]}",
+                'amount': amount
+            }
+
+    def pay_invoice(self, payment_hash: str) -> bool:
+        """Settle a mock invoice and credit the user"""
+        with self.lock:
+            invoice = self.invoices.get(payment_hash)
+            if not invoice or invoice['paid']:
+                return False
+            invoice['paid'] = True
+        self.deposit(invoice['npub'], invoice['amount'], memo="Lightning top-up")
+        return True
+
+    def check_consistency(self) -> bool:
+        """Every balance must equal deposits minus spends"""
+        with self.lock:
+            return all(
+                u['balance_sats'] == u['total_deposited'] - u['total_spent'] and u['balance_sats'] >= 0
+                for u in self.users.values()
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'users': len(self.users),
+                'total_balance_sats': sum(u['balance_sats'] for u in self.users.values()),
+                'total_spent_sats': sum(u['total_spent'] for u in self.users.values()),
+                'total_spends': sum(u['message_count'] for u in self.users.values()),
+                'duplicate_spends': self.duplicate_spends,
+                'invoices_created': len(self.invoices),
+                'invoices_paid': sum(1 for i in self.invoices.values() if i['paid'])
+            }
+
+
+class MockCreditServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 5001, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, auto_create_users: bool = False,
+                 seed: Optional[int] = None):
+        """
+        Initialize mock extension server
+
+        Args:
+            host: Bind address
+            port: Bind port (0 picks a free port)
+            latency_ms: Fixed delay added to every response
+            jitter_ms: Random extra delay, uniform in [0, jitter_ms]
+            error_rate: Fraction of requests answered with HTTP 500 (0.0 - 1.0)
+            auto_create_users: Create unknown users instead of returning 404
+            seed: Random seed for reproducible latency/error patterns
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.ledger = MockLedger(auto_create_users=auto_create_users)
+        self.random = random.Random(seed)
+        self.request_counts = {}   # {endpoint: count}
+        self.injected_errors = 0
+        self.stats_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """Extension base URL to hand to BitSatCreditClient"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/bitsatcredit"
+
+    def _count(self, endpoint: str):
+        with self.stats_lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def _simulate_network(self) -> bool:
+        """Apply configured latency; returns True if this request should fail"""
+        with self.stats_lock:
+            delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return fail
+
+    def route(self, method: str, path: str, query: Dict[str, str]):
+        """Dispatch a request; returns (status_code, body, endpoint_name)"""
+        # Accept any mount prefix (e.g. /bitsatcredit/api/v1/...)
+        if '/api/v1/' in path:
+            path = path[path.index('/api/v1/') + len('/api/v1'):]
+
+        parts = [p for p in path.split('/') if p]
+
+        if method == 'GET' and parts == ['health']:
+            return 200, {'status': 'ok'}, 'health'
+
+        if method == 'GET' and parts == ['mock', 'stats']:
+            return 200, self.stats(), 'stats'
+
+        if method == 'POST' and len(parts) == 3 and parts[:2] == ['mock', 'deposit']:
+            amount = int(query.get('amount', 0))
+            return 200, self.ledger.deposit(parts[2], amount), 'deposit'
+
+        if method == 'POST' and len(parts) == 3 and parts[:2] == ['mock', 'pay']:
+            paid = self.ledger.pay_invoice(parts[2])
+            return (200, {'paid': True}, 'pay') if paid else (404, {'detail': 'Invoice not found'}, 'pay')
+
+        if len(parts) != 3 or parts[0] != 'user':
+            return 404, {'detail': 'Not found'}, 'unknown'
+
+        npub, action = parts[1], parts[2]
+
+        if method == 'GET' and action == 'balance':
+            user = self.ledger.get_user(npub)
+            if user is None:
+                return 404, {'detail': 'User not found'}, 'balance'
+            return 200, user, 'balance'
+
+        if method == 'GET' and action == 'can-spend':
+            amount = int(query.get('amount', 0))
+            user = self.ledger.get_user(npub)
+            if user is None:
+                return 404, {'detail': 'User not found'}, 'can-spend'
+            return 200, {'can_afford': user['balance_sats'] >= amount,
+                         'balance_sats': user['balance_sats']}, 'can-spend'
+
+        if method == 'POST' and action == 'spend':
+            status, body = self.ledger.spend(npub, int(query.get('amount', 0)), query.get('memo'))
+            return status, body, 'spend'
+
+        if method == 'GET' and action == 'transactions':
+            if self.ledger.get_user(npub) is None:
+                return 404, {'detail': 'User not found'}, 'transactions'
+            with self.ledger.lock:
+                return 200, list(self.ledger.transactions.get(npub, [])), 'transactions'
+
+        if method == 'POST' and action == 'invoice':
+            status, body = self.ledger.create_invoice(npub, int(query.get('amount', 0)))
+            return status, body, 'invoice'
+
+        return 404, {'detail': 'Not found'}, 'unknown'
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, method):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+                # Stats endpoint is never delayed or failed
+                is_stats = parsed.path.rstrip('/').endswith('/mock/stats')
+                if not is_stats and server._simulate_network():
+                    status, body, endpoint = 500, {'detail': 'Injected error'}, 'error'
+                else:
+                    try:
+                        status, body, endpoint = server.route(method, parsed.path, query)
+                    except ValueError:
+                        status, body, endpoint = 400, {'detail': 'Invalid parameter'}, 'bad_request'
+
+                server._count(endpoint)
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"✅ Mock BitSatCredit server running at {self.url}")
+        return self
+
+    def stop(self):
+        """Stop serving and release the port"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counts, injected errors and ledger totals"""
+        with self.stats_lock:
+            stats = {
+                'requests': dict(self.request_counts),
+                'injected_errors': self.injected_errors
+            }
+        stats['ledger'] = self.ledger.stats()
+        stats['ledger_consistent'] = self.ledger.check_consistency()
+        return stats
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mock BitSatCredit extension API for offline testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Fixed delay per request")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Random extra delay per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that return HTTP 500")
+    parser.add_argument('--auto-create', action='store_true', help="Create unknown users instead of 404")
+    parser.add_argument('--seed-user', action='append', default=[], metavar='NPUB:SATS',
+                        help="Pre-fund a user (repeatable)")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    args = parser.parse_args()
+
+    server = MockCreditServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        auto_create_users=args.auto_create,
+        seed=args.seed
+    )
+
+    for entry in args.seed_user:
+        npub, _, sats = entry.partition(':')
+        server.ledger.deposit(npub, int(sats or 0))
+        print(f"💰 Seeded {npub[:16]}... with {int(sats or 0)} sats")
+
+    server.start()
+    print(f"   Point bitsatcredit_extension.url at {server.url}")
+    print(f"   Stats: {server.url}/api/v1/mock/stats")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n📊 Final stats:")
+        print(json.dumps(server.stats(), indent=2))
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+NIP-04 Encryption for BitSatRelay
+AES-256-CBC DM encryption/decryption with a bounded LRU cache of per-peer
+ECDH shared secrets, shared by NostrBot and DMBot
+"""
+
+import base64
+import os
+import threading
+import time
+from collections import OrderedDict
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.backends import default_backend
+
+
+class Nip04Cipher:
+    def __init__(self, private_key, cache_size=256):
+        """
+        NIP-04 cipher for one bot identity
+
+        Args:
+            private_key: nostr.key.PrivateKey of the bot
+            cache_size: Number of peers whose shared secret is kept
+        """
+        self.private_key = private_key
+        self.cache_size = cache_size
+        self.backend = default_backend()
+
+        # {peer_pubkey_hex: AES key object} - the ECDH result never changes for a peer.
+        # CBC state is per message (random IV), so only the key is shared, never an
+        # encryptor/decryptor.
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _peer_key(self, peer_pubkey_hex):
+        with self.lock:
+            key = self.keys.get(peer_pubkey_hex)
+            if key is not None:
+                self.keys.move_to_end(peer_pubkey_hex)
+                self.hits += 1
+                return key
+            self.misses += 1
+
+        # ECDH outside the lock so a cold peer doesn't block cached ones
+        shared_secret = self.private_key.compute_shared_secret(peer_pubkey_hex)
+        key = algorithms.AES(shared_secret)
+
+        with self.lock:
+            self.keys[peer_pubkey_hex] = key
+            self.keys.move_to_end(peer_pubkey_hex)
+            while len(self.keys) > self.cache_size:
+                self.keys.popitem(last=False)
+                self.evictions += 1
+        return key
+
+    def shared_secret(self, peer_pubkey_hex):
+        """Cached ECDH shared secret (32 bytes) with a peer"""
+        return self._peer_key(peer_pubkey_hex).key
+
+    def encrypt(self, message_text, peer_pubkey_hex):
+        """
+        Encrypt a message for a peer
+
+        Returns:
+            NIP-04 content: base64(ciphertext)?iv=base64(iv)
+        """
+        iv = os.urandom(16)
+
+        # Add PKCS7 padding
+        plaintext = message_text.encode('utf-8')
+        padding_length = 16 - (len(plaintext) % 16)
+        plaintext += bytes([padding_length]) * padding_length
+
+        encryptor = Cipher(self._peer_key(peer_pubkey_hex), modes.CBC(iv), backend=self.backend).encryptor()
+        ciphertext = encryptor.update(plaintext) + encryptor.finalize()
+
+        return base64.b64encode(ciphertext).decode('utf-8') + '?iv=' + base64.b64encode(iv).decode('utf-8')
+
+    def decrypt(self, encrypted_content, peer_pubkey_hex):
+        """
+        Decrypt NIP-04 content from a peer
+
+        Accepts both base64(ciphertext)?iv=base64(iv) and base64(iv + ciphertext).
+
+        Returns:
+            Plaintext string
+
+        Raises:
+            ValueError: Malformed content or bad padding
+        """
+        if not encrypted_content or len(encrypted_content) < 20:
+            raise ValueError(f"DM content too short: {len(encrypted_content) if encrypted_content else 0} chars")
+
+        if "?iv=" in encrypted_content:
+            parts = encrypted_content.split("?iv=")
+            if len(parts) != 2:
+                raise ValueError("Invalid ?iv= format")
+            ciphertext = base64.b64decode(parts[0])
+            iv = base64.b64decode(parts[1])
+        else:
+            decoded = base64.b64decode(encrypted_content)
+            # 16 byte IV + at least one 16 byte block
+            if len(decoded) < 32:
+                raise ValueError(f"Decoded content too short: {len(decoded)} bytes")
+            iv = decoded[:16]
+            ciphertext = decoded[16:]
+
+        decryptor = Cipher(self._peer_key(peer_pubkey_hex), modes.CBC(iv), backend=self.backend).decryptor()
+        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+
+        # Remove PKCS7 padding
+        if len(plaintext) == 0:
+            raise ValueError("Plaintext is empty after decryption")
+        padding_length = plaintext[-1]
+        if padding_length > len(plaintext) or padding_length > 16:
+            raise ValueError(f"Invalid padding: {padding_length}")
+
+        return plaintext[:-padding_length].decode('utf-8')
+
+    def stats(self):
+        """Shared-secret cache metrics"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'cached_peers': len(self.keys),
+                'capacity': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+def benchmark(count=2000, peers=20, message="/balance"):
+    """DM round trips (decrypt request + encrypt reply) per second, cold vs cached"""
+    from nostr.key import PrivateKey
+
+    bot_key = PrivateKey()
+    peer_keys = [PrivateKey() for _ in range(peers)]
+    peer_hexes = [k.public_key.hex() for k in peer_keys]
+    inbound = [Nip04Cipher(k, cache_size=1).encrypt(message, bot_key.public_key.hex()) for k in peer_keys]
+
+    results = {}
+    for label, cache_size in (('uncached', 0), ('cached', 256)):
+        cipher = Nip04Cipher(bot_key, cache_size=cache_size)
+        start = time.perf_counter()
+        for i in range(count):
+            peer = i % peers
+            cipher.decrypt(inbound[peer], peer_hexes[peer])
+            cipher.encrypt("💰 BitSatRelay Balance\n\nBalance: 1000 sats", peer_hexes[peer])
+        results[label] = {'dms_per_sec': count / (time.perf_counter() - start), **cipher.stats()}
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"NIP-04 benchmark ({count} decrypt+reply round trips over 20 peers)")
+    print("=" * 50)
+    for name, result in benchmark(count).items():
+        print(f"{name:>10}: {result['dms_per_sec']:,.0f} DMs/sec (hit rate {result['hit_rate']:.0%})")
@@ -4,15 +4,26 @@ Nostr Bot for BitSatRelay
 Posts quote messages to Nostr relays when messages are relayed via satellite
 """
 
-import ssl
-import time
 import json
-import socket
-import threading
-import hashlib
-from nostr.event import Event
-from nostr.relay_manager import RelayManager
+import time
 from nostr.key import PrivateKey, PublicKey
+from relay_pool import RelayPool
+from rate_governor import PRIORITY_REBROADCAST, PRIORITY_DEFAULT, PRIORITY_QUOTE
+from event_signer import EventSigner
+from nip04 import Nip04Cipher
+from context_resolver import EventContextResolver
+from quote_digest import QuoteDigest
+from outbox import OutboxResolver, normalize_relay_url
+import metrics
+
+PRIORITY_NAMES = {PRIORITY_REBROADCAST: 'rebroadcast', PRIORITY_DEFAULT: 'default', PRIORITY_QUOTE: 'quote'}
+PUBLISH_WAIT_SECONDS = metrics.histogram('bitsat_nostr_publish_wait_seconds',
+                                         'publish_event call until quorum or timeout', ('priority',))
+PUBLISHED = metrics.counter('bitsat_nostr_published_total', 'Events published, by priority and quorum outcome',
+                            ('priority', 'outcome'))
+QUOTE_BUILD_SECONDS = metrics.histogram('bitsat_quote_build_seconds', 'Render, hash and sign one quote note')
+INBOUND_RELAYED = metrics.counter('bitsat_inbound_relayed_total', 'Satellite messages rebroadcast and quoted',
+                                  ('outcome',))
 
 
 def hex_to_note(event_id_hex):
@@ -75,131 +86,180 @@ def hex_to_note(event_id_hex):
 
 
 class NostrBot:
-    def __init__(self, bot_nsec, relay_list):
-        """Initialize bot with private key and relay list"""
+    def __init__(self, bot_nsec, relay_list, publish_quorum=None, publish_timeout=5.0,
+                 max_in_flight_per_relay=16, connect_wait=5.0, rate_limits=None, quote_digest=None,
+                 dm_outbox=None):
+        """
+        Initialize bot with private key and relay list
+
+        connect_wait: Seconds to block until the first relay is connected
+        (0 = return immediately and let the caller use wait_ready())
+        rate_limits: Per-relay token buckets, {"default"|relay_url: {events_per_second, burst}}
+        quote_digest: {"enabled", "threshold", "window_seconds", "max_events_per_note"} -
+        aggregate quote notes during inbound bursts (None/disabled = one quote per message)
+        dm_outbox: {"enabled", "cache_ttl_seconds", "lookup_timeout_seconds", "max_recipient_relays",
+        "connect_wait_seconds", "max_extra_connections"} - also deliver DMs to the recipient's
+        own inbox relays (None/disabled = our best relays only)
+        """
         try:
             self.private_key = PrivateKey.from_nsec(bot_nsec)
-            self.relay_manager = RelayManager()
+            self.signer = EventSigner(self.private_key)
+            self.nip04 = Nip04Cipher(self.private_key)
             self.relay_list = relay_list
 
-            # Add configured relays
+            # Publish returns once `publish_quorum` relays sent OK true (None = wait for all)
+            self.publish_quorum = publish_quorum
+            self.publish_timeout = publish_timeout
+
+            # Single-relay operations (DMs) go to this many of the best-scoring relays
+            self.dm_relay_count = 2
+
+            # One persistent socket per relay, shared by every publish path
+            dm_outbox = dm_outbox or {}
+            self.pool = RelayPool(
+                relay_list,
+                max_in_flight=max_in_flight_per_relay,
+                rate_limits=rate_limits,
+                max_extra_relays=dm_outbox.get('max_extra_connections', 8)
+            )
             for relay_url in relay_list:
-                self.relay_manager.add_relay(relay_url)
                 print(f"Added relay: {relay_url}")
 
+            # Reply/quote context lookups share the pooled connections
+            self.context = EventContextResolver(self.pool)
+
+            # Recipients' inbox relays (kind 10050 / 10002), cached per user
+            self.outbox = None
+            if dm_outbox.get('enabled', False):
+                self.outbox = OutboxResolver(
+                    self.pool,
+                    ttl=dm_outbox.get('cache_ttl_seconds', 3600.0),
+                    timeout=dm_outbox.get('lookup_timeout_seconds', 2.0)
+                )
+            self.dm_outbox_relay_count = dm_outbox.get('max_recipient_relays', 2)
+            self.dm_connect_wait = dm_outbox.get('connect_wait_seconds', 2.0)
+
+            # Inbound bursts get one digest note instead of a quote note per message
+            self.digest = None
+            if quote_digest and quote_digest.get('enabled', False):
+                self.digest = QuoteDigest(
+                    self,
+                    threshold=quote_digest.get('threshold', 5),
+                    window_seconds=quote_digest.get('window_seconds', 60.0),
+                    max_events_per_note=quote_digest.get('max_events_per_note', 25)
+                )
+
             # Open connections
-            self.relay_manager.open_connections({"cert_reqs": ssl.CERT_NONE})
-            time.sleep(1.25)  # Allow connections to establish
+            self.pool.start()
+            if connect_wait:
+                self.wait_ready(1, connect_wait)
 
-            print(f"✅ Nostr bot initialized with {len(relay_list)} relays")
+            print(f"✅ Nostr bot initialized with {len(relay_list)} relays (signing: {self.signer.backend})")
 
         except Exception as e:
             print(f"❌ Error initializing Nostr bot: {e}")
             raise
 
-    def fetch_event_by_id(self, event_id):
-        """Fetch event content by ID from relay (for showing reply context)"""
-        try:
-            import websocket
-
-            # Use first relay from list
-            relay_url = self.relay_list[0] if self.relay_list else None
-            if not relay_url:
-                return None
-
-            # Quick fetch with timeout
-            ws = websocket.create_connection(relay_url, timeout=3)
-
-            # Request specific event
-            req_msg = json.dumps(["REQ", "fetch_preview", {"ids": [event_id]}])
-            ws.send(req_msg)
+    @classmethod
+    def from_config(cls, nostr_config, connect_wait=5.0):
+        """Build the bot from the 'nostr' section of relay_config.json"""
+        return cls(
+            nostr_config['bot_nsec'],
+            nostr_config['relay_urls'],
+            publish_quorum=nostr_config.get('publish_quorum'),
+            publish_timeout=nostr_config.get('publish_timeout_seconds', 5.0),
+            max_in_flight_per_relay=nostr_config.get('max_in_flight_per_relay', 16),
+            connect_wait=connect_wait,
+            rate_limits=nostr_config.get('rate_limits'),
+            quote_digest=nostr_config.get('quote_digest'),
+            dm_outbox=nostr_config.get('dm_outbox')
+        )
+
+    def wait_ready(self, min_relays=1, timeout=5.0):
+        """
+        Block until `min_relays` relays are connected (or timeout)
+
+        Returns:
+            Number of connected relays
+        """
+        return self.pool.wait_connected(min_relays, timeout)
 
-            # Wait for response (max 2 seconds)
-            start_time = time.time()
-            while time.time() - start_time < 2:
-                try:
-                    msg = ws.recv()
-                    data = json.loads(msg)
-
-                    # Check if it's an EVENT response
-                    if data[0] == "EVENT" and len(data) > 2:
-                        event = data[2]
-                        content = event.get('content', '')[:150]  # Truncate to 150 chars
-                        ws.close()
-                        return content
-
-                except Exception:
-                    break
+    def fetch_event_by_id(self, event_id):
+        """
+        Fetch event content by ID from relays (for showing reply context)
 
-            ws.close()
+        Not used by build_quote_note yet - quote notes don't render the
+        replied-to or quoted content
+        """
+        try:
+            snippet = self.context.resolve(event_id)
+            return snippet['content'] if snippet else None
+        except Exception:
             return None
 
+    def fetch_events_by_id(self, event_ids):
+        """Batch version of fetch_event_by_id: {event_id: content or None}"""
+        try:
+            snippets = self.context.resolve_many(event_ids)
+            return {event_id: (s['content'] if s else None) for event_id, s in snippets.items()}
         except Exception as e:
-            return None
+            print(f"⚠️ Context lookup failed: {e}")
+            return {event_id: None for event_id in event_ids}
 
     def _ensure_connected(self):
         """Ensure relay connections are open, reconnect if needed"""
         try:
-            # Try to reconnect if connections are closed
-            self.relay_manager.close_connections()
-            time.sleep(0.5)
-            self.relay_manager.open_connections({"cert_reqs": ssl.CERT_NONE})
-            time.sleep(1.25)
+            # Pooled connections reconnect on their own; force it for any that are down
+            for relay_url, connection in self.pool.connections.items():
+                if not connection.connected.is_set():
+                    connection.reconnect()
             print("🔄 Reconnected to Nostr relays")
         except Exception as e:
             print(f"⚠️ Error reconnecting: {e}")
 
+    def publish_event(self, event_dict, relay_urls=None, quorum=None, timeout=None,
+                      priority=PRIORITY_DEFAULT):
+        """
+        Publish a signed event and collect NIP-20 OK replies per relay
+
+        Args:
+            event_dict: Signed event
+            relay_urls: Subset of relays (default: all configured)
+            quorum: Accepting relays to wait for (None: use publish_quorum)
+            timeout: Seconds to wait for OK replies (None: use publish_timeout)
+            priority: Queue priority when a relay's rate limit defers the event
+
+        Returns:
+            PublishResult (accepted/rejected/failed/pending relays with latency)
+        """
+        started = time.monotonic()
+        result = self.pool.publish(
+            event_dict,
+            relay_urls=relay_urls,
+            quorum=self.publish_quorum if quorum is None else quorum,
+            timeout=self.publish_timeout if timeout is None else timeout,
+            priority=priority
+        )
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        PUBLISH_WAIT_SECONDS.observe(time.monotonic() - started, name)
+        PUBLISHED.inc(1, name, 'accepted' if result.accepted else 'not_accepted')
+        return result
+
     def rebroadcast_event(self, event_dict):
-        """V4: Rebroadcast original event using raw WebSocket - SYNC version"""
+        """V4: Rebroadcast original event over the pooled relay connections"""
         try:
-            import websocket
-            import threading
-            
-            message = json.dumps(["EVENT", event_dict])
-            success_count = 0
-            
-            def send_to_relay(relay_url):
-                nonlocal success_count
-                try:
-                    ws = websocket.create_connection(relay_url, timeout=5)
-                    ws.send(message)
-                    # Try to receive response
-                    try:
-                        response = ws.recv(timeout=2)
-                        if '"ok"' in response or 'true' in response:
-                            success_count += 1
-                            print(f"✅ {relay_url} accepted")
-                    except:
-                        # No response is fine
-                        success_count += 1
-                        print(f"✅ {relay_url} sent")
-                    ws.close()
-                except Exception as e:
-                    print(f"⚠️ {relay_url}: {e}")
-            
-            # Send to all relays in parallel threads
-            threads = []
-            for relay_url in self.relay_list:
-                thread = threading.Thread(target=send_to_relay, args=(relay_url,))
-                thread.start()
-                threads.append(thread)
-            
-            # Wait for all threads to complete
-            for thread in threads:
-                thread.join(timeout=10)
-            
-            print(f"✅ Rebroadcast to {success_count}/{len(self.relay_list)} relays: {event_dict['id'][:16]}...")
-            return event_dict['id']
-            
+            result = self.publish_event(event_dict, priority=PRIORITY_REBROADCAST)
+
+            print(f"✅ Rebroadcast {event_dict['id'][:16]}...: {result.summary()}")
+            return event_dict['id'] if result.accepted else None
+
         except Exception as e:
             print(f"❌ Error rebroadcasting: {e}")
             return None
 
-    def create_quote_note(self, event_dict):
-        """V4: Create satellite quote note - manual signing via direct WebSocket"""
+    def build_quote_note(self, event_dict):
+        """V4: Build and sign the satellite quote note for an inbound event (not published)"""
         try:
-            import websocket
-
             # Handle different event types
             event_kind = event_dict.get('kind', 1)
             original_pubkey = event_dict.get('pubkey', '')
@@ -373,83 +433,12 @@ class NostrBot:
                     if not any(t[0] == 'p' and len(t) > 1 and t[1] == pubkey for t in tags):
                         tags.append(['p', pubkey])
 
-            # Build event dict with all fields upfront (NIP-01 compliant)
-            event = {
-                "pubkey": self.private_key.public_key.hex(),
-                "created_at": int(time.time()),
-                "kind": 1,
-                "tags": tags,
-                "content": message
-            }
-
-            # Compute event ID per NIP-01: SHA256 of serialized array
-            # [0, pubkey, created_at, kind, tags, content]
-            serialize = json.dumps([
-                0,
-                event["pubkey"],
-                event["created_at"],
-                event["kind"],
-                event["tags"],
-                event["content"]
-            ], separators=(',', ':'), ensure_ascii=False)
-
-            event_id = hashlib.sha256(serialize.encode('utf-8')).hexdigest()
-            event["id"] = event_id
-
-            # Sign event - convert dict to Event object just for signing
-            # Create a minimal Event-like object that sign_event can work with
-            class EventForSigning:
-                def __init__(self, event_dict):
-                    self.id = event_dict["id"]
-                    self.public_key = event_dict["pubkey"]
-                    self.created_at = event_dict["created_at"]
-                    self.kind = event_dict["kind"]
-                    self.tags = event_dict["tags"]
-                    self.content = event_dict["content"]
-                    self.signature = None
-
-            temp_event = EventForSigning(event)
-            self.private_key.sign_event(temp_event)
-            event["sig"] = temp_event.signature
+            # Build, hash (NIP-01) and sign with the cached signer
+            event = self.signer.build_event(kind=1, content=message, tags=tags)
+            event_id = event["id"]
 
             print(f"✅ Quote note created: {event_id[:16]}...")
-
-            # Send via direct WebSocket (same as rebroadcast_event)
-            message = json.dumps(["EVENT", event])
-            success_count = 0
-
-            def send_to_relay(relay_url):
-                nonlocal success_count
-                try:
-                    ws = websocket.create_connection(relay_url, timeout=5)
-                    ws.send(message)
-                    # Try to receive response
-                    try:
-                        response = ws.recv(timeout=2)
-                        if '"ok"' in response or 'true' in response:
-                            success_count += 1
-                            print(f"✅ {relay_url} accepted quote")
-                    except:
-                        # No response is fine
-                        success_count += 1
-                        print(f"✅ {relay_url} sent quote")
-                    ws.close()
-                except Exception as e:
-                    print(f"⚠️ {relay_url}: {e}")
-
-            # Send to all relays in parallel threads
-            threads = []
-            for relay_url in self.relay_list:
-                thread = threading.Thread(target=send_to_relay, args=(relay_url,))
-                thread.start()
-                threads.append(thread)
-
-            # Wait for all threads to complete
-            for thread in threads:
-                thread.join(timeout=10)
-
-            print(f"✅ Quote note published to {success_count}/{len(self.relay_list)} relays")
-            return event_id
+            return event
 
         except Exception as e:
             print(f"❌ Error creating quote: {e}")
@@ -457,128 +446,295 @@ class NostrBot:
             traceback.print_exc()
             return None
 
+    def build_digest_note(self, event_dicts):
+        """Build and sign one note that quotes a burst of inbound events (not published)"""
+        try:
+            lines = []
+            tags = []
+            for event_dict in event_dicts:
+                try:
+                    npub = PublicKey(bytes.fromhex(event_dict.get('pubkey', ''))).bech32()
+                except:
+                    npub = f"npub:{event_dict.get('pubkey', '')[:16]}..."
+
+                if event_dict.get('kind', 1) == 6:
+                    snippet = "🔁 repost"
+                else:
+                    content = ' '.join(event_dict.get('content', '').split())
+                    snippet = content[:80] + ("..." if len(content) > 80 else "")
+
+                lines.append(f"• nostr:{npub}: {snippet}\n  nostr:{hex_to_note(event_dict['id'])}")
+                tags.append(['q', event_dict['id']])
+                tags.append(['e', event_dict['id']])
+                if not any(t[0] == 'p' and t[1] == event_dict['pubkey'] for t in tags):
+                    tags.append(['p', event_dict['pubkey']])
+
+            message = (
+                f"🛰️Off-Grid Relayed via satellite🛰️\n"
+                f"--------------------------------\n\n"
+                f"📦 {len(event_dicts)} messages just arrived via satellite:\n\n"
+                + "\n\n".join(lines) +
+                f"\n\n--------------------------------\n"
+                f"📡 BitSatRelay - Terminal-HQ"
+            )
+
+            event = self.signer.build_event(kind=1, content=message, tags=tags)
+            print(f"✅ Digest note created: {event['id'][:16]}... ({len(event_dicts)} messages)")
+            return event
+
+        except Exception as e:
+            print(f"❌ Error creating digest note: {e}")
+            return None
+
+    def quote(self, event_dict):
+        """Quote one inbound event, through the burst digest when enabled"""
+        if self.digest:
+            return self.digest.add(event_dict)
+        return self.create_quote_note(event_dict)
+
+    def create_quote_note(self, event_dict):
+        """V4: Create satellite quote note and publish it via the relay pool"""
+        started = time.monotonic()
+        event = self.build_quote_note(event_dict)
+        QUOTE_BUILD_SECONDS.observe(time.monotonic() - started)
+        if not event:
+            return None
+
+        # Send over the pooled relay connections (same as rebroadcast_event)
+        result = self.publish_event(event, priority=PRIORITY_QUOTE)
+
+        print(f"✅ Quote note published: {result.summary()}")
+        return event['id'] if result.accepted else None
+
     def rebroadcast_and_quote(self, event_dict):
         """V4: Main method - rebroadcast original + create quote"""
         try:
             # 1. Rebroadcast original (invisible)
             original_result = self.rebroadcast_event(event_dict)
-            # 2. Create quote note (visible)
-            quote_result = self.create_quote_note(event_dict)
-            
+            # 2. Create quote note (visible) - or hold it for a digest during a burst
+            quote_result = self.quote(event_dict)
+            if quote_result is True:
+                # A held quote isn't published yet - only the rebroadcast counts
+                if not original_result:
+                    print("⚠️ Rebroadcast failed (quote held for digest)")
+                    INBOUND_RELAYED.inc(1, 'failed')
+                    return False
+                print("✅ Complete: Rebroadcast (quote held for digest)")
+                INBOUND_RELAYED.inc(1, 'digest')
+                return True
+
             if original_result or quote_result:
                 print("✅ Complete: Rebroadcast + Quote")
+                INBOUND_RELAYED.inc(1, 'published')
                 return True
             else:
                 print("⚠️ Partial success - some operations failed")
+                INBOUND_RELAYED.inc(1, 'failed')
                 return False
         except Exception as e:
             print(f"❌ Error in rebroadcast_and_quote: {e}")
+            INBOUND_RELAYED.inc(1, 'failed')
             return False
 
-    def send_encrypted_dm(self, recipient_npub, message_text):
-        """Send encrypted DM (NIP-04) to user"""
+    def publish_batch(self, events, relay_urls=None, quorum=None, timeout=None, priority=PRIORITY_DEFAULT):
+        """
+        Pipeline many signed events over the pooled connections
+
+        Frames are written back to back per relay (bounded by max_in_flight
+        and the relay's rate limit) and OK replies are collected as they arrive.
+        priority may be a single value or a list aligned with events.
+
+        Returns:
+            List of PublishResult in the same order as events
+        """
+        if not events:
+            return []
+        # The batch deadline scales with burst size, not per-event round trips
+        timeout = self.publish_timeout if timeout is None else timeout
+        return self.pool.publish_many(
+            events,
+            relay_urls=relay_urls,
+            quorum=self.publish_quorum if quorum is None else quorum,
+            timeout=timeout + 0.05 * len(events),
+            priority=priority
+        )
+
+    def rebroadcast_and_quote_many(self, event_dicts):
+        """
+        V4: Burst version of rebroadcast_and_quote - originals first, then quotes, pipelined
+
+        Returns:
+            {event_id: True if relayed} - same rule as rebroadcast_and_quote: the
+            rebroadcast or the quote was accepted (a quote held for a digest
+            counts only alongside an accepted rebroadcast)
+        """
         try:
-            import websocket
-            from nostr.key import PublicKey
-            import base64
-            import os
-            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-            from cryptography.hazmat.backends import default_backend
-
-            # Convert npub to hex pubkey
-            recipient_pubkey_hex = PublicKey.from_npub(recipient_npub).hex()
-
-            # Encrypt message using NIP-04
-            # Get shared secret using nostr library
-            shared_secret = self.private_key.compute_shared_secret(recipient_pubkey_hex)
-
-            # Generate random IV (16 bytes)
-            iv = os.urandom(16)
-
-            # Add PKCS7 padding
-            plaintext = message_text.encode('utf-8')
-            padding_length = 16 - (len(plaintext) % 16)
-            plaintext += bytes([padding_length]) * padding_length
-
-            # Encrypt using AES-256-CBC
-            cipher = Cipher(
-                algorithms.AES(shared_secret),
-                modes.CBC(iv),
-                backend=default_backend()
+            if self.digest:
+                # Rebroadcasts unchanged; the digest decides between quotes and one summary note
+                originals = self.publish_batch(event_dicts, priority=PRIORITY_REBROADCAST)
+                quoted = self.digest.add_many(event_dicts)
+                relayed = {}
+                for event, original in zip(event_dicts, originals):
+                    quote = quoted.get(event['id'])
+                    held = quote is True
+                    relayed[event['id']] = bool(original.accepted) or bool(quote and not held)
+                    INBOUND_RELAYED.inc(1, 'failed' if not relayed[event['id']]
+                                        else 'digest' if held else 'published')
+                delivered = sum(1 for r in originals if r.accepted)
+                held = sum(1 for q in quoted.values() if q is True)
+                print(f"✅ Burst complete: {delivered}/{len(event_dicts)} rebroadcast, "
+                      f"{held} quotes held for digest")
+                return relayed
+
+            quotes = {}
+            for event in event_dicts:
+                quote = self.build_quote_note(event)
+                if quote:
+                    quotes[event['id']] = quote
+
+            # One pipelined batch; originals are queued ahead of the quote notes that
+            # reference them on any relay whose rate limit defers frames
+            results = self.publish_batch(
+                list(event_dicts) + list(quotes.values()),
+                priority=[PRIORITY_REBROADCAST] * len(event_dicts) + [PRIORITY_QUOTE] * len(quotes)
             )
-            encryptor = cipher.encryptor()
-            ciphertext = encryptor.update(plaintext) + encryptor.finalize()
+            originals = results[:len(event_dicts)]
+            quote_results = dict(zip(quotes, results[len(event_dicts):]))
+
+            relayed = {}
+            for event, original in zip(event_dicts, originals):
+                quote = quote_results.get(event['id'])
+                relayed[event['id']] = bool(original.accepted or (quote and quote.accepted))
+                INBOUND_RELAYED.inc(1, 'published' if relayed[event['id']] else 'failed')
+
+            delivered = sum(1 for r in originals if r.accepted)
+            quoted = sum(1 for r in quote_results.values() if r.accepted)
+            print(f"✅ Burst complete: {delivered}/{len(event_dicts)} rebroadcast, {quoted}/{len(quotes)} quotes published")
+            return relayed
+        except Exception as e:
+            print(f"❌ Error in rebroadcast_and_quote_many: {e}")
+            INBOUND_RELAYED.inc(len(event_dicts), 'failed')
+            return {event['id']: False for event in event_dicts}
 
-            # Use NIP-04 standard format: base64(ciphertext)?iv=base64(iv)
-            encrypted_content = base64.b64encode(ciphertext).decode('utf-8') + '?iv=' + base64.b64encode(iv).decode('utf-8')
+    def build_dm(self, recipient_npub, message_text):
+        """
+        Encrypt and sign a DM and pick its relays
 
-            # Build DM event (kind 4)
-            tags = [
-                ['p', recipient_pubkey_hex]  # Recipient
-            ]
+        Returns:
+            (event, relay_urls)
+        """
+        # Convert npub to hex pubkey
+        recipient_pubkey_hex = PublicKey.from_npub(recipient_npub).hex()
+
+        # Encrypt message using NIP-04 (shared secret cached per recipient)
+        encrypted_content = self.nip04.encrypt(message_text, recipient_pubkey_hex)
+
+        # Build DM event (kind 4)
+        tags = [
+            ['p', recipient_pubkey_hex]  # Recipient
+        ]
 
-            # Build event
-            event = {
-                "pubkey": self.private_key.public_key.hex(),
-                "created_at": int(time.time()),
-                "kind": 4,  # Encrypted Direct Message
-                "tags": tags,
-                "content": encrypted_content
-            }
-
-            # Compute event ID
-            serialize = json.dumps([
-                0,
-                event["pubkey"],
-                event["created_at"],
-                event["kind"],
-                event["tags"],
-                event["content"]
-            ], separators=(',', ':'), ensure_ascii=False)
-
-            event_hash = hashlib.sha256(serialize.encode('utf-8')).digest()
-            event["id"] = event_hash.hex()
-
-            # Sign event - create wrapper object for signing
-            class EventForSigning:
-                def __init__(self, event_dict):
-                    self.id = event_dict["id"]
-                    self.pubkey = event_dict["pubkey"]
-                    self.created_at = event_dict["created_at"]
-                    self.kind = event_dict["kind"]
-                    self.tags = event_dict["tags"]
-                    self.content = event_dict["content"]
-                    self.signature = None
-
-            temp_event = EventForSigning(event)
-            self.private_key.sign_event(temp_event)
-            event["sig"] = temp_event.signature
-
-            # Send to first relay
-            relay_url = self.relay_list[0] if self.relay_list else None
-            if not relay_url:
+        # Build, hash (NIP-01) and sign with the cached signer
+        event = self.signer.build_event(kind=4, content=encrypted_content, tags=tags)
+
+        # Recipient's inbox relays plus our fastest healthy relays
+        return event, self.dm_relays(recipient_pubkey_hex)
+
+    def send_encrypted_dm(self, recipient_npub, message_text):
+        """Send encrypted DM (NIP-04) to user"""
+        try:
+            event, relay_urls = self.build_dm(recipient_npub, message_text)
+            if not relay_urls:
                 print("❌ No relay configured for DM")
                 return False
 
-            ws = websocket.create_connection(relay_url, timeout=5)
-            event_msg = json.dumps(["EVENT", event])
-            ws.send(event_msg)
-
-            # Wait for OK response
-            response = ws.recv()
-            ws.close()
+            result = self.publish_event(event, relay_urls=relay_urls, quorum=1)
+            if not result.accepted:
+                print(f"⚠️ DM to {recipient_npub[:16]}... not accepted: {result.summary()}")
+                return False
 
-            print(f"📨 DM sent to {recipient_npub[:16]}...")
+            print(f"📨 DM sent to {recipient_npub[:16]}... ({result.summary()})")
             return True
 
         except Exception as e:
             print(f"❌ Error sending DM: {e}")
             return False
 
+    def send_encrypted_dms(self, messages, timeout=None):
+        """
+        Send a batch of DMs: every frame goes out first, then OKs are collected
+
+        Args:
+            messages: List of (recipient_npub, message_text)
+            timeout: Seconds to wait for the whole batch (None: use publish_timeout)
+
+        Returns:
+            {recipient_npub: True if at least one relay accepted}
+        """
+        pending = {}
+        delivered = {}
+        for recipient_npub, message_text in messages:
+            try:
+                event, relay_urls = self.build_dm(recipient_npub, message_text)
+                if not relay_urls:
+                    delivered[recipient_npub] = False
+                    continue
+                pending[recipient_npub] = self.pool.publish(event, relay_urls=relay_urls, wait=False)
+            except Exception as e:
+                print(f"❌ Error sending DM to {recipient_npub[:16]}...: {e}")
+                delivered[recipient_npub] = False
+
+        deadline = time.monotonic() + (self.publish_timeout if timeout is None else timeout)
+        for recipient_npub, result in pending.items():
+            result.wait(quorum=1, timeout=max(deadline - time.monotonic(), 0))
+            delivered[recipient_npub] = bool(result.accepted)
+        return delivered
+
+    def dm_relays(self, recipient_pubkey_hex):
+        """
+        Deduplicated relay set for a DM: up to max_recipient_relays of the
+        recipient's inbox relays (outbox model), then our dm_relay_count best relays
+        """
+        own = self.pool.best_relays(self.dm_relay_count)
+        if not self.outbox:
+            return own
+
+        inbox = self.outbox.relays_for(recipient_pubkey_hex)[:self.dm_outbox_relay_count]
+        configured = {normalize_relay_url(url): url for url in self.relay_list}
+        targets = []
+        for url in inbox:
+            # Relays we already use keep their configured URL (and connection)
+            url = configured.get(url, url)
+            self.pool.add_relay(url)
+            targets.append(url)
+        if targets:
+            # Bounded wait for freshly opened inbox connections
+            self.pool.wait_connected(len(targets), self.dm_connect_wait, relay_urls=targets)
+
+        return targets + [url for url in own if url not in targets]
+
+    def relay_status(self):
+        """Per-relay health scores (connect/OK latency, rejection rate, uptime)"""
+        return self.pool.status()
+
+    def print_relay_status(self):
+        """Log a one-line health summary per relay, best first"""
+        for relay_url, status in self.relay_status().items():
+            state = "🟢" if status['connected'] else "🔴"
+            ok_latency = status['ok_latency_p50_ms']
+            print(
+                f"{state} {relay_url}: score {status['score']}, "
+                f"OK p50 {ok_latency if ok_latency is not None else '-'} ms, "
+                f"rejected {status['rejection_rate']:.0%}, uptime {status['uptime_ratio']:.0%}, "
+                f"queued {status.get('queue_depth', 0)}, throttled {status.get('throttled', 0)}"
+            )
+
     def close(self):
         """Close relay connections"""
         try:
-            self.relay_manager.close_connections()
+            if self.digest:
+                self.digest.close()
+            self.pool.close()
             print("Nostr bot connections closed")
         except Exception as e:
             print(f"Error closing connections: {e}")
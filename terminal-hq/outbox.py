@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Outbox-Model Relay Lookup for BitSatRelay
+Finds where a user reads DMs (kind 10050 DM relays, else kind 10002 read
+relays) over the pooled connections and caches the answer with a TTL
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+KIND_RELAY_LIST = 10002      # NIP-65 relay list metadata
+KIND_DM_RELAYS = 10050       # Preferred relays for receiving DMs
+
+
+def normalize_relay_url(url):
+    """Comparable form of a relay URL, or None if it isn't a websocket URL"""
+    if not isinstance(url, str):
+        return None
+    url = url.strip()
+    if not url.lower().startswith(("wss://", "ws://")):
+        return None
+    scheme, rest = url.split("://", 1)
+    return f"{scheme.lower()}://{rest.rstrip('/').lower()}"
+
+
+def inbox_relays(events):
+    """
+    Relays a user reads DMs from, given their replaceable relay-list events
+
+    Kind 10050 wins when present; otherwise NIP-65 relays marked read (or unmarked).
+    """
+    newest = {}
+    for event in events:
+        kind = event.get('kind')
+        if kind not in (KIND_RELAY_LIST, KIND_DM_RELAYS):
+            continue
+        if kind not in newest or event.get('created_at', 0) > newest[kind].get('created_at', 0):
+            newest[kind] = event
+
+    relays = []
+    if KIND_DM_RELAYS in newest:
+        relays = [tag[1] for tag in newest[KIND_DM_RELAYS].get('tags', [])
+                  if len(tag) > 1 and tag[0] == 'relay']
+    elif KIND_RELAY_LIST in newest:
+        relays = [tag[1] for tag in newest[KIND_RELAY_LIST].get('tags', [])
+                  if len(tag) > 1 and tag[0] == 'r' and (len(tag) < 3 or tag[2] == 'read')]
+
+    unique = []
+    for relay in relays:
+        url = normalize_relay_url(relay)
+        if url and url not in unique:
+            unique.append(url)
+    return unique
+
+
+class OutboxResolver:
+    def __init__(self, pool, cache_size=1024, ttl=3600.0, negative_ttl=300.0, timeout=2.0,
+                 relay_count=3):
+        """
+        Cached lookup of a recipient's inbox relays
+
+        Args:
+            pool: RelayPool to query over
+            cache_size: Recipients kept in the LRU
+            ttl: Seconds a found relay list stays valid
+            negative_ttl: Seconds to remember that a user published no relay list
+            timeout: Maximum seconds one lookup waits for relays
+            relay_count: Best-scoring relays queried per lookup
+        """
+        self.pool = pool
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.relay_count = relay_count
+
+        self.cache = OrderedDict()     # {pubkey_hex: (expiry, [relay urls])}
+        self.lock = threading.Lock()
+        self.active = {}               # {sub_id: lookup state}
+        self.in_progress = {}          # {pubkey_hex: threading.Event} - one lookup per user at a time
+        self.sub_counter = itertools.count(1)
+
+        self.hits = 0
+        self.misses = 0
+        self.lookups_sent = 0
+
+        pool.add_listener(self._on_message)
+
+    def _cache_get(self, pubkey_hex):
+        with self.lock:
+            entry = self.cache.get(pubkey_hex)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.cache.move_to_end(pubkey_hex)
+                    self.hits += 1
+                    return entry[1]
+                del self.cache[pubkey_hex]
+            return None
+
+    def _cache_put(self, pubkey_hex, relays):
+        with self.lock:
+            ttl = self.ttl if relays else self.negative_ttl
+            self.cache[pubkey_hex] = (time.monotonic() + ttl, relays)
+            self.cache.move_to_end(pubkey_hex)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _on_message(self, relay_url, data):
+        if data[0] not in ("EVENT", "EOSE") or len(data) < 2:
+            return
+        lookup = self.active.get(data[1])
+        if lookup is None:
+            return
+
+        if data[0] == "EVENT" and len(data) > 2 and isinstance(data[2], dict):
+            if data[2].get('pubkey') == lookup['pubkey']:
+                lookup['events'].append(data[2])
+        elif data[0] == "EOSE":
+            lookup['eose'].add(relay_url)
+            if set(lookup['relays']).issubset(lookup['eose']):
+                lookup['done'].set()
+
+    def _lookup(self, pubkey_hex):
+        sub_id = f"outbox_{next(self.sub_counter)}"
+        relays = self.pool.best_relays(self.relay_count)
+        lookup = {'pubkey': pubkey_hex, 'relays': relays, 'events': [], 'eose': set(),
+                  'done': threading.Event()}
+        self.active[sub_id] = lookup
+
+        request = json.dumps(["REQ", sub_id, {"kinds": [KIND_RELAY_LIST, KIND_DM_RELAYS],
+                                              "authors": [pubkey_hex], "limit": 4}])
+        for relay_url in relays:
+            if self.pool.send_to(relay_url, request):
+                self.lookups_sent += 1
+            else:
+                lookup['eose'].add(relay_url)
+        if set(relays).issubset(lookup['eose']):
+            lookup['done'].set()
+
+        complete = lookup['done'].wait(self.timeout)
+        self.active.pop(sub_id, None)
+        close = json.dumps(["CLOSE", sub_id])
+        for relay_url in relays:
+            self.pool.send_to(relay_url, close)
+
+        found = inbox_relays(lookup['events'])
+        # Only remember "no relay list" when every relay confirmed it, not on timeout
+        if found or complete:
+            self._cache_put(pubkey_hex, found)
+        return found
+
+    def relays_for(self, pubkey_hex):
+        """
+        Inbox relays for a user (normalized URLs, preferred first)
+
+        Returns:
+            List of relay URLs, empty if the user published no relay list
+        """
+        cached = self._cache_get(pubkey_hex)
+        if cached is not None:
+            return cached
+
+        with self.lock:
+            self.misses += 1
+            waiting = self.in_progress.get(pubkey_hex)
+            if waiting is None:
+                self.in_progress[pubkey_hex] = threading.Event()
+
+        if waiting is not None:
+            # Another DM to the same user is already looking - share its answer
+            waiting.wait(self.timeout)
+            cached = self._cache_get(pubkey_hex)
+            return cached if cached is not None else []
+
+        try:
+            return self._lookup(pubkey_hex)
+        finally:
+            with self.lock:
+                self.in_progress.pop(pubkey_hex).set()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'cached': len(self.cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'lookups_sent': self.lookups_sent
+            }
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Runtime Profiling for BitSatRelay
+Profile the running relay without a restart: SIGUSR1 (or the local control
+socket) toggles a profiler, SIGUSR2 dumps every asyncio task and thread
+stack, and a watchdog task measures event-loop lag all the time. Everything
+is written to files for offline analysis
+"""
+
+import asyncio
+import cProfile
+import io
+import pstats
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from pathlib import Path
+
+from relay_health import _percentile
+import metrics
+
+LOOP_LAG_SECONDS = metrics.histogram('bitsat_event_loop_lag_seconds',
+                                     'Delay between a scheduled event-loop callback and when it ran',
+                                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, loop, interval=0.005):
+        """
+        Statistical profiler over every thread: a helper thread snapshots all
+        stacks each interval. Samples from the event-loop thread are prefixed
+        with the asyncio task that was running
+
+        Args:
+            loop: The event loop whose running task labels main-thread samples
+            interval: Seconds between samples
+        """
+        self.loop = loop
+        self.interval = interval
+        self.stacks = Counter()     # {folded stack: samples}
+        self.samples = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        loop_thread = getattr(self.loop, '_thread_id', None)
+        while self.running:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                prefix = [names.get(ident, str(ident))]
+                if ident == loop_thread:
+                    task = asyncio.current_task(self.loop)
+                    prefix.append(f"task:{task.get_name()}" if task is not None else "task:<loop>")
+                self.stacks[';'.join(prefix + stack)] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def write(self, path):
+        """Folded stacks ("frame;frame;frame count" per line) - flamegraph.pl and speedscope read these"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, limit=15):
+        """Leaf frames with the most samples"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.5, warn_threshold=0.25, history=7200):
+        """
+        Args:
+            interval: Seconds between scheduled wake-ups
+            warn_threshold: Lag (seconds) that counts as a stall
+            history: Lag samples kept for percentiles
+        """
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.lags = deque(maxlen=history)
+        self.stalls = 0
+        self.worst = 0.0
+        self.last_warning = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self.lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.worst = max(self.worst, lag)
+            if lag >= self.warn_threshold:
+                self.stalls += 1
+                now = time.monotonic()
+                if now - self.last_warning > 60:
+                    self.last_warning = now
+                    print(f"🐢 Event loop stalled {lag * 1000:.0f}ms (profile with SIGUSR1, stacks with SIGUSR2)")
+
+    def stats(self):
+        lags = list(self.lags)
+        return {
+            'samples': len(lags),
+            'p50_ms': round(_percentile(lags, 50) * 1000, 2) if lags else 0.0,
+            'p99_ms': round(_percentile(lags, 99) * 1000, 2) if lags else 0.0,
+            'max_ms': round(self.worst * 1000, 2),
+            'stalls': self.stalls
+        }
+
+
+class RuntimeProfiler:
+    def __init__(self, directory, sample_interval=0.005, lag_interval=0.5, lag_warn_threshold=0.25):
+        """
+        Args:
+            directory: Where profiles and stack dumps are written
+            sample_interval: Seconds between samples in sampling mode
+            lag_interval: Seconds between event-loop lag probes
+            lag_warn_threshold: Lag (seconds) reported as a stall
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sample_interval = sample_interval
+        self.lag = LoopLagMonitor(lag_interval, lag_warn_threshold)
+
+        self.loop = None
+        self.mode = None            # 'sample' or 'cprofile' while profiling
+        self.profiler = None
+        self.started_at = 0.0
+        self.tasks = []
+        self.server = None
+
+    async def start(self, control_port=None, control_host='127.0.0.1'):
+        """Install signal handlers, start the lag monitor and (optionally) the control socket"""
+        self.loop = asyncio.get_running_loop()
+        self.tasks.append(asyncio.create_task(self.lag.run(), name="loop-lag-monitor"))
+        try:
+            self.loop.add_signal_handler(signal.SIGUSR1, self.toggle)
+            self.loop.add_signal_handler(signal.SIGUSR2, self.dump_stacks)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            print("⚠️ Profiling signals unavailable on this platform - use the control socket")
+        if control_port:
+            self.server = await asyncio.start_server(self._handle_client, control_host, control_port)
+            print(f"🔬 Profiling control on {control_host}:{control_port} (start [sample|cprofile], stop, "
+                  f"tasks, lag, status)")
+
+    def _stamp(self):
+        return time.strftime('%Y%m%d-%H%M%S')
+
+    def start_profiling(self, mode='sample'):
+        """
+        Start a profiler
+
+        Args:
+            mode: 'sample' - all threads, low overhead, folded-stack output
+                  'cprofile' - deterministic, event-loop thread only (every task), pstats output
+        """
+        if self.mode is not None:
+            return f"Already profiling ({self.mode})"
+        if mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif mode == 'sample':
+            self.profiler = SamplingProfiler(self.loop, self.sample_interval)
+            self.profiler.start()
+        else:
+            return f"Unknown profiler mode: {mode}"
+        self.mode = mode
+        self.started_at = time.monotonic()
+        print(f"🔬 Profiling started ({mode})")
+        return f"Profiling started ({mode})"
+
+    def stop_profiling(self):
+        """Stop the profiler and write its output file"""
+        if self.mode is None:
+            return "Not profiling"
+        elapsed = time.monotonic() - self.started_at
+        stamp = self._stamp()
+        summary = io.StringIO()
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+            path = self.directory / f"profile-{stamp}.pstats"
+            self.profiler.dump_stats(path)
+            pstats.Stats(self.profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+        else:
+            self.profiler.stop()
+            path = self.directory / f"profile-{stamp}.folded"
+            self.profiler.write(path)
+            summary.write(f"{self.profiler.samples} samples\n")
+            for frame, count in self.profiler.top():
+                summary.write(f"{count:8d}  {frame}\n")
+        (self.directory / f"profile-{stamp}.txt").write_text(summary.getvalue())
+
+        self.mode = self.profiler = None
+        print(f"🔬 Profiled {elapsed:.1f}s → {path}")
+        return f"Wrote {path}"
+
+    def toggle(self):
+        return self.start_profiling() if self.mode is None else self.stop_profiling()
+
+    def dump_stacks(self):
+        """Write every asyncio task's stack, every thread's stack and the loop lag to a file"""
+        path = self.directory / f"stacks-{self._stamp()}.txt"
+        with open(path, 'w') as f:
+            f.write(f"Event loop lag: {self.lag.stats()}\n\n")
+            tasks = asyncio.all_tasks(self.loop)
+            f.write(f"=== {len(tasks)} asyncio tasks ===\n")
+            for task in sorted(tasks, key=lambda t: t.get_name()):
+                f.write(f"\n--- {task.get_name()} ({task._state}) ---\n")
+                task.print_stack(file=f)
+
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            f.write(f"\n=== {len(frames)} threads ===\n")
+            for ident, frame in frames.items():
+                f.write(f"\n--- {names.get(ident, ident)} ---\n")
+                f.write(''.join(traceback.format_stack(frame)))
+        print(f"🔬 Task and thread stacks → {path}")
+        return f"Wrote {path}"
+
+    def status(self):
+        state = f"profiling ({self.mode}, {time.monotonic() - self.started_at:.0f}s)" if self.mode else "idle"
+        return f"{state}; loop lag {self.lag.stats()}; output in {self.directory}"
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, *args = line.decode('utf-8', errors='replace').split() or ['']
+                if command == 'start':
+                    reply = self.start_profiling(args[0] if args else 'sample')
+                elif command == 'stop':
+                    reply = self.stop_profiling()
+                elif command == 'tasks':
+                    reply = self.dump_stacks()
+                elif command == 'lag':
+                    reply = str(self.lag.stats())
+                elif command == 'status':
+                    reply = self.status()
+                else:
+                    reply = "Commands: start [sample|cprofile], stop, tasks, lag, status"
+                writer.write((reply + '\n').encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass    # client went away, or shutdown
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self.mode is not None:
+            self.stop_profiling()
+        if self.server is not None:
+            self.server.close()
+        for task in self.tasks:
+            task.cancel()
+        if self.loop is not None:
+            for sig in (signal.SIGUSR1, signal.SIGUSR2):
+                try:
+                    self.loop.remove_signal_handler(sig)
+                except (NotImplementedError, AttributeError, RuntimeError):
+                    pass
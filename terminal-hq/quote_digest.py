@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Quote-Note Digest for BitSatRelay
+During inbound satellite bursts, replaces one quote note per message with a
+single aggregated note that references every message in the burst
+"""
+
+import threading
+import time
+from collections import deque
+from rate_governor import PRIORITY_QUOTE
+
+
+class QuoteDigest:
+    def __init__(self, nostr_bot, threshold=5, window_seconds=60.0, max_events_per_note=25):
+        """
+        Burst detector in front of NostrBot.create_quote_note
+
+        Args:
+            nostr_bot: NostrBot used to build and publish notes
+            threshold: Inbound messages per window quoted individually; beyond this, digest
+            window_seconds: Sliding window for burst detection and digest collection
+            max_events_per_note: Messages referenced by one digest note at most
+        """
+        self.bot = nostr_bot
+        self.threshold = threshold
+        self.window = window_seconds
+        self.max_events_per_note = max_events_per_note
+
+        self.arrivals = deque()     # monotonic times of recent inbound messages
+        self.pending = []           # events waiting for the next digest note
+        self.timer = None
+        self.lock = threading.Lock()
+
+        # Counters
+        self.individual_quotes = 0
+        self.digested_events = 0
+        self.digest_notes = 0
+
+    def _bursting(self, now):
+        while self.arrivals and now - self.arrivals[0] > self.window:
+            self.arrivals.popleft()
+        return len(self.arrivals) > self.threshold
+
+    def add(self, event_dict):
+        """
+        Quote one inbound message, or hold it for the digest during a burst
+
+        Returns:
+            Quote note id if published now, True if held for a digest, None on failure
+        """
+        return self.add_many([event_dict]).get(event_dict['id'])
+
+    def add_many(self, event_dicts):
+        """
+        Quote a batch of inbound messages (already rebroadcast)
+
+        Returns:
+            {event_id: quote note id | True (held for digest) | None}
+        """
+        results = {}
+        immediate = []
+        with self.lock:
+            now = time.monotonic()
+            for event in event_dicts:
+                self.arrivals.append(now)
+                if self.pending or self._bursting(now):
+                    self.pending.append(event)
+                    results[event['id']] = True
+                else:
+                    immediate.append(event)
+
+            if self.pending and self.timer is None:
+                print(f"📦 Inbound burst: holding quote notes for a digest in {self.window:.0f}s")
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+        for event in immediate:
+            self.individual_quotes += 1
+            results[event['id']] = self.bot.create_quote_note(event)
+        return results
+
+    def flush(self):
+        """Publish everything held so far as digest notes"""
+        with self.lock:
+            events, self.pending = self.pending, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        if len(events) == 1:
+            self.individual_quotes += 1
+            self.bot.create_quote_note(events[0])
+            return
+
+        for start in range(0, len(events), self.max_events_per_note):
+            chunk = events[start:start + self.max_events_per_note]
+            note = self.bot.build_digest_note(chunk)
+            if not note:
+                continue
+            result = self.bot.publish_event(note, priority=PRIORITY_QUOTE)
+            self.digest_notes += 1
+            self.digested_events += len(chunk)
+            print(f"✅ Digest note for {len(chunk)} messages published: {result.summary()}")
+
+    def close(self):
+        """Publish anything still held (called on shutdown)"""
+        if self.pending:
+            self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'individual_quotes': self.individual_quotes,
+                'digested_events': self.digested_events,
+                'digest_notes': self.digest_notes
+            }
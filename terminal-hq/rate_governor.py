@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Outbound Rate Governor for BitSatRelay
+Per-relay token buckets in front of the publish path, with a priority queue
+for deferred EVENT frames so satellite backlogs don't get the bot key
+rate-limited or banned by public relays
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+# Lower number goes out first when a relay's queue is draining
+PRIORITY_REBROADCAST = 0   # Original satellite events
+PRIORITY_DEFAULT = 1       # DMs and everything else
+PRIORITY_QUOTE = 2         # Bot quote notes
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill()
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self):
+        """Take a token if available"""
+        if self.delay() > 0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class _Outbound:
+    __slots__ = ('priority', 'seq', 'frame', 'result', 'slots', 'queued_at')
+
+    def __init__(self, priority, seq, frame, result, slots):
+        self.priority = priority
+        self.seq = seq
+        self.frame = frame
+        self.result = result
+        self.slots = slots
+        self.queued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RelayGovernor:
+    def __init__(self, connection, rate=None, burst=None, on_sent=None):
+        """
+        Rate limit and deferred queue for one relay
+
+        Args:
+            connection: RelayConnection frames are written to
+            rate: EVENTs per second allowed to this relay (None = unlimited)
+            burst: Frames that may go out back to back before rate applies
+            on_sent: Optional callback(relay_url, result) after a frame is written
+        """
+        self.connection = connection
+        self.url = connection.url
+        self.bucket = TokenBucket(rate, burst or max(1, int(rate))) if rate else None
+        self.on_sent = on_sent
+
+        self.queue = []             # heap of _Outbound
+        self.seq = itertools.count()
+        self.condition = threading.Condition()
+        self.worker = None
+        self.stopping = False
+
+        # Counters
+        self.sent = 0
+        self.throttled = 0          # Frames that had to wait in the queue
+        self.dropped = 0            # Queued frames whose publish expired before they went out
+        self.max_depth = 0
+        self.max_wait = 0.0
+
+    def _pending(self, item):
+        """Still worth sending: nobody has resolved this relay's outcome yet"""
+        entry = item.result.results.get(self.url) if item.result else None
+        return entry is None or entry['status'] == 'pending'
+
+    def _write(self, item):
+        if item.slots is not None:
+            item.slots.add(self.url)
+        if self.connection.send(item.frame):
+            self.sent += 1
+            if self.on_sent:
+                self.on_sent(self.url, item.result)
+        elif item.result:
+            item.result.resolve(self.url, 'failed', 'not connected')
+
+    def submit(self, frame, priority=PRIORITY_DEFAULT, result=None, slots=None):
+        """
+        Send a frame now if the bucket allows it, otherwise queue it
+
+        Args:
+            frame: Serialized ["EVENT", ...] message
+            priority: PRIORITY_* value (lower goes first)
+            result: PublishResult to fail if the frame cannot be written
+            slots: Batch slot set; the frame then also needs an in-flight slot
+
+        Returns:
+            True if written immediately, False if deferred
+        """
+        with self.condition:
+            immediate = (not self.queue and not self.stopping and
+                         (self.bucket is None or self.bucket.delay() == 0))
+            if immediate and slots is not None:
+                # In-flight limit reached - let the worker wait for a slot
+                immediate = self.connection.acquire_slot(0)
+            if immediate:
+                if self.bucket:
+                    self.bucket.take()
+            else:
+                heapq.heappush(self.queue, _Outbound(priority, next(self.seq), frame, result, slots))
+                self.throttled += 1
+                self.max_depth = max(self.max_depth, len(self.queue))
+                self._ensure_worker()
+                self.condition.notify()
+
+        if immediate:
+            self._write(_Outbound(priority, 0, frame, result, slots))
+        return immediate
+
+    def _ensure_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._drain, name=f"governor-{self.url}", daemon=True)
+            self.worker.start()
+
+    def _drain(self):
+        """Release queued frames in priority order as tokens and slots free up"""
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+
+                item = self.queue[0]
+                if not self._pending(item):
+                    heapq.heappop(self.queue)
+                    self.dropped += 1
+                    continue
+
+                delay = self.bucket.delay() if self.bucket else 0.0
+                if delay > 0:
+                    # Re-check after the wait: a higher-priority frame may have arrived
+                    self.condition.wait(delay)
+                    continue
+
+                heapq.heappop(self.queue)
+                if self.bucket:
+                    self.bucket.take()
+                self.max_wait = max(self.max_wait, time.monotonic() - item.queued_at)
+
+            if item.slots is not None and not self._wait_for_slot(item):
+                continue
+            self._write(item)
+
+    def _wait_for_slot(self, item):
+        """Block until the relay has an in-flight slot for a batch frame"""
+        while not self.connection.acquire_slot(1.0):
+            if self.stopping:
+                return False
+            if not self._pending(item):
+                self.dropped += 1
+                return False
+        if not self._pending(item):
+            # Resolved (expired) while we waited - nobody would release this slot
+            self.connection.release_slot()
+            self.dropped += 1
+            return False
+        return True
+
+    def depth(self):
+        with self.condition:
+            return len(self.queue)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'rate_per_sec': self.bucket.rate if self.bucket else None,
+                'burst': int(self.bucket.burst) if self.bucket else None,
+                'queue_depth': len(self.queue),
+                'max_queue_depth': self.max_depth,
+                'max_queue_wait_ms': round(self.max_wait * 1000, 1),
+                'sent': self.sent,
+                'throttled': self.throttled,
+                'dropped': self.dropped
+            }
+
+    def close(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+
+
+class RateGovernor:
+    def __init__(self, connections, limits=None, on_sent=None):
+        """
+        Token buckets for every relay in a pool
+
+        Args:
+            connections: {relay_url: RelayConnection}
+            limits: {"default": {...}, "<relay_url>": {...}} where each entry has
+                    events_per_second and burst; relays without an entry (and no
+                    default) are unlimited
+            on_sent: Optional callback(relay_url, result) after a frame is written
+        """
+        self.limits = limits or {}
+        self.on_sent = on_sent
+        self.relays = {}
+        for connection in connections.values():
+            self.add(connection)
+
+    def add(self, connection):
+        """Put a (new) relay connection behind its configured bucket"""
+        limit = self.limits.get(connection.url, self.limits.get('default', {}))
+        governor = RelayGovernor(
+            connection,
+            rate=limit.get('events_per_second'),
+            burst=limit.get('burst'),
+            on_sent=self.on_sent
+        )
+        # Copy-on-write: submit/stats may be reading from other threads
+        self.relays = {**self.relays, connection.url: governor}
+
+    def remove(self, relay_url):
+        governor = self.relays.get(relay_url)
+        if governor:
+            self.relays = {url: g for url, g in self.relays.items() if url != relay_url}
+            governor.close()
+
+    def submit(self, relay_url, frame, priority=PRIORITY_DEFAULT, result=None, slots=None):
+        """Send or defer one frame to one relay (see RelayGovernor.submit)"""
+        governor = self.relays.get(relay_url)
+        if governor is None:
+            if result:
+                result.resolve(relay_url, 'failed', 'not connected')
+            return False
+        return governor.submit(frame, priority, result, slots)
+
+    def queue_depth(self):
+        """{relay_url: frames waiting}"""
+        return {url: governor.depth() for url, governor in self.relays.items()}
+
+    def stats(self):
+        return {url: governor.stats() for url, governor in self.relays.items()}
+
+    def close(self):
+        for governor in self.relays.values():
+            governor.close()
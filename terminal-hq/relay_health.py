@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Relay Health Scoring for BitSatRelay
+Rolling connect latency, OK latency, rejection rate and uptime per relay,
+used to pick the fastest healthy relays and to skip failing ones
+"""
+
+import threading
+import time
+from collections import deque
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class RelayHealth:
+    def __init__(self, url, window=50):
+        """
+        Rolling health statistics for one relay
+
+        Args:
+            url: Relay websocket URL
+            window: Number of recent samples kept per metric
+        """
+        self.url = url
+        self.lock = threading.Lock()
+        self.connect_latencies = deque(maxlen=window)
+        self.ok_latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)   # True = accepted, False = rejected/failed/timeout
+
+        self.created = time.monotonic()
+        self.connected_since = None
+        self.connected_total = 0.0
+        self.consecutive_failures = 0
+        self.connect_failures = 0
+        self.last_failure = None
+
+    def record_connect(self, latency):
+        with self.lock:
+            self.connect_latencies.append(latency)
+            self.connected_since = time.monotonic()
+            self.consecutive_failures = 0
+
+    def record_connect_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.connect_failures += 1
+            self.last_failure = time.monotonic()
+
+    def record_disconnect(self):
+        with self.lock:
+            if self.connected_since is not None:
+                self.connected_total += time.monotonic() - self.connected_since
+                self.connected_since = None
+
+    def record_publish(self, status, latency=None):
+        """Record the outcome of one EVENT on this relay"""
+        with self.lock:
+            if status == 'accepted':
+                self.outcomes.append(True)
+                if latency is not None:
+                    self.ok_latencies.append(latency)
+            elif status in ('rejected', 'failed', 'timeout'):
+                self.outcomes.append(False)
+
+    @property
+    def connected(self):
+        return self.connected_since is not None
+
+    def uptime_ratio(self):
+        with self.lock:
+            total = time.monotonic() - self.created
+            up = self.connected_total
+            if self.connected_since is not None:
+                up += time.monotonic() - self.connected_since
+        return up / total if total > 0 else 0.0
+
+    def rejection_rate(self):
+        with self.lock:
+            if not self.outcomes:
+                return 0.0
+            return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def ok_latency(self, pct=50):
+        with self.lock:
+            return _percentile(list(self.ok_latencies), pct)
+
+    def connect_latency(self, pct=50):
+        with self.lock:
+            return _percentile(list(self.connect_latencies), pct)
+
+    def is_failing(self, max_consecutive_failures=3):
+        """Down and has failed to reconnect repeatedly"""
+        return not self.connected and self.consecutive_failures >= max_consecutive_failures
+
+    def score(self):
+        """
+        Higher is better. Unknown latency counts as 1s so new relays are
+        tried but rank below relays that are proven fast.
+        """
+        if not self.connected:
+            return 0.0
+        latency = self.ok_latency()
+        if latency is None:
+            latency = self.connect_latency() or 1.0
+        return (1.0 - self.rejection_rate()) * (0.5 + 0.5 * self.uptime_ratio()) / (0.05 + latency)
+
+    def suggested_connect_timeout(self, default):
+        """Connect timeout sized to what this relay actually needs, never above default"""
+        p90 = self.connect_latency(90)
+        if p90 is None:
+            return default
+        return min(default, max(1.0, p90 * 4))
+
+    def as_dict(self):
+        ok_p50 = self.ok_latency(50)
+        ok_p90 = self.ok_latency(90)
+        connect_p50 = self.connect_latency(50)
+        return {
+            'connected': self.connected,
+            'score': round(self.score(), 3),
+            'uptime_ratio': round(self.uptime_ratio(), 3),
+            'rejection_rate': round(self.rejection_rate(), 3),
+            'ok_latency_p50_ms': round(ok_p50 * 1000, 1) if ok_p50 is not None else None,
+            'ok_latency_p90_ms': round(ok_p90 * 1000, 1) if ok_p90 is not None else None,
+            'connect_latency_p50_ms': round(connect_p50 * 1000, 1) if connect_p50 is not None else None,
+            'consecutive_failures': self.consecutive_failures,
+            'connect_failures': self.connect_failures,
+            'samples': len(self.outcomes)
+        }
+
+
+class RelayHealthTracker:
+    def __init__(self, relay_urls, window=50, max_consecutive_failures=3):
+        """
+        Health scores for a set of relays
+
+        Args:
+            relay_urls: Relays to track
+            window: Rolling sample window per metric
+            max_consecutive_failures: Connect failures after which a relay is skipped
+        """
+        self.window = window
+        self.max_consecutive_failures = max_consecutive_failures
+        # Replaced, never mutated, so readers on other threads can iterate it unlocked
+        self.relays = {url: RelayHealth(url, window) for url in relay_urls}
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        health = self.relays.get(url)
+        if health is None:
+            # Relay readers and publishers can meet the same new relay at once
+            with self.lock:
+                health = self.relays.get(url)
+                if health is None:
+                    health = RelayHealth(url, self.window)
+                    self.relays = {**self.relays, url: health}
+        return health
+
+    def forget(self, url):
+        """Stop tracking a relay (e.g. an extra relay the pool closed)"""
+        with self.lock:
+            if url in self.relays:
+                self.relays = {u: health for u, health in self.relays.items() if u != url}
+
+    def ranked(self, relay_urls=None):
+        """Relays ordered best first; failing relays last"""
+        urls = list(relay_urls) if relay_urls is not None else list(self.relays)
+        return sorted(urls, key=lambda url: (self.get(url).is_failing(self.max_consecutive_failures),
+                                             -self.get(url).score()))
+
+    def best(self, count=1, relay_urls=None):
+        """
+        Fastest healthy relays for single-relay operations
+
+        Falls back to the best-ranked remaining relays if fewer than `count` are connected
+        """
+        ranked = self.ranked(relay_urls)
+        healthy = [url for url in ranked if self.get(url).connected]
+        if len(healthy) < count:
+            healthy += [url for url in ranked if url not in healthy]
+        return healthy[:count]
+
+    def usable(self, relay_urls=None):
+        """Relays worth attempting in a broadcast, best first"""
+        ranked = self.ranked(relay_urls)
+        usable = [url for url in ranked if not self.get(url).is_failing(self.max_consecutive_failures)]
+        return usable or ranked
+
+    def status(self):
+        """Per-relay scores for status reporting"""
+        return {url: self.get(url).as_dict() for url in self.ranked()}
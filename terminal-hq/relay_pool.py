@@ -0,0 +1,672 @@
+#!/usr/bin/env python3
+"""
+Persistent Relay Connection Pool for BitSatRelay
+Keeps one long-lived websocket per relay (auto-reconnect + keepalive pings)
+so publishing no longer pays a DNS/TCP/TLS handshake per event
+"""
+
+import json
+import ssl
+import threading
+import time
+import websocket
+from collections import OrderedDict
+from relay_health import RelayHealthTracker
+from rate_governor import RateGovernor, PRIORITY_DEFAULT
+import metrics
+
+PUBLISH_SECONDS = metrics.histogram('bitsat_relay_publish_seconds', 'EVENT write to NIP-20 OK, per relay', ('relay',))
+PUBLISH_OUTCOMES = metrics.counter('bitsat_relay_publish_total', 'Publish outcomes per relay', ('relay', 'status'))
+
+
+class PublishResult:
+    def __init__(self, event_id, relay_urls, on_resolve=None):
+        """
+        Per-relay outcome of one EVENT publish, filled in as NIP-20 OK replies arrive
+
+        Args:
+            event_id: Hex id of the published event
+            relay_urls: Relays the event is being sent to
+            on_resolve: Optional callback(relay_url, entry) fired once when a relay's answer lands
+        """
+        self.event_id = event_id
+        self.started = time.monotonic()
+        self.on_resolve = on_resolve
+        self.condition = threading.Condition()
+        # {relay_url: {'status': pending|accepted|rejected|failed|timeout, 'message': str, 'latency': float|None}}
+        self.results = {url: {'status': 'pending', 'message': '', 'latency': None} for url in relay_urls}
+        self.sent_at = {}  # {relay_url: monotonic time the frame was written} - excludes throttling delay
+
+    def resolve(self, relay_url, status, message=''):
+        """Record a relay's answer; only the first answer per relay counts"""
+        with self.condition:
+            entry = self.results.get(relay_url)
+            if entry is None or entry['status'] != 'pending':
+                return False
+            entry['status'] = status
+            entry['message'] = message
+            entry['latency'] = time.monotonic() - self.sent_at.get(relay_url, self.started)
+            self.condition.notify_all()
+        if self.on_resolve:
+            self.on_resolve(relay_url, entry)
+        return True
+
+    def _relays_with(self, status):
+        return [url for url, r in self.results.items() if r['status'] == status]
+
+    @property
+    def accepted(self):
+        return self._relays_with('accepted')
+
+    @property
+    def rejected(self):
+        return self._relays_with('rejected')
+
+    @property
+    def failed(self):
+        return self._relays_with('failed')
+
+    @property
+    def pending(self):
+        return self._relays_with('pending')
+
+    @property
+    def done(self):
+        return not self.pending
+
+    def wait(self, quorum=None, timeout=5.0):
+        """
+        Block until `quorum` relays accepted, every relay answered, or timeout
+
+        Args:
+            quorum: Number of accepting relays to wait for (None = wait for all)
+            timeout: Maximum seconds to wait
+
+        Returns:
+            self, so results can be read straight after publishing
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while not self.done:
+                if quorum is not None and len(self.accepted) >= quorum:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+        return self
+
+    def expire(self):
+        """Mark relays that never answered as timed out"""
+        for url in self.pending:
+            self.resolve(url, 'timeout')
+
+    def summary(self):
+        """One-line status for logs"""
+        parts = [f"{len(self.accepted)}/{len(self.results)} accepted"]
+        for label, urls in (("rejected", self.rejected), ("failed", self.failed), ("pending", self.pending)):
+            if urls:
+                parts.append(f"{len(urls)} {label}")
+        return ", ".join(parts)
+
+    def as_dict(self):
+        with self.condition:
+            return {
+                'event_id': self.event_id,
+                'relays': {url: dict(entry) for url, entry in self.results.items()}
+            }
+
+
+class RelayConnection:
+    def __init__(self, url, on_message=None, on_connect=None, on_disconnect=None, connect_timeout=5.0,
+                 ping_interval=30.0, max_backoff=30.0, ssl_options=None, max_in_flight=16,
+                 health=None):
+        """
+        Single persistent websocket to one relay
+
+        Args:
+            url: Relay websocket URL
+            on_message: Callback(connection, raw_message) for every frame received
+            on_connect: Callback(connection) after every successful (re)connect
+            on_disconnect: Callback(connection) when an established socket goes away
+            connect_timeout: Seconds allowed for the DNS/TCP/TLS/websocket handshake
+            ping_interval: Send a keepalive ping after this many idle seconds
+            max_backoff: Upper bound for the reconnect delay
+            ssl_options: sslopt passed to websocket-client
+            max_in_flight: EVENTs a batch may have awaiting OK on this relay at once
+            health: Optional RelayHealth that records connects, drops and uptime
+        """
+        self.url = url
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.health = health
+        self.connect_timeout = connect_timeout
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.ssl_options = ssl_options or {"cert_reqs": ssl.CERT_NONE}
+
+        self.ws = None
+        self.connected = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.send_lock = threading.Lock()
+        self.in_flight_slots = threading.BoundedSemaphore(max_in_flight)
+
+        # Counters
+        self.connect_count = 0
+        self.last_connect_time = None
+        self.last_error = None
+
+    def start(self):
+        """Start the background connect/read loop"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name=f"relay-{self.url}", daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        timeout = self.connect_timeout
+        if self.health and not self.health.consecutive_failures:
+            # Known-fast relays get a tighter handshake budget; retries get the full one
+            timeout = self.health.suggested_connect_timeout(self.connect_timeout)
+        ws = websocket.create_connection(
+            self.url,
+            timeout=timeout,
+            sslopt=self.ssl_options,
+            enable_multithread=True
+        )
+        # Idle reads time out so we can send keepalive pings
+        ws.settimeout(self.ping_interval)
+        return ws
+
+    def _run(self):
+        backoff = 1.0
+        while not self.stopping.is_set():
+            connect_started = time.monotonic()
+            try:
+                self.ws = self._connect()
+            except Exception as e:
+                self.last_error = str(e)
+                if self.health:
+                    self.health.record_connect_failure()
+                print(f"⚠️ [{self.url}] Connect failed: {e} (retry in {backoff:.0f}s)")
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            self.connect_count += 1
+            self.last_connect_time = time.time()
+            if self.health:
+                self.health.record_connect(time.monotonic() - connect_started)
+            self.connected.set()
+            backoff = 1.0
+            if self.on_connect:
+                try:
+                    self.on_connect(self)
+                except Exception as e:
+                    print(f"⚠️ [{self.url}] Connect handler error: {e}")
+
+            try:
+                self._read_loop()
+            except Exception as e:
+                if not self.stopping.is_set():
+                    self.last_error = str(e)
+                    print(f"⚠️ [{self.url}] Connection lost: {e}")
+            finally:
+                self._drop()
+
+            if not self.stopping.is_set():
+                self.stopping.wait(backoff)
+
+    def _read_loop(self):
+        while not self.stopping.is_set():
+            try:
+                message = self.ws.recv()
+            except websocket.WebSocketTimeoutException:
+                # Idle - keep NAT/relay from dropping us
+                with self.send_lock:
+                    self.ws.ping()
+                continue
+
+            if not message:
+                raise websocket.WebSocketConnectionClosedException("Relay closed connection")
+
+            if self.on_message:
+                try:
+                    self.on_message(self, message)
+                except Exception as e:
+                    print(f"⚠️ [{self.url}] Message handler error: {e}")
+
+    def _drop(self, ws=None):
+        if ws is not None and ws is not self.ws:
+            # Stale socket from a previous connection - just close it
+            try:
+                ws.close()
+            except Exception:
+                pass
+            return
+        was_connected = self.connected.is_set()
+        self.connected.clear()
+        ws, self.ws = self.ws, None
+        if ws:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if was_connected and self.health:
+            self.health.record_disconnect()
+        if was_connected and self.on_disconnect:
+            self.on_disconnect(self)
+
+    def send(self, message):
+        """
+        Write one frame on the persistent socket
+
+        Returns:
+            True if written, False if the relay is currently disconnected or the write failed
+        """
+        ws = self.ws
+        if not self.connected.is_set() or ws is None:
+            return False
+        try:
+            with self.send_lock:
+                ws.send(message)
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"⚠️ [{self.url}] Send failed: {e}")
+            # Closing the socket wakes the reader, which reconnects
+            self._drop(ws)
+            return False
+
+    def acquire_slot(self, timeout):
+        """Reserve an in-flight slot; False if none freed up within timeout"""
+        return self.in_flight_slots.acquire(timeout=max(timeout, 0))
+
+    def release_slot(self):
+        try:
+            self.in_flight_slots.release()
+        except ValueError:
+            pass
+
+    def reconnect(self):
+        """Force the reader to drop and re-establish the connection"""
+        self._drop()
+
+    def close(self):
+        """Stop reconnecting and close the socket"""
+        self.stopping.set()
+        self._drop()
+
+
+class RelayPool:
+    def __init__(self, relay_urls, connect_timeout=5.0, ping_interval=30.0, ok_expiry=30.0,
+                 max_in_flight=16, rate_limits=None, max_extra_relays=8):
+        """
+        Pool of persistent relay connections
+
+        Args:
+            relay_urls: List of relay websocket URLs
+            connect_timeout: Handshake timeout per relay
+            ping_interval: Keepalive interval per relay
+            ok_expiry: Seconds to keep listening for late OK replies after a publish
+            max_in_flight: Per-relay cap on batch-published EVENTs awaiting OK
+            rate_limits: Per-relay token buckets, {"default"|relay_url: {events_per_second, burst}}
+            max_extra_relays: Connections kept open to relays outside relay_urls (DM inboxes)
+        """
+        self.relay_urls = list(relay_urls)
+        self.connect_timeout = connect_timeout
+        self.ping_interval = ping_interval
+        self.ok_expiry = ok_expiry
+        self.max_in_flight = max_in_flight
+        self.max_extra_relays = max_extra_relays
+        self.extra_relays = OrderedDict()  # {relay_url: True} least recently used first
+        self.extra_lock = threading.Lock()
+        self.listeners = []
+        self.subscriptions = {}  # {sub_id: (filters, relay_urls or None)} - replayed on reconnect
+        self.in_flight = {}  # {event_id: [PublishResult]} awaiting OK replies
+        self.in_flight_lock = threading.Lock()
+        self.slot_lock = threading.Lock()
+        self.health = RelayHealthTracker(self.relay_urls)
+        self.connections = {url: self._new_connection(url) for url in self.relay_urls}
+        # Every EVENT frame passes through the per-relay token buckets
+        self.governor = RateGovernor(self.connections, rate_limits, on_sent=self._mark_sent)
+
+        metrics.gauge('bitsat_relay_connected', 'Relay sockets currently up', ('relay',), callback=lambda: {
+            (url,): int(connection.connected.is_set()) for url, connection in self.connections.items()})
+        metrics.gauge('bitsat_relay_queue_depth', 'EVENT frames waiting in the rate governor', ('relay',),
+                      callback=lambda: {(url,): governor.stats()['queue_depth']
+                                        for url, governor in self.governor.relays.items()})
+        metrics.counter('bitsat_relay_governor_frames_total',
+                        'EVENT frames through the rate governor: sent, throttled (had to queue) or dropped',
+                        ('relay', 'outcome'),
+                        callback=lambda: {(url, outcome): stats[outcome]
+                                          for url, stats in self.governor.stats().items()
+                                          for outcome in ('sent', 'throttled', 'dropped')})
+
+    def _new_connection(self, url):
+        return RelayConnection(
+            url,
+            on_message=self._dispatch,
+            on_connect=self._handle_connect,
+            on_disconnect=self._handle_disconnect,
+            connect_timeout=self.connect_timeout,
+            ping_interval=self.ping_interval,
+            max_in_flight=self.max_in_flight,
+            health=self.health.get(url)
+        )
+
+    def add_relay(self, relay_url):
+        """
+        Open (or reuse) a connection to a relay outside the configured set
+
+        Extra relays receive only what is explicitly addressed to them and are
+        closed least-recently-used first once max_extra_relays is exceeded.
+        """
+        evicted = []
+        with self.extra_lock:
+            connection = self.connections.get(relay_url)
+            if connection is not None:
+                if relay_url in self.extra_relays:
+                    self.extra_relays.move_to_end(relay_url)
+                return connection
+
+            connection = self._new_connection(relay_url)
+            self.governor.add(connection)
+            self.extra_relays[relay_url] = True
+            while len(self.extra_relays) > self.max_extra_relays:
+                old_url, _ = self.extra_relays.popitem(last=False)
+                evicted.append(self.connections[old_url])
+            # Copy-on-write so readers iterating the old dict are never disturbed
+            connections = {url: c for url, c in self.connections.items() if c not in evicted}
+            connections[relay_url] = connection
+            self.connections = connections
+
+        for old in evicted:
+            self.governor.remove(old.url)
+            self.health.forget(old.url)
+            old.close()
+        connection.start()
+        return connection
+
+    def start(self):
+        """Open all connections in the background"""
+        for connection in self.connections.values():
+            connection.start()
+        return self
+
+    def add_listener(self, callback):
+        """Register callback(relay_url, parsed_message) for every relay frame"""
+        self.listeners.append(callback)
+
+    def _dispatch(self, connection, raw_message):
+        try:
+            data = json.loads(raw_message)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(data, list) or not data:
+            return
+
+        if data[0] == "OK" and len(data) >= 3:
+            self._handle_ok(connection.url, data)
+        elif data[0] == "NOTICE" and len(data) >= 2:
+            print(f"📢 {connection.url} NOTICE: {data[1]}")
+
+        for listener in self.listeners:
+            listener(connection.url, data)
+
+    def _handle_ok(self, relay_url, data):
+        """Match a NIP-20 ["OK", <event_id>, <bool>, <message>] reply to its publish"""
+        event_id = data[1]
+        accepted = data[2] is True
+        message = data[3] if len(data) > 3 and isinstance(data[3], str) else ''
+
+        if not accepted:
+            print(f"⚠️ {relay_url} rejected {str(event_id)[:16]}...: {message}")
+
+        with self.in_flight_lock:
+            results = list(self.in_flight.get(event_id, []))
+        for result in results:
+            result.resolve(relay_url, 'accepted' if accepted else 'rejected', message)
+            if result.done:
+                self._forget(result)
+
+    def _handle_connect(self, connection):
+        """Re-open shared subscriptions on a fresh socket"""
+        for sub_id, (filters, relay_urls) in list(self.subscriptions.items()):
+            if connection.url in (self.relay_urls if relay_urls is None else relay_urls):
+                connection.send(json.dumps(["REQ", sub_id, *filters]))
+
+    def _handle_disconnect(self, connection):
+        """OK replies for a dropped socket will never arrive - fail them now"""
+        with self.in_flight_lock:
+            results = [r for results in self.in_flight.values() for r in results]
+        for result in results:
+            result.resolve(connection.url, 'failed', 'connection lost')
+            if result.done:
+                self._forget(result)
+
+    def _track(self, result):
+        with self.in_flight_lock:
+            self.in_flight.setdefault(result.event_id, []).append(result)
+
+    def _forget(self, result):
+        with self.in_flight_lock:
+            results = self.in_flight.get(result.event_id)
+            if results and result in results:
+                results.remove(result)
+                if not results:
+                    del self.in_flight[result.event_id]
+
+    def _expire_stale(self):
+        """Stop waiting for OK replies older than ok_expiry"""
+        now = time.monotonic()
+        with self.in_flight_lock:
+            stale = [r for results in self.in_flight.values() for r in results
+                     if now - r.started > self.ok_expiry]
+        for result in stale:
+            result.expire()
+            self._forget(result)
+
+    def _mark_sent(self, relay_url, result):
+        if result is not None:
+            result.sent_at[relay_url] = time.monotonic()
+
+    def _record_outcome(self, relay_url, entry):
+        self.health.get(relay_url).record_publish(entry['status'], entry['latency'])
+        PUBLISH_OUTCOMES.inc(1, relay_url, entry['status'])
+        if entry['latency'] is not None:
+            PUBLISH_SECONDS.observe(entry['latency'], relay_url)
+
+    def best_relays(self, count=1, relay_urls=None):
+        """Fastest healthy relays, for single-relay operations"""
+        return self.health.best(count, relay_urls if relay_urls is not None else self.relay_urls)
+
+    def status(self):
+        """Per-relay health scores plus pool state"""
+        status = self.health.status()
+        for url, entry in status.items():
+            connection = self.connections.get(url)
+            if connection:
+                entry['reconnects'] = max(connection.connect_count - 1, 0)
+                entry['last_error'] = connection.last_error
+            governor = self.governor.relays.get(url)
+            if governor:
+                governor_stats = governor.stats()
+                entry['queue_depth'] = governor_stats['queue_depth']
+                entry['throttled'] = governor_stats['throttled']
+        return status
+
+    def subscribe(self, sub_id, filters, relay_urls=None):
+        """
+        Open a long-lived subscription, kept alive across reconnects
+
+        Events arrive through add_listener callbacks as ["EVENT", sub_id, event].
+
+        Args:
+            sub_id: Subscription id (shared by every relay)
+            filters: List of NIP-01 filter dicts
+            relay_urls: Relays to subscribe on (default: all)
+        """
+        self.subscriptions[sub_id] = (list(filters), set(relay_urls) if relay_urls is not None else None)
+        request = json.dumps(["REQ", sub_id, *filters])
+        for url in (self.relay_urls if relay_urls is None else relay_urls):
+            self.send_to(url, request)
+
+    def unsubscribe(self, sub_id):
+        """Close a subscription on every relay"""
+        if self.subscriptions.pop(sub_id, None) is not None:
+            self.broadcast(json.dumps(["CLOSE", sub_id]))
+
+    def wait_connected(self, min_relays=1, timeout=5.0, relay_urls=None):
+        """
+        Block until at least `min_relays` sockets are up (or timeout)
+
+        Args:
+            relay_urls: Relays to count (default: the configured relays)
+
+        Returns:
+            Number of connected relays
+        """
+        relay_urls = self.relay_urls if relay_urls is None else list(relay_urls)
+        deadline = time.monotonic() + timeout
+        while True:
+            connected = len(self.connected_relays(relay_urls))
+            if connected >= min(min_relays, len(relay_urls)) or time.monotonic() >= deadline:
+                return connected
+            time.sleep(0.01)
+
+    def connected_relays(self, relay_urls=None):
+        """URLs with a live socket right now (default: among the configured relays)"""
+        connections = self.connections
+        return [url for url in (self.relay_urls if relay_urls is None else relay_urls)
+                if url in connections and connections[url].connected.is_set()]
+
+    def send_to(self, relay_url, message):
+        """Write one raw frame to a single relay"""
+        connection = self.connections.get(relay_url)
+        return connection.send(message) if connection else False
+
+    def broadcast(self, message):
+        """
+        Write one raw frame to every relay
+
+        Returns:
+            List of relay URLs the frame was written to
+        """
+        return [url for url, c in self.connections.items() if c.send(message)]
+
+    def publish(self, event_dict, relay_urls=None, quorum=None, timeout=5.0, wait=True,
+                priority=PRIORITY_DEFAULT):
+        """
+        Publish a signed event and track each relay's NIP-20 OK reply
+
+        Args:
+            event_dict: Signed event
+            relay_urls: Subset of relays to publish to (default: all)
+            quorum: Return as soon as this many relays accepted (None = wait for all)
+            timeout: Maximum seconds to wait for OK replies
+            wait: False returns immediately; the result keeps filling in
+            priority: Queue priority if a relay's rate limit defers the frame
+
+        Returns:
+            PublishResult with per-relay status, message and latency
+        """
+        self._expire_stale()
+        targets = list(relay_urls) if relay_urls is not None else list(self.relay_urls)
+        result = PublishResult(event_dict['id'], targets, on_resolve=self._record_outcome)
+
+        # Register before sending so a fast OK cannot arrive unmatched
+        self._track(result)
+        message = json.dumps(["EVENT", event_dict])
+        usable = self.health.usable(targets)
+        for url in targets:
+            if url not in usable:
+                result.resolve(url, 'failed', 'skipped: relay failing')
+        # Healthiest relays get the frame first; rate-limited relays queue it
+        for url in usable:
+            self.governor.submit(url, message, priority, result)
+
+        if result.done:
+            self._forget(result)
+        elif wait:
+            result.wait(quorum=quorum, timeout=timeout)
+        return result
+
+    def publish_many(self, events, relay_urls=None, quorum=None, timeout=10.0, priority=PRIORITY_DEFAULT):
+        """
+        Pipeline a burst of signed events: frames go out back to back on each
+        relay's socket while OK replies are collected asynchronously
+
+        Args:
+            events: List of signed event dicts
+            relay_urls: Subset of relays to publish to (default: all)
+            quorum: Per-event number of accepting relays to wait for (None = all)
+            timeout: Overall deadline for writing the batch and collecting OKs
+            priority: Queue priority for frames a relay's rate limit defers
+                      (one value, or a list aligned with events)
+
+        Returns:
+            List of PublishResult, in the same order as events
+        """
+        self._expire_stale()
+        deadline = time.monotonic() + timeout
+        # Failing relays are left out of bursts entirely; the rest go best first
+        targets = [url for url in self.health.usable(relay_urls if relay_urls is not None else self.relay_urls)
+                   if url in self.connections]
+
+        results = []
+        held = []  # per event: relays currently holding an in-flight slot for it
+        for event in events:
+            slots = set()
+            # Slot is held from write until this relay's OK (or failure) for this event
+            result = PublishResult(event['id'], targets,
+                                   on_resolve=lambda url, entry, slots=slots: self._on_batch_resolve(url, entry, slots))
+            self._track(result)
+            results.append(result)
+            held.append(slots)
+
+        frames = [json.dumps(["EVENT", event]) for event in events]
+        priorities = priority if isinstance(priority, (list, tuple)) else [priority] * len(events)
+
+        # Frames go straight out while tokens and in-flight slots last; the rest wait in
+        # each relay's governor queue, which writes them back to back on its own thread
+        for frame, result, slots, frame_priority in zip(frames, results, held, priorities):
+            for url in targets:
+                self.governor.submit(url, frame, frame_priority, result, slots)
+
+        for result, slots in zip(results, held):
+            result.wait(quorum=quorum, timeout=deadline - time.monotonic())
+            if result.done:
+                self._forget(result)
+            else:
+                # Late OKs still land in the result, but stop holding slots for them
+                for url in list(slots):
+                    self._release_slot(url, slots)
+        return results
+
+    def _on_batch_resolve(self, relay_url, entry, slots):
+        self._record_outcome(relay_url, entry)
+        self._release_slot(relay_url, slots)
+
+    def _release_slot(self, relay_url, slots):
+        with self.slot_lock:
+            if relay_url not in slots:
+                return
+            slots.discard(relay_url)
+        connection = self.connections.get(relay_url)
+        if connection:
+            connection.release_slot()
+
+    def reconnect_all(self):
+        """Force every connection to re-establish"""
+        for connection in self.connections.values():
+            connection.reconnect()
+
+    def close(self):
+        """Close all connections"""
+        self.governor.close()
+        for connection in self.connections.values():
+            connection.close()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Startup Timing for BitSatRelay
+Records when each dependency and subsystem became ready, measured from
+process start, and prints a startup report
+"""
+
+import threading
+import time
+
+
+class StartupTimer:
+    def __init__(self, started=None):
+        """
+        Milestone clock for one process
+
+        Args:
+            started: time.monotonic() of cold start (default: now)
+        """
+        self.started = time.monotonic() if started is None else started
+        self.milestones = {}        # {name: seconds since start}, first mark wins
+        self.lock = threading.Lock()
+
+    def mark(self, name, quiet=False):
+        """
+        Record that `name` is ready (only the first call counts)
+
+        Returns:
+            Seconds since cold start for this milestone
+        """
+        with self.lock:
+            if name in self.milestones:
+                return self.milestones[name]
+            elapsed = time.monotonic() - self.started
+            self.milestones[name] = elapsed
+
+        if not quiet:
+            print(f"⏱️ {name} ready at +{elapsed * 1000:.0f}ms")
+        return elapsed
+
+    def elapsed(self, name):
+        """Seconds since cold start for a milestone, or None if not reached"""
+        return self.milestones.get(name)
+
+    def report(self):
+        """Milestones in the order they were reached"""
+        with self.lock:
+            return dict(sorted(self.milestones.items(), key=lambda item: item[1]))
+
+    def print_report(self, title="Startup timing"):
+        print(f"\n⏱️ {title} (from cold start)")
+        previous = 0.0
+        for name, elapsed in self.report().items():
+            print(f"   {name:<24} +{elapsed * 1000:7.0f}ms  (Δ {(elapsed - previous) * 1000:.0f}ms)")
+            previous = elapsed
+        print()
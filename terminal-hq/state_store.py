@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Expiring State Store for BitSatRelay
+Memory-bounded key-value store with O(1) lookups, per-entry TTL, LRU
+eviction and optional JSON persistence, for per-user bookkeeping
+(rate-limit timestamps, seen DM ids, notification flags)
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+def state_file(config, filename):
+    """
+    Path of a persisted store under the configured state directory
+
+    Returns:
+        Path string, or None when persistence is disabled
+    """
+    state_config = config.get('state', {})
+    if not state_config.get('persist', True):
+        return None
+    directory = Path(state_config.get('directory', 'state'))
+    if not directory.is_absolute():
+        directory = Path(__file__).parent / directory
+    return str(directory / filename)
+
+
+class ExpiringStore:
+    def __init__(self, name, ttl=None, max_entries=10000, path=None, save_interval=30.0):
+        """
+        Args:
+            name: Label used in logs and stats
+            ttl: Default seconds an entry lives (None = until evicted)
+            max_entries: Entries kept at most; the least recently written go first
+            path: JSON file to load from and persist to (None = memory only)
+            save_interval: Seconds between background saves of a changed store
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.save_interval = save_interval
+
+        # {key: (expiry wall time or None, value)} in write order, oldest first
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_save = 0.0
+        self.closed = threading.Event()
+        self.flusher = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+        if path:
+            self.load()
+            # Writes come from relay reader threads and the event loop; a flush
+            # thread keeps the JSON dump off both
+            self.flusher = threading.Thread(target=self._flush_loop, name=f"state-flush-{name}", daemon=True)
+            self.flusher.start()
+
+    def _live(self, key, now):
+        """Entry for key if present and not expired (caller holds the lock)"""
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= now:
+            del self.data[key]
+            self.expired += 1
+            self.dirty = True
+            return None
+        return entry
+
+    def _sweep(self, now):
+        """Drop expired entries from the old end (amortized O(1) per write)"""
+        while self.data:
+            key, (expiry, _) = next(iter(self.data.items()))
+            if expiry is None or expiry > now:
+                break
+            self.data.popitem(last=False)
+            self.expired += 1
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self._live(key, time.time())
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[1]
+
+    def __contains__(self, key):
+        with self.lock:
+            return self._live(key, time.time()) is not None
+
+    def set(self, key, value=True, ttl=None):
+        """Write key (resets its TTL); ttl overrides the store default"""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            self.data[key] = (now + ttl if ttl is not None else None, value)
+            self.data.move_to_end(key)
+            self._sweep(now)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+                self.evicted += 1
+            self.dirty = True
+
+    def add(self, key):
+        """Set-style alias: remember that key was seen"""
+        self.set(key, True)
+
+    def discard(self, key):
+        with self.lock:
+            if self.data.pop(key, None) is not None:
+                self.dirty = True
+
+    def __len__(self):
+        with self.lock:
+            self._sweep(time.time())
+            return len(self.data)
+
+    def _flush_loop(self):
+        while not self.closed.wait(self.save_interval):
+            if self.dirty:
+                self.save()
+
+    def save(self):
+        """Atomically write live entries to disk"""
+        if not self.path:
+            return
+        with self.lock:
+            now = time.time()
+            self._sweep(now)
+            snapshot = [[key, expiry, value] for key, (expiry, value) in self.data.items()
+                        if expiry is None or expiry > now]
+            self.dirty = False
+            self.last_save = time.monotonic()
+
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+                temp_path = f.name
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save {self.name} state to {self.path}: {e}")
+
+    def load(self):
+        """Load persisted entries, skipping any that expired while we were down"""
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ Could not load {self.name} state from {self.path}: {e}")
+            return
+
+        now = time.time()
+        with self.lock:
+            for key, expiry, value in snapshot:
+                if expiry is None or expiry > now:
+                    self.data[key] = (expiry, value)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+        print(f"📂 Loaded {len(self.data)} {self.name} entries from {self.path}")
+
+    def close(self):
+        """Stop the flush thread and write any unsaved changes"""
+        self.closed.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        if self.dirty:
+            self.save()
+
+    def memory_bytes(self):
+        """Approximate memory held by the store (container + keys + values)"""
+        with self.lock:
+            total = sys.getsizeof(self.data)
+            for key, entry in self.data.items():
+                total += sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+            return total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'capacity': self.max_entries,
+            'memory_bytes': self.memory_bytes(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'persistent': bool(self.path)
+        }
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Direct UDP Frame Receiver for BitSatRelay
+Takes HSModem's 221-byte frame stream over UDP, reassembles files in memory
+and merges the two redundancy passes, so inbound events skip Oscar and the
+SMB share entirely
+"""
+
+import asyncio
+import functools
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from event_signer import compute_event_id
+from inbound_pipeline import decode_payload
+
+# Frame layout - same as HSModemFileTransfer on the transmit side
+TOTAL_PACKET_SIZE = 221
+PAYLOAD_SIZE = 219
+FILENAME_SIZE = 50
+FIRST_FRAME_DATA_SIZE = 163
+FRAME_FIRST = 0
+FRAME_MIDDLE = 1
+FRAME_LAST = 2
+FRAME_SINGLE = 3
+
+
+def crc16(data):
+    """CRC-16 of the filename field (same as HSModemFileTransfer.calculate_crc16)"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0x8408
+            else:
+                crc >>= 1
+    return crc ^ 0xFFFF
+
+
+def parse_frame(packet):
+    """
+    Split one 221-byte frame into its fields
+
+    Returns:
+        Dict with file_type, frame_info, and either filename/size/data
+        (first and single frames) or chunk (middle and last frames); None if
+        malformed or the filename CRC doesn't match
+    """
+    if len(packet) != TOTAL_PACKET_SIZE:
+        return None
+    file_type, frame_info = packet[0], packet[1]
+    payload = packet[2:]
+
+    if frame_info in (FRAME_FIRST, FRAME_SINGLE):
+        filename_bytes = payload[:FILENAME_SIZE].rstrip(b'\x00')
+        crc = struct.unpack('<H', payload[FILENAME_SIZE:FILENAME_SIZE + 2])[0]
+        if crc != crc16(filename_bytes):
+            return None
+        filename = filename_bytes.decode('ascii', errors='replace')
+        size = int.from_bytes(payload[FILENAME_SIZE + 2:FILENAME_SIZE + 5], 'big')
+        data = payload[FILENAME_SIZE + 5:FILENAME_SIZE + 5 + FIRST_FRAME_DATA_SIZE]
+        return {'file_type': file_type, 'frame_info': frame_info, 'filename': filename,
+                'size': size, 'data': bytes(data)}
+
+    if frame_info in (FRAME_MIDDLE, FRAME_LAST):
+        return {'file_type': file_type, 'frame_info': frame_info, 'chunk': bytes(payload)}
+
+    return None
+
+
+def chunk_count(size):
+    """Frames after the first one for a file of `size` bytes"""
+    remaining = max(size - FIRST_FRAME_DATA_SIZE, 0)
+    return (remaining + PAYLOAD_SIZE - 1) // PAYLOAD_SIZE
+
+
+def common_supersequences(a, b, length, limit=64):
+    """
+    Sequences of exactly `length` chunks containing both passes in order
+
+    Chunks lost in one pass but heard in the other slot in between the chunks
+    both passes share. Repeated chunk contents make the alignment ambiguous,
+    so several candidates (up to `limit`) may come back.
+
+    Returns:
+        List of candidate sequences (empty if the passes can't make `length`)
+    """
+    n, m = len(a), len(b)
+    # scs[i][j] = shortest common supersequence length of a[i:] and b[j:]
+    scs = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n, -1, -1):
+        for j in range(m, -1, -1):
+            if i == n:
+                scs[i][j] = m - j
+            elif j == m:
+                scs[i][j] = n - i
+            elif a[i] == b[j]:
+                scs[i][j] = 1 + scs[i + 1][j + 1]
+            else:
+                scs[i][j] = 1 + min(scs[i + 1][j], scs[i][j + 1])
+
+    if not scs[0][0] <= length <= n + m:
+        return []
+
+    # Every length between the shortest and n + m is reachable from any state,
+    # so the search never dead-ends: each step only checks it stays in range
+    def fits(i, j, remaining):
+        return scs[i][j] <= remaining <= (n - i) + (m - j)
+
+    candidates = []
+    seen = set()    # repeated chunks reach the same state along many alignments
+    stack = [(0, 0, ())]
+    while stack and len(candidates) < limit:
+        state = stack.pop()
+        if state in seen:
+            continue
+        seen.add(state)
+        i, j, path = state
+        remaining = length - len(path)
+        if remaining == 0:
+            candidates.append(path)
+            continue
+        if i < n and fits(i + 1, j, remaining - 1):
+            stack.append((i + 1, j, path + (a[i],)))
+        if j < m and fits(i, j + 1, remaining - 1):
+            stack.append((i, j + 1, path + (b[j],)))
+        if i < n and j < m and a[i] == b[j] and fits(i + 1, j + 1, remaining - 1):
+            stack.append((i + 1, j + 1, path + (a[i],)))
+    return candidates
+
+
+def is_valid_event(data):
+    """True if data is a Nostr event (plain or compressed, as the pipeline accepts) with a correct id"""
+    event = decode_payload(data)
+    try:
+        return event is not None and event.get('id') == compute_event_id(event)
+    except Exception:
+        return False
+
+
+class _Pass:
+    def __init__(self, header):
+        self.header = header
+        self.chunks = []
+
+
+class _File:
+    def __init__(self, key, header, now):
+        self.key = key
+        self.filename, self.size = key
+        self.first_data = header['data']
+        self.expected = chunk_count(self.size)
+        self.passes = []
+        self.updated = now
+
+
+class FrameAssembler:
+    def __init__(self, assembly_timeout=120.0, max_merge_chunks=500, max_candidates=64):
+        """
+        In-memory reassembly of the HSModem frame stream
+
+        Args:
+            assembly_timeout: Seconds without new frames before a file is merged
+                              from whatever passes arrived, or dropped
+            max_merge_chunks: Largest file (in frames) merged across passes; bigger
+                              files need one complete pass
+            max_candidates: Interleavings tried when merging passes is ambiguous
+        """
+        self.assembly_timeout = assembly_timeout
+        self.max_merge_chunks = max_merge_chunks
+        self.max_candidates = max_candidates
+
+        self.files = {}          # {(filename, size): _File} being assembled
+        self.completed = {}      # {(filename, size): completed_at} - ignore later passes
+        self.current = None      # (_File, _Pass) receiving middle/last frames
+
+        # Counters
+        self.frames = 0
+        self.malformed = 0
+        self.orphans = 0
+        self.complete_single_pass = 0
+        self.complete_merged = 0
+        self.failed = 0
+
+    def receive(self, packet, now=None):
+        """
+        Add one received frame - frame bookkeeping only, no merging
+
+        Returns:
+            (completed, jobs): (filename, data) for single-frame files, and a
+            merge job for each pass this frame ended. Run merge(job) (off the
+            event loop if need be), then complete(job, result)
+        """
+        now = time.monotonic() if now is None else now
+        frame = parse_frame(packet)
+        self.frames += 1
+        if frame is None:
+            self.malformed += 1
+            return [], []
+
+        if frame['frame_info'] == FRAME_SINGLE:
+            self.current = None
+            key = (frame['filename'], frame['size'])
+            if key in self.completed:
+                return [], []
+            self.completed[key] = now
+            return [(frame['filename'], frame['data'][:frame['size']])], []
+
+        if frame['frame_info'] == FRAME_FIRST:
+            key = (frame['filename'], frame['size'])
+            if key in self.completed:
+                # Redundancy pass of a file we already have
+                self.current = None
+                return [], []
+            file = self.files.get(key)
+            if file is None:
+                file = self.files[key] = _File(key, frame, now)
+            file.updated = now
+            new_pass = _Pass(frame)
+            file.passes.append(new_pass)
+            self.current = (file, new_pass)
+            return [], []
+
+        # Middle and last frames belong to the most recent first frame
+        if self.current is None:
+            self.orphans += 1
+            return [], []
+        file, current_pass = self.current
+        current_pass.chunks.append(frame['chunk'])
+        file.updated = now
+
+        if frame['frame_info'] == FRAME_LAST or len(current_pass.chunks) >= file.expected:
+            self.current = None
+            return [], [self._job(file, final=False)]
+        return [], []
+
+    def feed(self, packet, now=None):
+        """
+        Add one received frame, merging in the caller's thread
+
+        Returns:
+            List of (filename, data) for files completed by this frame
+        """
+        completed, jobs = self.receive(packet, now)
+        return completed + self._run(jobs)
+
+    def expire_jobs(self, now=None):
+        """
+        Final merge jobs for files that stopped receiving frames
+
+        A final job that fails drops the file (see complete())
+        """
+        now = time.monotonic() if now is None else now
+        jobs = []
+        for file in list(self.files.values()):
+            if now - file.updated < self.assembly_timeout:
+                continue
+            if self.current and self.current[0] is file:
+                self.current = None
+            jobs.append(self._job(file, final=True))
+
+        # Forget completed files after they can no longer be repeated
+        self.completed = {k: t for k, t in self.completed.items() if now - t < self.assembly_timeout}
+        return jobs
+
+    def expire(self, now=None):
+        """
+        Give up waiting on idle files: merge what arrived, else drop them
+
+        Returns:
+            List of (filename, data) completed by merging late
+        """
+        return self._run(self.expire_jobs(now))
+
+    def _run(self, jobs):
+        done = []
+        for job in jobs:
+            result = self.complete(job, self.merge(job))
+            if result is not None:
+                done.append(result)
+        return done
+
+    def _job(self, file, final):
+        # Snapshot the passes - frames keep arriving while a merge runs elsewhere
+        return file, [list(p.chunks) for p in file.passes], final
+
+    def _finish(self, file, data):
+        del self.files[file.key]
+        self.completed[file.key] = file.updated
+        return data
+
+    def _build(self, chunks, file):
+        return (file.first_data + b''.join(chunks))[:file.size]
+
+    def merge(self, job):
+        """
+        Try to complete a file from one pass, else by merging two passes
+
+        Works only on the job's snapshot, so it can run on a worker thread.
+
+        Returns:
+            (data, merged) - data is None while the passes don't make a valid event
+        """
+        file, passes, final = job
+        for chunks in passes:
+            if len(chunks) == file.expected:
+                data = self._build(chunks, file)
+                # The right chunk count alone isn't proof: a pass that lost its first
+                # frame can pick up frames from the other pass and still add up
+                if is_valid_event(data):
+                    return data, False
+
+        # Merging needs both passes (or the timeout, if pass 2 never started)
+        if len(passes) < 2 and not final:
+            return None, False
+        if len(passes) < 2 or file.expected > self.max_merge_chunks:
+            return None, False
+
+        # Compare chunks by identity number so the DP works on small ints
+        ids = {}
+        sequences = [[ids.setdefault(chunk, len(ids)) for chunk in chunks] for chunks in passes[-2:]]
+        chunks_by_id = {i: chunk for chunk, i in ids.items()}
+
+        candidates = common_supersequences(sequences[0], sequences[1], file.expected,
+                                           self.max_candidates)
+
+        for candidate in candidates:
+            data = self._build([chunks_by_id[i] for i in candidate], file)
+            # A merge is only trusted when the result proves itself (event id hash)
+            if is_valid_event(data):
+                return data, True
+        return None, False
+
+    def complete(self, job, result):
+        """
+        Apply a merge() result: finish the file, or drop it after a failed final merge
+
+        Returns:
+            (filename, data), or None
+        """
+        file, passes, final = job
+        data, merged = result
+        if self.files.get(file.key) is not file:
+            # Another attempt finished (or dropped) it meanwhile
+            return None
+        if data is not None:
+            if merged:
+                self.complete_merged += 1
+            else:
+                self.complete_single_pass += 1
+            return file.filename, self._finish(file, data)
+        if final:
+            del self.files[file.key]
+            self.failed += 1
+            print(f"⚠️ Dropped incomplete satellite file {file.filename} "
+                  f"({max(len(chunks) for chunks in passes) if passes else 0}/{file.expected} frames)")
+        return None
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'malformed': self.malformed,
+            'orphans': self.orphans,
+            'assembling': len(self.files),
+            'complete_single_pass': self.complete_single_pass,
+            'complete_merged': self.complete_merged,
+            'failed': self.failed
+        }
+
+
+class UdpFrameReceiver(asyncio.DatagramProtocol):
+    def __init__(self, on_file, assembler=None, max_pending=64):
+        """
+        asyncio UDP endpoint feeding a FrameAssembler
+
+        Frames are sorted into passes in datagram_received; merging a finished
+        pass (up to a DP over hundreds of chunks plus candidate hash checks)
+        runs on a worker thread so it never stalls the event loop.
+        Completed files wait in a bounded queue until serve() hands them to
+        on_file; while on_file is blocked (the pipeline is full) the queue
+        fills and further files are dropped and counted, never buffered
+        without limit.
+
+        Args:
+            on_file: Coroutine function(filename, data, received_at), awaited for every
+                     completed file (received_at: unix time it was reassembled)
+            assembler: FrameAssembler to use (default: a new one)
+            max_pending: Completed files held while on_file is busy
+        """
+        self.on_file = on_file
+        self.assembler = assembler or FrameAssembler()
+        self.pending = asyncio.Queue(max_pending)
+        self.transport = None
+        self.merger = ThreadPoolExecutor(max_workers=1, thread_name_prefix="udp-merge")
+
+        # Counters
+        self.merging = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.last_drop_warning = 0.0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.merger.shutdown(wait=False)
+
+    def datagram_received(self, data, addr):
+        completed, jobs = self.assembler.receive(data)
+        for filename, file_data in completed:
+            self._hand_off(filename, file_data)
+        self._merge(jobs)
+
+    def expire(self):
+        self._merge(self.assembler.expire_jobs())
+
+    def _merge(self, jobs):
+        loop = asyncio.get_running_loop()
+        for job in jobs:
+            self.merging += 1
+            future = loop.run_in_executor(self.merger, self.assembler.merge, job)
+            future.add_done_callback(functools.partial(self._merged, job))
+
+    def _merged(self, job, future):
+        # Back on the event loop: assembler state is only changed here
+        self.merging -= 1
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"❌ Merging {job[0].filename} failed: {e}")
+            result = (None, False)
+        completed = self.assembler.complete(job, result)
+        if completed is not None:
+            self._hand_off(*completed)
+
+    def _hand_off(self, filename, file_data):
+        try:
+            self.pending.put_nowait((filename, file_data, time.time()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            now = time.monotonic()
+            if now - self.last_drop_warning > 60:
+                self.last_drop_warning = now
+                print(f"⚠️ Inbound pipeline full - dropped reassembled {filename} ({self.dropped} dropped so far)")
+
+    async def serve(self):
+        """Deliver completed files and sweep stale assemblies until the transport closes"""
+        sweep_interval = min(self.assembler.assembly_timeout / 4, 5.0)
+        next_sweep = time.monotonic() + sweep_interval
+        while not self.transport.is_closing():
+            try:
+                filename, file_data, received_at = await asyncio.wait_for(self.pending.get(),
+                                                             max(0.0, next_sweep - time.monotonic()))
+            except asyncio.TimeoutError:
+                self.expire()
+                next_sweep = time.monotonic() + sweep_interval
+                continue
+            try:
+                await self.on_file(filename, file_data, received_at)
+                self.delivered += 1
+            except Exception as e:
+                print(f"❌ Could not hand off reassembled {filename}: {e}")
+
+    def stats(self):
+        return {
+            **self.assembler.stats(),
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'merging': self.merging,
+            'pending': self.pending.qsize()
+        }
+
+
+async def start_udp_receiver(host, port, on_file, assembly_timeout=120.0, max_pending=64):
+    """
+    Bind the receiver; the caller runs (awaits) protocol.serve()
+
+    Returns:
+        (transport, protocol)
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: UdpFrameReceiver(on_file, FrameAssembler(assembly_timeout=assembly_timeout), max_pending),
+        local_addr=(host, port)
+    )
+    print(f"📡 UDP frame receiver listening on {host}:{port}")
+    return transport, protocol